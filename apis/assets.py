@@ -0,0 +1,188 @@
+"""Fingerprinted, pre-compressed copies of the files in static/.
+
+build_assets() copies every static file to ASSETS_DIR under a name that
+includes a hash of its content (css/bootstrap.min.3f2a9c1e0b7d.css),
+rewrites url(...) references inside stylesheets to the hashed names, and
+writes .gz (and .br when the brotli package is installed) variants next to
+each compressible file. A manifest maps logical names to hashed ones.
+
+Hashed files never change, so they are served with immutable far-future
+cache headers: after the first visit a browser loads the dashboard
+without asking for any of them again. Run `python -m apis.assets` to
+build ahead of time (the Docker image does); otherwise the app builds on
+startup when the manifest is missing or out of date.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+import threading
+from apis.settings import APP_DIR, ASSETS_DIR
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(APP_DIR, 'static')
+MANIFEST_NAME = 'manifest.json'
+# Already-compressed formats are not worth another pass
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.ttf', '.otf', '.eot', '.json', '.txt', '.html', '.map'}
+# Compressed variants are only kept when they are at least this much smaller
+MIN_COMPRESSION_RATIO = 0.9
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+mimetypes.add_type('font/woff2', '.woff2')
+mimetypes.add_type('font/ttf', '.ttf')
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+def _hashed_name(path, digest):
+    base, ext = posixpath.splitext(path)
+    return f"{base}.{digest}{ext}"
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _source_files(source):
+    """Logical (posix) paths of every file under source, stylesheets last so
+    the files they reference are hashed first"""
+    paths = []
+    for root, dirs, files in os.walk(source):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.startswith('.'):
+                paths.append(posixpath.join(*os.path.relpath(os.path.join(root, name), source).split(os.sep)))
+    return sorted(paths, key=lambda path: path.endswith('.css'))
+
+def _rewrite_css(path, data, manifest):
+    """Point url(...) references in a stylesheet at the hashed file names"""
+    def replace(match):
+        quote, reference = match.groups()
+        # Query strings (cache busters like ?v=6.4.0) are redundant once hashed
+        target = reference.partition('?')[0]
+        if ':' in target or target.startswith(('/', '#')):
+            return match.group(0)
+        fragment = ''
+        if '#' in target:
+            target, fragment = target.split('#', 1)
+            fragment = '#' + fragment
+        logical = posixpath.normpath(posixpath.join(posixpath.dirname(path), target))
+        hashed = manifest.get(logical)
+        if hashed is None:
+            return match.group(0)
+        relative = posixpath.relpath(hashed, posixpath.dirname(path) or '.')
+        return f"url({quote}{relative}{fragment}{quote})"
+    return CSS_URL.sub(replace, data.decode('utf-8')).encode('utf-8')
+
+def _compress(path, data):
+    """Write .gz/.br variants of a hashed file when they are worth it"""
+    if posixpath.splitext(path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        return
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    # Only needed while building, so workers that find a fresh manifest never load it
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        variants['.br'] = brotli.compress(data, quality=11)
+    for suffix, encoded in variants.items():
+        if len(encoded) <= len(data) * MIN_COMPRESSION_RATIO:
+            _write_atomic(path + suffix, encoded)
+
+def build_assets(source=None, output=None):
+    """Build hashed, compressed copies of every static file; returns the manifest"""
+    source = source or STATIC_DIR
+    output = output or ASSETS_DIR
+    manifest = {}
+    for path in _source_files(source):
+        with open(os.path.join(source, *path.split('/')), 'rb') as file:
+            data = file.read()
+        if path.endswith('.css'):
+            data = _rewrite_css(path, data, manifest)
+        hashed = _hashed_name(path, _digest(data))
+        target = os.path.join(output, *hashed.split('/'))
+        # Content-addressed: an existing file with this name is already correct
+        if not os.path.exists(target):
+            _write_atomic(target, data)
+            _compress(target, data)
+        manifest[path] = hashed
+    _write_atomic(os.path.join(output, MANIFEST_NAME),
+                  json.dumps({'source': _source_signature(source), 'files': manifest}, indent=2).encode('utf-8'))
+    logger.info("Built %d static assets in %s", len(manifest), output)
+    return manifest
+
+def _source_signature(source):
+    """Changes whenever a static file is added, removed or modified"""
+    entries = []
+    for path in _source_files(source):
+        stat = os.stat(os.path.join(source, *path.split('/')))
+        entries.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+    return _digest('\n'.join(entries).encode('utf-8'))
+
+def load_manifest(source=None, output=None):
+    """The manifest for the current static files, building it if missing or stale"""
+    source = source or STATIC_DIR
+    output = output or ASSETS_DIR
+    try:
+        with open(os.path.join(output, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+            saved = json.load(file)
+        if saved.get('source') == _source_signature(source):
+            return saved['files']
+    except (OSError, ValueError):
+        pass
+    return build_assets(source, output)
+
+def asset_mimetype(name):
+    """Content type of an asset, from its (unhashed) extension"""
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+def encoded_variant(hashed, accept_encodings):
+    """(path relative to ASSETS_DIR, Content-Encoding or None) for the best
+    pre-encoded copy of a hashed file the client accepts"""
+    for encoding, suffix in ENCODINGS:
+        if encoding in accept_encodings and os.path.exists(os.path.join(ASSETS_DIR, *(hashed + suffix).split('/'))):
+            return hashed + suffix, encoding
+    return hashed, None
+
+_manifest = None
+_hashed = frozenset()
+_manifest_lock = threading.Lock()
+
+def get_manifest():
+    """Return {logical name: hashed name}, loading (or building) it on first use"""
+    global _manifest, _hashed
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                try:
+                    manifest = load_manifest()
+                except OSError as e:
+                    # Unhashed /static URLs still work; they just are not cached for long
+                    logger.warning("Could not build static assets in %s: %s", ASSETS_DIR, e)
+                    manifest = {}
+                _hashed = frozenset(manifest.values())
+                _manifest = manifest
+    return _manifest
+
+def is_hashed(name):
+    """True for names in the current manifest (the only files /assets serves)"""
+    get_manifest()
+    return name in _hashed
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    build_assets()
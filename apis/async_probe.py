@@ -0,0 +1,320 @@
+import asyncio
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import quote, urljoin, urlsplit
+from apis.metrics import PROBE_LATENCY, PROBE_RESULTS, PROBES_IN_FLIGHT
+from apis.settings import (PROBE_CONNECT_TIMEOUT, PROBE_TIMEOUT, PROBE_FOLLOW_REDIRECTS, PROBE_MAX_REDIRECTS,
+                           PROBE_USER_AGENT, PROBE_MAX_IN_FLIGHT, PROBE_HOST_CONCURRENCY, PROBE_IP_CONCURRENCY,
+                           PROBE_DNS_TTL, PROBE_BREAKER_THRESHOLD, PROBE_BREAKER_COOLDOWN,
+                           PROBE_BREAKER_MAX_COOLDOWN)
+
+# Same fallback rule as websiteQuery.probeWebsite
+HEAD_FALLBACK_STATUSES = {400, 403, 404, 405, 501}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+# Failures that say the host itself is unreachable (as opposed to an HTTP error)
+HOST_FAILURES = {'timeout', 'connection_error', 'dns_error', 'ssl_error'}
+MAX_HEADER_BYTES = 64 * 1024
+
+class ProbeFailure(Exception):
+    """A probe that ended without a usable response; args[0] is the failure reason"""
+
+class _AdaptiveLimit:
+    """Concurrency limit for one host or IP. Host limits are fed record():
+    they halve when the host stops answering and creep back up (by about
+    one per limit's worth of successes) once it answers again"""
+
+    def __init__(self, maximum):
+        self.maximum = maximum
+        self.limit = float(maximum)
+        self.active = 0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.active < int(self.limit))
+            self.active += 1
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def record(self, responded):
+        if responded:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        else:
+            self.limit = max(1.0, self.limit / 2)
+
+class AsyncProber:
+    """Probes websites from one asyncio event loop in a background thread.
+
+    Thousands of probes can be in flight at once without a thread each.
+    Every probe is limited per host (adaptively, see _AdaptiveLimit), per
+    resolved IP and overall. DNS answers are cached for PROBE_DNS_TTL
+    seconds, and the limits of names no longer probed expire with them.
+    Each resolved address is tried in turn until one accepts the
+    connection, and hosts that keep failing at the connection level are
+    skipped by a circuit breaker whose cooldown doubles with each further
+    failure. Results have the same shape as websiteQuery.probeWebsite.
+    """
+
+    def __init__(self, max_in_flight=None, host_concurrency=None, ip_concurrency=None):
+        self.max_in_flight = max_in_flight or PROBE_MAX_IN_FLIGHT
+        self.host_concurrency = host_concurrency or PROBE_HOST_CONCURRENCY
+        self.ip_concurrency = ip_concurrency or PROBE_IP_CONCURRENCY
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        # The rest is only touched from the event loop thread
+        self._slots = None
+        self._host_limits = {}
+        self._ip_limits = {}
+        self._dns = {}            # (host, port) -> (expires, [addresses])
+        self._dns_pending = {}    # (host, port) -> Future of a lookup in progress
+        self._swept_at = time.monotonic()
+        self._breakers = {}       # 'host:port' -> (consecutive failures, open until)
+        self._ssl = None
+
+    def _ensure_loop(self):
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name='async-probe', daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def probe(self, url, timeout=None):
+        """Probe one URL and wait for the result"""
+        return self.probe_many([url], timeout=timeout)[0]
+
+    def probe_many(self, urls, timeout=None, concurrency=None):
+        """Probe URLs concurrently (at most concurrency at once); results in order"""
+        coroutine = self._probe_many(list(urls), timeout, concurrency)
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop()).result()
+
+    async def _probe_many(self, urls, timeout, concurrency):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        limit = asyncio.Semaphore(concurrency or len(urls) or 1)
+
+        async def one(url):
+            async with limit:
+                return await self._probe(url, timeout)
+        return await asyncio.gather(*(one(url) for url in urls))
+
+    async def _probe(self, url, timeout):
+        read_timeout = timeout or PROBE_TIMEOUT
+        connect_timeout = min(PROBE_CONNECT_TIMEOUT, read_timeout)
+        result = {'url': url, 'ok': False, 'status_code': None, 'latency_ms': None, 'method': 'HEAD', 'error': None}
+        origin = self._origin(url)
+        if self._breaker_open(origin):
+            result['error'] = 'circuit_open'
+            PROBE_RESULTS.inc(result='circuit_open')
+            return result
+
+        PROBES_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            async with self._slots:
+                status = await self._request('HEAD', url, connect_timeout, read_timeout)
+                if status in HEAD_FALLBACK_STATUSES:
+                    result['method'] = 'GET'
+                    status = await self._request('GET', url, connect_timeout, read_timeout)
+            result['status_code'] = status
+            result['ok'] = status == 200
+            if not result['ok']:
+                result['error'] = f"http_{status}"
+        except ProbeFailure as e:
+            result['error'] = e.args[0]
+        except Exception as e:
+            result['error'] = type(e).__name__
+        finally:
+            PROBES_IN_FLIGHT.dec()
+        elapsed = time.perf_counter() - start
+        self._record_breaker(origin, result['error'] not in HOST_FAILURES)
+        PROBE_LATENCY.observe(elapsed, method=result['method'])
+        PROBE_RESULTS.inc(result='ok' if result['ok'] else result['error'])
+        result['latency_ms'] = round(elapsed * 1000, 1)
+        return result
+
+    @staticmethod
+    def _ssl_context():
+        """Verify certificates against certifi's CA bundle (what requests uses) when installed"""
+        try:
+            import certifi
+        except ImportError:
+            return ssl.create_default_context()
+        return ssl.create_default_context(cafile=certifi.where())
+
+    @staticmethod
+    def _origin(url):
+        """'host:port' the circuit breaker tracks for a URL ('' if it cannot be parsed)"""
+        try:
+            parts = urlsplit(url)
+            return f"{parts.hostname}:{parts.port or (443 if parts.scheme == 'https' else 80)}"
+        except ValueError:
+            return ''
+
+    async def _request(self, method, url, connect_timeout, read_timeout):
+        """Send one request (following redirects) and return the final status code"""
+        for _ in range(PROBE_MAX_REDIRECTS + 1):
+            status, location = await self._send(method, url, connect_timeout, read_timeout)
+            if not (PROBE_FOLLOW_REDIRECTS and status in REDIRECT_STATUSES and location):
+                return status
+            url = urljoin(url, location)
+            if status == 303:
+                method = 'GET'
+        raise ProbeFailure('too_many_redirects')
+
+    async def _send(self, method, url, connect_timeout, read_timeout):
+        """One HTTP/1.1 exchange; returns (status, Location header); the body is never read"""
+        try:
+            parts = urlsplit(url)
+            host = parts.hostname
+            port = parts.port or (443 if parts.scheme == 'https' else 80)
+            ascii_host = host.encode('idna').decode('ascii') if host else None
+        except (ValueError, UnicodeError):
+            raise ProbeFailure('invalid_url')
+        if parts.scheme not in ('http', 'https') or not host:
+            raise ProbeFailure('invalid_url')
+        addresses = await self._resolve(host, port)
+
+        host_limit = self._host_limits.get(host)
+        if host_limit is None:
+            host_limit = self._host_limits[host] = _AdaptiveLimit(self.host_concurrency)
+        if parts.scheme == 'https' and self._ssl is None:
+            self._ssl = self._ssl_context()
+
+        async with host_limit:
+            for attempt, address in enumerate(addresses, 1):
+                ip_limit = self._ip_limits.get(address)
+                if ip_limit is None:
+                    ip_limit = self._ip_limits[address] = _AdaptiveLimit(self.ip_concurrency)
+                async with ip_limit:
+                    try:
+                        reader, writer = await asyncio.wait_for(asyncio.open_connection(
+                            address, port, ssl=self._ssl if parts.scheme == 'https' else None,
+                            server_hostname=host if parts.scheme == 'https' else None, limit=MAX_HEADER_BYTES),
+                            connect_timeout)
+                    except ssl.SSLError:
+                        raise ProbeFailure('ssl_error')
+                    except (asyncio.TimeoutError, OSError) as e:
+                        # Like requests, move on to the next address (e.g. IPv4
+                        # after an IPv6 address with no route)
+                        if attempt < len(addresses):
+                            continue
+                        host_limit.record(False)
+                        raise ProbeFailure('timeout' if isinstance(e, asyncio.TimeoutError) else 'connection_error')
+                    try:
+                        target = quote(parts.path or '/', safe="/%:@!$&'()*+,;=-._~")
+                        if parts.query:
+                            target += '?' + quote(parts.query, safe="/%:@!$&'()*+,;=-._~?")
+                        host_header = ascii_host if parts.port is None else f"{ascii_host}:{port}"
+                        writer.write((f"{method} {target} HTTP/1.1\r\nHost: {host_header}\r\n"
+                                      f"User-Agent: {PROBE_USER_AGENT}\r\nAccept: */*\r\nConnection: close\r\n\r\n")
+                                     .encode('latin-1'))
+                        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), read_timeout)
+                        host_limit.record(True)
+                    except asyncio.TimeoutError:
+                        host_limit.record(False)
+                        raise ProbeFailure('timeout')
+                    except ssl.SSLError:
+                        raise ProbeFailure('ssl_error')
+                    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                        raise ProbeFailure('invalid_response')
+                    except OSError:
+                        host_limit.record(False)
+                        raise ProbeFailure('connection_error')
+                    finally:
+                        writer.close()
+                    return self._parse_head(head)
+
+    @staticmethod
+    def _parse_head(head):
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            status = int(lines[0].split(' ', 2)[1])
+        except (IndexError, ValueError):
+            raise ProbeFailure('invalid_response')
+        location = None
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'location':
+                location = value.strip()
+        return status, location
+
+    async def _resolve(self, host, port):
+        """Addresses for host, from the DNS cache when fresh; lookups of one name are shared"""
+        key = (host, port)
+        now = time.monotonic()
+        if now - self._swept_at >= PROBE_DNS_TTL:
+            self._sweep(now)
+        cached = self._dns.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        pending = self._dns_pending.get(key)
+        if pending is None:
+            pending = self._dns_pending[key] = asyncio.ensure_future(self._lookup(host, port))
+            pending.add_done_callback(lambda _: self._dns_pending.pop(key, None))
+        return await asyncio.shield(pending)
+
+    async def _lookup(self, host, port):
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await asyncio.wait_for(loop.getaddrinfo(host, port, type=socket.SOCK_STREAM),
+                                           PROBE_CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise ProbeFailure('timeout')
+        except (socket.gaierror, UnicodeError):
+            raise ProbeFailure('dns_error')
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        self._dns[(host, port)] = (time.monotonic() + PROBE_DNS_TTL, addresses)
+        return addresses
+
+    def _sweep(self, now):
+        """Forget expired DNS answers, and the limits of hosts and addresses
+        that no fresh answer mentions and no probe is using"""
+        self._swept_at = now
+        self._dns = {key: entry for key, entry in self._dns.items() if entry[0] > now}
+        hosts = {host for host, _ in self._dns}
+        addresses = {address for _, resolved in self._dns.values() for address in resolved}
+        self._host_limits = {host: limit for host, limit in self._host_limits.items()
+                             if host in hosts or limit.active}
+        self._ip_limits = {address: limit for address, limit in self._ip_limits.items()
+                           if address in addresses or limit.active}
+
+    def _breaker_open(self, origin):
+        state = self._breakers.get(origin)
+        return state is not None and state[1] > time.monotonic()
+
+    def _record_breaker(self, origin, healthy):
+        if healthy:
+            self._breakers.pop(origin, None)
+            return
+        failures = self._breakers.get(origin, (0, 0))[0] + 1
+        open_until = 0
+        if failures >= PROBE_BREAKER_THRESHOLD:
+            # The exponent is capped so a host that has been down for weeks cannot overflow the float
+            cooldown = min(PROBE_BREAKER_COOLDOWN * 2 ** min(failures - PROBE_BREAKER_THRESHOLD, 20),
+                           PROBE_BREAKER_MAX_COOLDOWN)
+            open_until = time.monotonic() + cooldown
+        self._breakers[origin] = (failures, open_until)
+
+    def breaker_state(self):
+        """{'host:port': seconds until it is probed again} for origins being skipped"""
+        now = time.monotonic()
+        return {origin: round(until - now, 1) for origin, (_, until) in list(self._breakers.items()) if until > now}
+
+_prober = None
+_prober_lock = threading.Lock()
+
+def get_async_prober():
+    """Return the process-wide async prober, creating it on first use"""
+    global _prober
+    if _prober is None:
+        with _prober_lock:
+            if _prober is None:
+                _prober = AsyncProber()
+    return _prober
@@ -0,0 +1,159 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from apis.settings import SCRYPT_N, SCRYPT_R, SCRYPT_P, LOGIN_MAX_ATTEMPTS, LOGIN_WINDOW, MULTI_WORKER
+from apis.shared_store import get_shared_store
+from apis.website_storage import fsync_directory
+
+CREDENTIALS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'encrypted_strings.txt')
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+def hash_username(username, salt=None):
+    """Salted SHA-256 record for the username (cheap; it is not the secret)"""
+    salt = salt or secrets.token_bytes(16)
+    digest = hashlib.sha256(salt + username.encode('utf-8')).digest()
+    return f"sha256${_b64(salt)}${_b64(digest)}"
+
+def hash_password(password, salt=None, n=None, r=None, p=None):
+    """scrypt record for the password: scrypt$n$r$p$salt$hash"""
+    salt = salt or secrets.token_bytes(16)
+    n, r, p = n or SCRYPT_N, r or SCRYPT_R, p or SCRYPT_P
+    digest = hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                            maxmem=256 * n * r + 1024 * 1024, dklen=32)
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(digest)}"
+
+def verify_record(record, value):
+    """Check a value against a stored record in constant time"""
+    parts = record.split('$')
+    if parts[0] == 'sha256' and len(parts) == 3:
+        expected = hash_username(value, base64.b64decode(parts[1]))
+    elif parts[0] == 'scrypt' and len(parts) == 6:
+        n, r, p = (int(x) for x in parts[1:4])
+        expected = hash_password(value, base64.b64decode(parts[4]), n, r, p)
+    else:
+        # Pre-migration record written by the old multi-pass tool
+        from encrypt_strings import multi_pass_encrypt
+        expected = multi_pass_encrypt(value)
+    return hmac.compare_digest(expected.encode('utf-8'), record.encode('utf-8'))
+
+class CredentialStore:
+    """Username/password records loaded once and reloaded when the file changes"""
+
+    def __init__(self, path=CREDENTIALS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._records = (None, None)
+
+    def _refresh(self):
+        st = os.stat(self.path)
+        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if signature != self._signature:
+            with open(self.path, 'r') as f:
+                self._records = (f.readline().strip(), f.readline().strip())
+            self._signature = signature
+
+    def verify(self, username, password):
+        with self._lock:
+            self._refresh()
+            usr_record, pswd_record = self._records
+        if not usr_record or not pswd_record:
+            return False
+        # Always run both checks so a wrong username costs the same as a wrong password
+        usr_ok = verify_record(usr_record, username)
+        pswd_ok = verify_record(pswd_record, password)
+        return usr_ok and pswd_ok
+
+def write_credentials(username, password, path=CREDENTIALS_PATH):
+    """Write new username/password records (temp file + fsync + os.replace)"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            os.chmod(tmp_path, 0o600)
+            f.write(hash_username(username) + '\n')
+            f.write(hash_password(password) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        fsync_directory(path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class LoginRateLimiter:
+    """Token bucket per client key, checked before any hashing work is done.
+
+    With several workers (shared=True) the buckets live in the shared
+    store, so a client cannot multiply its attempts by the worker count.
+    """
+
+    def __init__(self, max_attempts=None, window=None, shared=None):
+        self.capacity = max_attempts or LOGIN_MAX_ATTEMPTS
+        self.window = window or LOGIN_WINDOW
+        self.refill_rate = self.capacity / self.window
+        self.shared = MULTI_WORKER if shared is None else shared
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def _take(self, bucket, now):
+        """Refill a (tokens, updated) bucket and take one token if there is one"""
+        tokens, updated = bucket or (self.capacity, now)
+        tokens = min(self.capacity, tokens + (now - updated) * self.refill_rate)
+        if tokens < 1:
+            return False, (tokens, now)
+        return True, (tokens - 1, now)
+
+    def allow(self, key):
+        """Consume one attempt for key; False when the client must wait"""
+        if self.shared:
+            result = []
+            def take(bucket):
+                allowed, bucket = self._take(bucket, time.time())
+                result.append(allowed)
+                return bucket
+            get_shared_store().update('login', key, take, ttl=self.window)
+            return result[-1]
+        now = time.monotonic()
+        with self._lock:
+            allowed, self._buckets[key] = self._take(self._buckets.get(key), now)
+            if not allowed:
+                return False
+            # Drop buckets that have fully refilled so the table stays small
+            if len(self._buckets) > 10000:
+                self._buckets = {k: v for k, v in self._buckets.items()
+                                 if v[0] + (now - v[1]) * self.refill_rate < self.capacity}
+            return True
+
+    def reset(self, key):
+        if self.shared:
+            get_shared_store().delete('login', key)
+            return
+        with self._lock:
+            self._buckets.pop(key, None)
+
+_store = None
+_limiter = None
+_init_lock = threading.Lock()
+
+def get_credential_store():
+    global _store
+    if _store is None:
+        with _init_lock:
+            if _store is None:
+                _store = CredentialStore()
+    return _store
+
+def get_login_limiter():
+    global _limiter
+    if _limiter is None:
+        with _init_lock:
+            if _limiter is None:
+                _limiter = LoginRateLimiter()
+    return _limiter
@@ -0,0 +1,204 @@
+"""Streaming reader, repairer and writer for website CSV files.
+
+parse_rows() turns any iterable of lines (an open file, an upload stream)
+into website records one row at a time, so loading, repairing, importing
+and exporting use as much memory for a ten-row file as for a
+ten-million-row one. The exception is unique_records(), which remembers
+the (name, URL) key of every row to drop duplicates. What happened to the
+rows is counted in a CSVReport.
+"""
+import collections
+import csv
+import io
+from apis.website_storage import FIELDNAMES, normalize_url, website_key
+
+STATUSES = ('active', 'inactive')
+# Columns of files without a header row, in websites.csv order
+POSITIONAL = {'name': 0, 'url': 1, 'status': 2}
+
+class CSVReport:
+    """Rows read, and how many were fixed or skipped and why"""
+
+    MAX_EXAMPLES = 20
+
+    def __init__(self):
+        self.rows = 0
+        self.fixed_rows = 0
+        self.fixed = collections.Counter()
+        self.skipped = collections.Counter()
+        self.examples = []      # the first MAX_EXAMPLES fixed or skipped rows
+
+    @property
+    def kept(self):
+        return self.rows - sum(self.skipped.values())
+
+    def _example(self, line, action, reason):
+        if len(self.examples) < self.MAX_EXAMPLES:
+            self.examples.append({'line': line, 'action': action, 'reason': reason})
+
+    def fix(self, line, reasons):
+        self.fixed_rows += 1
+        for reason in reasons:
+            self.fixed[reason] += 1
+        self._example(line, 'fixed', ', '.join(reasons))
+
+    def skip(self, line, reason):
+        self.skipped[reason] += 1
+        self._example(line, 'skipped', reason)
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'kept': self.kept,
+            'fixed': self.fixed_rows,
+            'skipped': sum(self.skipped.values()),
+            'fixed_reasons': dict(self.fixed),
+            'skipped_reasons': dict(self.skipped),
+            'examples': self.examples,
+        }
+
+    def __str__(self):
+        summary = f"{self.rows} rows, {self.kept} kept, {self.fixed_rows} fixed, {sum(self.skipped.values())} skipped"
+        reasons = ', '.join(f"{reason}: {count}" for reason, count in (self.fixed + self.skipped).most_common())
+        return f"{summary} ({reasons})" if reasons else summary
+
+def _header(row, required):
+    """Column index per field if row is a header naming the required fields"""
+    columns = {}
+    for index, cell in enumerate(row):
+        columns.setdefault(cell.strip().lower(), index)
+    if not set(required) <= columns.keys():
+        return None
+    return {field: columns[field] for field in FIELDNAMES if field in columns}
+
+def _scan_lines(lines, fixes):
+    """Clean raw lines before the CSV reader sees them, recording what was
+    fixed per line number in fixes. Quotes are dropped from lines with an
+    odd number of them, so a stray quote cannot swallow the rest of the
+    file into one field (no website field spans lines)."""
+    for number, line in enumerate(lines, 1):
+        if '\x00' in line:
+            line = line.replace('\x00', '')
+            fixes.setdefault(number, []).append('nul_bytes')
+        if '\ufffd' in line:
+            fixes.setdefault(number, []).append('invalid_utf8')
+        if line.count('"') % 2:
+            line = line.replace('"', '')
+            fixes.setdefault(number, []).append('stray_quote')
+        yield line
+
+def parse_rows(lines, report=None, repair=False, required=FIELDNAMES, positional=True):
+    """Yield (line number, record) for each usable row of CSV text.
+
+    The first row is a header when it names the required fields; files
+    without one are read in websites.csv column order, or rejected with
+    ValueError if positional is False. Blank lines and repeated headers
+    are ignored and rows missing a required value are skipped. With
+    repair, rows are also fixed where possible: stray whitespace, NUL
+    bytes, undecodable characters (read with errors='replace'), stray
+    quotes, unquoted commas in the URL, trailing slashes and unknown
+    statuses, which become inactive until the next probe.
+    """
+    report = CSVReport() if report is None else report
+    line_fixes = {}
+    reader = csv.reader(_scan_lines(lines, line_fixes) if repair else lines)
+    columns = None
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error:
+            # e.g. a stray quote that ran past the end of the file
+            report.rows += 1
+            report.skip(reader.line_num, 'unreadable')
+            continue
+        if not row or (len(row) == 1 and not row[0].strip()):
+            continue
+        if columns is None:
+            columns = _header(row, required)
+            if columns is not None:
+                continue
+            if not positional:
+                raise ValueError(f"CSV needs a header row with {', '.join(required)} columns")
+            columns = POSITIONAL
+        elif row[0].strip().lower() == 'name' and _header(row, required) is not None:
+            continue
+
+        report.rows += 1
+        line = reader.line_num
+        fixes = line_fixes.pop(line, []) if line_fixes else []
+        if repair and columns == POSITIONAL and len(row) > len(POSITIONAL):
+            while len(row) > len(POSITIONAL) and not row[-1].strip():
+                row.pop()
+            if len(row) > len(POSITIONAL):
+                # name,https://host/a,b,active: the URL's commas were not quoted
+                row = [row[0], ','.join(row[1:-1]), row[-1]]
+                fixes.append('unquoted_comma')
+            else:
+                fixes.append('extra_columns')
+
+        record = {}
+        for field, index in columns.items():
+            value = row[index] if index < len(row) else ''
+            stripped = value.strip()
+            if repair and len(stripped) != len(value) and 'whitespace' not in fixes:
+                fixes.append('whitespace')
+            record[field] = stripped
+
+        # In repair mode a missing status is an unknown one (inactive below)
+        missing = [field for field in required if not record.get(field) and not (repair and field == 'status')]
+        if missing:
+            report.skip(line, f"missing_{missing[0]}")
+            continue
+        if repair:
+            url = normalize_url(record['url'])
+            if url != record['url']:
+                record['url'] = url
+                fixes.append('trailing_slash')
+            if 'status' in record:
+                status = record['status'].lower()
+                if status not in STATUSES:
+                    status = 'inactive'
+                    fixes.append('invalid_status')
+                elif status != record['status']:
+                    fixes.append('status_case')
+                record['status'] = status
+        if fixes:
+            report.fix(line, fixes)
+        yield line, record
+
+def unique_records(rows, report):
+    """Drop (line, record) rows whose (name, URL) was already seen"""
+    seen = set()
+    for line, record in rows:
+        key = website_key(record['name'], record['url'])
+        if key in seen:
+            report.skip(line, 'duplicate')
+            continue
+        seen.add(key)
+        yield line, record
+
+def read_websites(lines, report=None, repair=False):
+    """Yield the unique website records of websites.csv text"""
+    report = CSVReport() if report is None else report
+    for _, record in unique_records(parse_rows(lines, report, repair=repair), report):
+        yield record
+
+def iter_csv_chunks(records, chunk_size):
+    """Encode records as CSV bytes (header first), chunk_size rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDNAMES)
+    chunk = []
+    for record in records:
+        chunk.append([record[field] for field in FIELDNAMES])
+        if len(chunk) >= chunk_size:
+            writer.writerows(chunk)
+            chunk = []
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    writer.writerows(chunk)
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
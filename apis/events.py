@@ -0,0 +1,146 @@
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from apis.settings import SSE_QUEUE_SIZE, SSE_KEEPALIVE, SSE_MAX_SECONDS, SSE_BRIDGE_INTERVAL, MULTI_WORKER, PROBE_WORKERS
+from apis.shared_store import get_shared_store
+
+logger = logging.getLogger(__name__)
+
+# Events older than this are dropped from the shared events table
+SSE_BRIDGE_RETENTION = 60
+
+class EventBroker:
+    """Fan-out of server events to every connected SSE client.
+
+    Each subscriber has a bounded queue. publish() never blocks: a client
+    that falls too far behind has its backlog replaced by a single
+    'resync' event, telling it to reload the full state.
+
+    With several workers or separate probers (shared=True) every event is
+    also written to the shared store, and a bridge thread delivers events
+    published by the other processes to this worker's clients. Publishers
+    prune old events as well, since probers and workers without SSE
+    clients never start a bridge.
+    """
+
+    def __init__(self, queue_size=None, shared=None):
+        self.queue_size = queue_size or SSE_QUEUE_SIZE
+        self.shared = (MULTI_WORKER or PROBE_WORKERS) if shared is None else shared
+        self.origin = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._seq = 0
+        self._bridge = None
+        self._pruned_at = time.monotonic()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+            if self.shared and self._bridge is None:
+                self._bridge = threading.Thread(target=self._run_bridge, args=(get_shared_store().last_event_id(),),
+                                                name='sse-bridge', daemon=True)
+                self._bridge.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event, data):
+        if self.shared:
+            try:
+                store = get_shared_store()
+                store.append_event(self.origin, event, data)
+                self._prune(store)
+            except Exception as e:
+                logger.warning("Error sharing %s event: %s", event, e)
+        self._deliver(event, data)
+
+    def _deliver(self, event, data):
+        with self._lock:
+            self._seq += 1
+            message = (self._seq, event, data)
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                self._resync(q, message[0])
+
+    def _run_bridge(self, last_id):
+        """Deliver events published by other workers, polling the shared store"""
+        store = get_shared_store()
+        while True:
+            time.sleep(SSE_BRIDGE_INTERVAL)
+            try:
+                for event_id, origin, event, data in store.events_after(last_id):
+                    last_id = event_id
+                    if origin != self.origin:
+                        self._deliver(event, data)
+                self._prune(store)
+            except Exception as e:
+                logger.warning("Error reading shared events: %s", e)
+
+    def _prune(self, store):
+        """Drop shared events older than SSE_BRIDGE_RETENTION, at most once per that many seconds"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._pruned_at < SSE_BRIDGE_RETENTION:
+                return
+            self._pruned_at = now
+        store.prune_events(SSE_BRIDGE_RETENTION)
+
+    def _resync(self, q, seq):
+        try:
+            while True:
+                q.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            q.put_nowait((seq, 'resync', {}))
+        except queue.Full:
+            pass
+
+    def stream(self, max_seconds=None, keepalive=None):
+        """Generator of SSE-formatted text for one client"""
+        max_seconds = SSE_MAX_SECONDS if max_seconds is None else max_seconds
+        keepalive = keepalive or SSE_KEEPALIVE
+        q = self.subscribe()
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    seq, event, data = q.get(timeout=min(keepalive, remaining))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {seq}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            self.unsubscribe(q)
+
+_broker = None
+_broker_lock = threading.Lock()
+
+def get_broker():
+    """Return the process-wide event broker"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = EventBroker()
+    return _broker
+
+def publish(event, data):
+    get_broker().publish(event, data)
@@ -0,0 +1,185 @@
+import collections
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from apis.events import publish
+from apis.settings import JOB_WORKERS, JOB_LOG_LINES, JOB_HISTORY, JOB_RETENTION, JOB_LOCK_DIR, MULTI_WORKER
+from apis.shared_store import get_shared_store
+from apis.website_storage import file_lock
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between shared-store saves while a job is printing output
+JOB_SAVE_INTERVAL = 1.0
+
+def site_lock(site):
+    """Cross-process lock held while a job for site runs"""
+    os.makedirs(JOB_LOCK_DIR, exist_ok=True)
+    return file_lock(os.path.join(JOB_LOCK_DIR, re.sub(r'[^A-Za-z0-9_.-]', '_', site) + '.lock'))
+
+class Job:
+    """One queued start/stop action and its captured output"""
+
+    def __init__(self, action, site):
+        self.id = uuid.uuid4().hex
+        self.action = action
+        self.site = site
+        self.status = 'queued'
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.returncode = None
+        self.error = None
+        self._log = collections.deque(maxlen=JOB_LOG_LINES)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._saved_at = 0
+
+    def append_log(self, line):
+        """Add an output line to the ring buffer; old lines drop off"""
+        line = line.rstrip('\n')
+        with self._lock:
+            self._seq += 1
+            self._log.append((self._seq, line))
+            seq = self._seq
+        publish('job-log', {'id': self.id, 'site': self.site, 'seq': seq, 'line': line})
+        if time.monotonic() - self._saved_at >= JOB_SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        """Copy the job state to the shared store so any worker can report it"""
+        if not MULTI_WORKER:
+            return
+        self._saved_at = time.monotonic()
+        try:
+            get_shared_store().set('jobs', self.id, self.to_dict(), ttl=JOB_RETENTION)
+        except Exception as e:
+            logger.warning("Error saving job %s: %s", self.id, e)
+
+    def summary(self):
+        """Job state without the log, as sent in 'job' events"""
+        return {key: value for key, value in self.to_dict(since=float('inf')).items() if key != 'log'}
+
+    def to_dict(self, since=0):
+        """Job state plus the log lines with sequence number > since"""
+        with self._lock:
+            lines = [{'seq': seq, 'line': line} for seq, line in self._log if seq > since]
+            next_seq = self._seq
+        return {
+            'id': self.id,
+            'action': self.action,
+            'site': self.site,
+            'status': self.status,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'returncode': self.returncode,
+            'error': self.error,
+            'log': lines,
+            'next': next_seq,
+        }
+
+class JobManager:
+    """Runs jobs on a bounded worker pool.
+
+    Jobs for the same site run one after another in submission order
+    (across workers too, see site_lock); jobs for different sites run in
+    parallel up to JOB_WORKERS at a time.
+    Only the most recent JOB_HISTORY jobs are kept.
+    """
+
+    def __init__(self, workers=None):
+        self._executor = ThreadPoolExecutor(max_workers=workers or JOB_WORKERS, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._jobs = collections.OrderedDict()
+        self._pending = {}   # site -> deque of (job, fn) waiting behind the running one
+
+    def submit(self, action, site, fn):
+        """Queue fn(job) for a site and return the Job immediately"""
+        job = Job(action, site)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > JOB_HISTORY:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if oldest.status in ('queued', 'running'):
+                    break
+                del self._jobs[oldest_id]
+            queue = self._pending.get(site)
+            if queue is not None:
+                # Another job for this site is queued or running
+                queue.append((job, fn))
+                publish('job', job.summary())
+                job.save()
+                return job
+            self._pending[site] = collections.deque()
+        publish('job', job.summary())
+        job.save()
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job, fn):
+        # _pending only orders jobs within this process; the lock file also
+        # keeps other workers from running a job for the same site meanwhile
+        try:
+            with site_lock(job.site):
+                job.status = 'running'
+                job.started = time.time()
+                publish('job', job.summary())
+                job.save()
+                try:
+                    job.returncode = fn(job)
+                    job.status = 'succeeded' if not job.returncode else 'failed'
+                except Exception as e:
+                    job.error = str(e)
+                    job.status = 'failed'
+        except Exception as e:
+            logger.exception("Error locking site %s for job %s", job.site, job.id)
+            job.error = str(e)
+            job.status = 'failed'
+        job.finished = time.time()
+        publish('job', job.summary())
+        job.save()
+
+        with self._lock:
+            queue = self._pending[job.site]
+            if not queue:
+                del self._pending[job.site]
+                return
+            next_job, next_fn = queue.popleft()
+        self._executor.submit(self._run, next_job, next_fn)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def state(self, job_id, since=0):
+        """Job state with log lines after since, for a job run by any worker"""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict(since=since)
+        if not MULTI_WORKER:
+            return None
+        state = get_shared_store().get('jobs', job_id)
+        if state is not None:
+            state['log'] = [entry for entry in state['log'] if entry['seq'] > since]
+        return state
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_job_manager():
+    """Return the process-wide job manager, creating it on first use"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager()
+    return _manager
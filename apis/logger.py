@@ -0,0 +1,92 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+from apis.settings import LOG_LEVEL, LOG_LEVELS, LOG_FORMAT
+
+# Set per request by the Flask hooks in main.py; '-' outside of a request
+request_id_var = contextvars.ContextVar('request_id', default='-')
+
+REDACTED = '[REDACTED]'
+SENSITIVE_KEYS = re.compile(r'pass(word)?|pswd|secret|token|api[_-]?key|authorization|cookie', re.IGNORECASE)
+SENSITIVE_PAIRS = re.compile(r'((?:pass(?:word)?|pswd|secret|token|api[_-]?key)\s*[=:]\s*)([^\s,;&]+)', re.IGNORECASE)
+
+# Attributes every LogRecord has; anything else was passed via extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+def redact(value):
+    """Mask credentials in a value passed to the logger"""
+    if isinstance(value, dict):
+        return {k: REDACTED if SENSITIVE_KEYS.search(str(k)) else redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if isinstance(value, str):
+        return SENSITIVE_PAIRS.sub(lambda m: m.group(1) + REDACTED, value)
+    return value
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request ID to every record"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, request_id, msg and extras"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'msg': redact(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = REDACTED if SENSITIVE_KEYS.search(key) else redact(value)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s')
+
+    def format(self, record):
+        return redact(super().format(record))
+
+_listener = None
+
+def setup_logging():
+    """Route all logging through a queue so handlers never block callers.
+
+    Records are formatted and written to stdout by a QueueListener thread.
+    Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JSONFormatter() if LOG_FORMAT == 'json' else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    for item in LOG_LEVELS.split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,130 @@
+import collections
+import threading
+import time
+from apis.metrics import PROBE_CACHE
+from apis.settings import PROBE_CACHE_TTL, PROBE_CACHE_SIZE
+from apis.website_storage import normalize_url
+
+class _Flight:
+    """A probe in progress that other callers for the same URL wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class ProbeCache:
+    """Recent probe results keyed by normalized URL.
+
+    Results are reused for ttl seconds and the least recently used entries
+    are evicted past max_entries. Concurrent callers for the same URL share
+    one in-flight probe instead of each making their own request. force
+    skips the cached result (but still joins a probe already in flight,
+    which is as fresh as a new one would be).
+    """
+
+    def __init__(self, ttl=None, max_entries=None):
+        self.ttl = PROBE_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries or PROBE_CACHE_SIZE
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()   # key -> (expires, result)
+        self._flights = {}
+
+    def _claim(self, key, force):
+        """Return ('hit', result), ('wait', flight) or ('lead', flight) for a key"""
+        with self._lock:
+            if not force:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    PROBE_CACHE.inc(result='hit')
+                    return 'hit', entry[1]
+            flight = self._flights.get(key)
+            if flight is not None:
+                PROBE_CACHE.inc(result='coalesced')
+                return 'wait', flight
+            PROBE_CACHE.inc(result='miss')
+            flight = self._flights[key] = _Flight()
+            return 'lead', flight
+
+    def _land(self, key, flight):
+        """Store a finished flight's result and wake everyone waiting on it"""
+        with self._lock:
+            del self._flights[key]
+            if flight.error is None and self.ttl > 0:
+                self._entries[key] = (time.monotonic() + self.ttl, flight.result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        flight.done.set()
+
+    @staticmethod
+    def _wait(flight):
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def get_or_probe(self, url, probe, force=False):
+        """Return (result, fresh); fresh is True when this call ran probe(url)"""
+        key = normalize_url(url)
+        kind, value = self._claim(key, force)
+        if kind == 'hit':
+            return value, False
+        if kind == 'wait':
+            return self._wait(value), False
+        try:
+            value.result = probe(url)
+        except Exception as e:
+            value.error = e
+            raise
+        finally:
+            self._land(key, value)
+        return value.result, True
+
+    def get_or_probe_many(self, urls, probe_many, force=False):
+        """Like get_or_probe for many URLs; the misses are probed with one probe_many(urls) call"""
+        claims = []
+        leaders = {}
+        for url in urls:
+            key = normalize_url(url)
+            if key in leaders:
+                claims.append(('wait', leaders[key][1]))
+                continue
+            kind, value = self._claim(key, force)
+            claims.append((kind, value))
+            if kind == 'lead':
+                leaders[key] = (url, value)
+        try:
+            if leaders:
+                results = probe_many([url for url, _ in leaders.values()])
+                for (_, flight), result in zip(leaders.values(), results):
+                    flight.result = result
+        except Exception as e:
+            for _, flight in leaders.values():
+                flight.error = e
+            raise
+        finally:
+            for key, (_, flight) in leaders.items():
+                self._land(key, flight)
+        return [(value, False) if kind == 'hit' else (self._wait(value), kind == 'lead') for kind, value in claims]
+
+    def invalidate(self, url=None):
+        """Forget one URL's result, or every result"""
+        with self._lock:
+            if url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(normalize_url(url), None)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_probe_cache():
+    """Return the process-wide probe cache, creating it on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ProbeCache()
+    return _cache
@@ -0,0 +1,229 @@
+import os
+import sqlite3
+import threading
+import time
+from apis.settings import HISTORY_RAW_RETENTION_HOURS, HISTORY_HOURLY_RETENTION_DAYS, HISTORY_DAILY_RETENTION_DAYS
+from apis.website_storage import website_key
+
+HISTORY_PRUNE_INTERVAL = 3600
+
+# Upper bounds (ms) of the latency histogram bins kept in every rollup; the
+# last bin is open-ended. Percentiles are estimated from these counts.
+LATENCY_BINS = [10, 25, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000]
+BIN_COLUMNS = [f"h{i}" for i in range(len(LATENCY_BINS) + 1)]
+ROLLUP_COLUMNS = ['count', 'ok_count', 'latency_count', 'latency_sum'] + BIN_COLUMNS
+
+PERIODS = {'hour': 3600, 'day': 86400}
+
+def site_key(name, url):
+    """History key of a website: its name and normalized URL, like the registry's key"""
+    return '\n'.join(website_key(name, url))
+
+def latency_bin(latency_ms):
+    for i, bound in enumerate(LATENCY_BINS):
+        if latency_ms <= bound:
+            return i
+    return len(LATENCY_BINS)
+
+def percentile(histogram, fraction):
+    """Estimate a latency percentile by interpolating inside histogram bins"""
+    total = sum(histogram)
+    if not total:
+        return None
+    target = fraction * total
+    seen = 0
+    for i, count in enumerate(histogram):
+        if count and seen + count >= target:
+            lower = LATENCY_BINS[i - 1] if i > 0 else 0
+            upper = LATENCY_BINS[i] if i < len(LATENCY_BINS) else LATENCY_BINS[-1] * 2
+            return round(lower + (upper - lower) * (target - seen) / count, 1)
+        seen += count
+    return float(LATENCY_BINS[-1])
+
+class ProbeHistory:
+    """Append-only probe results with hourly and daily rollups (SQLite).
+
+    Every sample is appended to probe_samples (kept for
+    HISTORY_RAW_RETENTION_HOURS) and folded into one hourly and one daily
+    rollup row holding counts, latency sum and a fixed latency histogram.
+    Summary queries read only rollup rows, so their cost depends on the
+    window length, not on how many samples were recorded. Sites are
+    identified by site_key(name, url), so two sites sharing a name keep
+    separate histories; rename() moves a history when a site is edited.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._last_prune = 0
+        os.makedirs(os.path.dirname(path), mode=0o755, exist_ok=True)
+        # Web workers and probers all write here; wait for each other's
+        # transactions instead of failing with "database is locked"
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        bins = ', '.join(f"{column} INTEGER NOT NULL DEFAULT 0" for column in BIN_COLUMNS)
+        self._conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS probe_samples (
+                site TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                status_code INTEGER,
+                latency_ms REAL,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_probe_samples_site_ts ON probe_samples (site, ts);
+            CREATE TABLE IF NOT EXISTS probe_rollups (
+                site TEXT NOT NULL,
+                period TEXT NOT NULL,
+                bucket_start INTEGER NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                ok_count INTEGER NOT NULL DEFAULT 0,
+                latency_count INTEGER NOT NULL DEFAULT 0,
+                latency_sum REAL NOT NULL DEFAULT 0,
+                {bins},
+                PRIMARY KEY (site, period, bucket_start)
+            );
+        """)
+
+    def record(self, site, probe, ts=None):
+        """Append one probe result (as returned by probeWebsite)"""
+        self.record_many([(site, probe, ts)])
+
+    def record_many(self, samples):
+        """Append [(site, probe, ts or None)] in one transaction"""
+        now = time.time()
+        samples = [(site, probe, int(ts if ts is not None else now)) for site, probe, ts in samples]
+        if not samples:
+            return
+        latest = max(ts for _, _, ts in samples)
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for site, probe, ts in samples:
+                    self._insert(site, probe, ts)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            if latest - self._last_prune >= HISTORY_PRUNE_INTERVAL:
+                self._prune(latest)
+
+    def _insert(self, site, probe, ts):
+        ok = 1 if probe.get('ok') else 0
+        latency = probe.get('latency_ms')
+        has_latency = latency is not None and probe.get('status_code') is not None
+        bin_column = BIN_COLUMNS[latency_bin(latency)] if has_latency else None
+        self._conn.execute(
+            'INSERT INTO probe_samples (site, ts, status_code, latency_ms, error) VALUES (?, ?, ?, ?, ?)',
+            (site, ts, probe.get('status_code'), latency, probe.get('error')))
+        for period, seconds in PERIODS.items():
+            bucket_start = ts - ts % seconds
+            # bin_column comes from BIN_COLUMNS, never from input
+            histogram_update = f", {bin_column} = {bin_column} + 1" if bin_column else ''
+            self._conn.execute(
+                'INSERT INTO probe_rollups (site, period, bucket_start) VALUES (?, ?, ?) '
+                'ON CONFLICT (site, period, bucket_start) DO NOTHING',
+                (site, period, bucket_start))
+            self._conn.execute(
+                f'UPDATE probe_rollups SET count = count + 1, ok_count = ok_count + ?, '
+                f'latency_count = latency_count + ?, latency_sum = latency_sum + ?{histogram_update} '
+                f'WHERE site = ? AND period = ? AND bucket_start = ?',
+                (ok, 1 if has_latency else 0, latency if has_latency else 0, site, period, bucket_start))
+
+    def rename(self, old, new):
+        """Move the history of site key old to new, merging rollups if new already has some"""
+        columns = ', '.join(ROLLUP_COLUMNS)
+        merge = ', '.join(f"{column} = {column} + excluded.{column}" for column in ROLLUP_COLUMNS)
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute('UPDATE probe_samples SET site = ? WHERE site = ?', (new, old))
+                self._conn.execute(
+                    f'INSERT INTO probe_rollups (site, period, bucket_start, {columns}) '
+                    f'SELECT ?, period, bucket_start, {columns} FROM probe_rollups WHERE site = ? '
+                    f'ON CONFLICT (site, period, bucket_start) DO UPDATE SET {merge}', (new, old))
+                self._conn.execute('DELETE FROM probe_rollups WHERE site = ?', (old,))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def adopt_legacy(self, websites):
+        """Move history recorded under a bare site name (before sites were keyed
+        by name and URL) to the one website with that name; ambiguous names are left alone"""
+        with self._lock:
+            names = [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT site FROM probe_rollups WHERE instr(site, char(10)) = 0").fetchall()]
+        if not names:
+            return 0
+        matches = {}
+        for website in websites:
+            matches.setdefault(website['name'], []).append(website)
+        moved = 0
+        for name in names:
+            candidates = matches.get(name, [])
+            if len(candidates) == 1:
+                self.rename(name, site_key(name, candidates[0]['url']))
+                moved += 1
+        return moved
+
+    def _prune(self, now):
+        self._last_prune = now
+        self._conn.execute('DELETE FROM probe_samples WHERE ts < ?',
+                           (now - int(HISTORY_RAW_RETENTION_HOURS * 3600),))
+        self._conn.execute("DELETE FROM probe_rollups WHERE period = 'hour' AND bucket_start < ?",
+                           (now - int(HISTORY_HOURLY_RETENTION_DAYS * 86400),))
+        self._conn.execute("DELETE FROM probe_rollups WHERE period = 'day' AND bucket_start < ?",
+                           (now - int(HISTORY_DAILY_RETENTION_DAYS * 86400),))
+
+    def summary(self, site, window_hours=24, now=None):
+        """Uptime % and p50/p95 latency over the last window_hours.
+
+        Windows up to 14 days are answered from hourly rollups, longer ones
+        from daily rollups.
+        """
+        now = int(now if now is not None else time.time())
+        period = 'hour' if window_hours <= 14 * 24 else 'day'
+        seconds = PERIODS[period]
+        since = now - int(window_hours * 3600)
+        since -= since % seconds
+
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT bucket_start, count, ok_count, latency_count, latency_sum, {", ".join(BIN_COLUMNS)} '
+                f'FROM probe_rollups WHERE site = ? AND period = ? AND bucket_start >= ? ORDER BY bucket_start',
+                (site, period, since)).fetchall()
+
+        total = ok_total = 0
+        histogram = [0] * len(BIN_COLUMNS)
+        series = []
+        for bucket_start, count, ok_count, latency_count, latency_sum, *bins in rows:
+            total += count
+            ok_total += ok_count
+            histogram = [a + b for a, b in zip(histogram, bins)]
+            series.append({
+                'start': bucket_start,
+                'checks': count,
+                'uptime_percent': round(100.0 * ok_count / count, 2) if count else None,
+                'avg_latency_ms': round(latency_sum / latency_count, 1) if latency_count else None,
+            })
+
+        return {
+            'name': site,
+            'window_hours': window_hours,
+            'resolution': period,
+            'checks': total,
+            'uptime_percent': round(100.0 * ok_total / total, 2) if total else None,
+            'latency_p50_ms': percentile(histogram, 0.50),
+            'latency_p95_ms': percentile(histogram, 0.95),
+            'series': series,
+        }
+
+    def samples(self, site, limit=100):
+        """Most recent raw samples for a site"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT ts, status_code, latency_ms, error FROM probe_samples WHERE site = ? '
+                'ORDER BY ts DESC LIMIT ?', (site, limit)).fetchall()
+        return [{'ts': ts, 'status_code': status_code, 'latency_ms': latency_ms, 'error': error}
+                for ts, status_code, latency_ms, error in rows]
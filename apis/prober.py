@@ -0,0 +1,300 @@
+"""Probe workers that split the website checks between processes.
+
+    PROBE_WORKERS=true python -m apis.prober [--id NAME]
+
+Start as many as needed, each with the same INSTANCES_DIR (on one host, or
+on several sharing that volume). Every prober heartbeats into the shared
+store; the live ones form a consistent-hash ring (PROBER_VNODES points
+each) and a prober checks the websites whose normalized URL hashes to it.
+When a prober starts, stops or misses three heartbeats, the others see the
+new membership within PROBER_HEARTBEAT seconds and only the URLs whose
+owner changed move. Per-site state (failures, next check) lives in the
+shared store, so a new owner continues a site's schedule rather than
+starting it over. During a handover a URL may be probed twice, never
+skipped for longer than a heartbeat.
+
+Due URLs are probed together (websiteQuery.probe_many, so the async engine
+handles thousands at once) and results are reported in batches: one
+registry write for all status changes, one probe history transaction and
+one shared-store write. Intervals, jitter, backoff and the timeout are the
+HEALTHCHECK_* settings. Set PROBE_WORKERS=true for the web app as well, so
+it stops running its own scheduler and relays the probers' events.
+"""
+import argparse
+import bisect
+import hashlib
+import heapq
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from apis.settings import (HEALTHCHECK_INTERVAL, HEALTHCHECK_JITTER, HEALTHCHECK_MAX_BACKOFF,
+                           HEALTHCHECK_SITE_INTERVALS, PROBE_TIMEOUT, PROBE_WORKERS, PROBER_HEARTBEAT, PROBER_VNODES,
+                           PROBER_BATCH_SIZE, PROBER_BATCHES, PROBER_REPORT_INTERVAL)
+from apis.probe_history import site_key
+from apis.scheduler import backoff_delay
+from apis.shared_store import get_shared_store
+from apis.website_storage import normalize_url, website_key
+
+logger = logging.getLogger(__name__)
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+class HashRing:
+    """Consistent hashing of keys onto members.
+
+    Each member owns vnodes points on the ring and a key belongs to the
+    member owning the first point at or after the key's hash. Adding or
+    removing a member only moves the keys next to its points.
+    """
+
+    def __init__(self, members, vnodes=None):
+        vnodes = vnodes or PROBER_VNODES
+        self.members = tuple(sorted(members))
+        points = sorted((_hash(f"{member}#{i}"), member) for member in self.members for i in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key):
+        """The member a key belongs to, or None for an empty ring"""
+        if not self._owners:
+            return None
+        return self._owners[bisect.bisect_left(self._hashes, _hash(key)) % len(self._owners)]
+
+class ProbeWorker:
+    """One prober: heartbeats, tracks its shard of the registry, probes due
+    URLs in batches and reports the results in batches."""
+
+    def __init__(self, worker_id=None, batch_size=None, batches=None, report_interval=None, heartbeat=None,
+                 interval=None, jitter=None, max_backoff=None, timeout=None, site_intervals=None, tick=0.5):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size or PROBER_BATCH_SIZE
+        self.batches = batches or PROBER_BATCHES
+        self.report_interval = PROBER_REPORT_INTERVAL if report_interval is None else report_interval
+        self.heartbeat = heartbeat or PROBER_HEARTBEAT
+        self.interval = interval or HEALTHCHECK_INTERVAL
+        self.jitter = HEALTHCHECK_JITTER if jitter is None else jitter
+        self.max_backoff = max_backoff or HEALTHCHECK_MAX_BACKOFF
+        self.timeout = timeout or PROBE_TIMEOUT
+        self.site_intervals = HEALTHCHECK_SITE_INTERVALS if site_intervals is None else site_intervals
+        self.tick = tick
+        self._store = get_shared_store()
+        self._lock = threading.Lock()
+        self._ring = HashRing(())
+        self._synced = None       # (ring, registry version) the shard was last built from
+        self._urls = {}           # normalized URL -> per-URL state, see _sync_shard
+        self._queue = []          # heap of (due_time, normalized URL)
+        self._pending = []        # finished probes waiting to be reported
+        self._reported_at = time.monotonic()
+        self._slots = threading.BoundedSemaphore(self.batches)
+        self._executor = ThreadPoolExecutor(max_workers=self.batches, thread_name_prefix='prober')
+        self._stop = threading.Event()
+
+    # --- membership ---
+
+    def _beat(self):
+        """Renew this prober's heartbeat and pick up membership changes"""
+        self._store.set('probers', self.worker_id, {'host': socket.gethostname(), 'pid': os.getpid(),
+                                                    'seen': time.time()}, ttl=self.heartbeat * 3)
+        members = self._store.items('probers').keys()
+        if set(members) != set(self._ring.members):
+            logger.info("Probers: %s", ', '.join(sorted(members)))
+            self._ring = HashRing(members)
+
+    def _run_heartbeat(self):
+        while not self._stop.wait(self.heartbeat):
+            try:
+                self._beat()
+            except Exception:
+                logger.exception("Prober heartbeat failed")
+
+    # --- shard ---
+
+    def _sync_shard(self, now):
+        """Track the URLs this prober owns when the ring or the registry changed"""
+        from apis.website_manager import get_all_websites, get_websites_version
+
+        ring, version = self._ring, get_websites_version()
+        if self._synced == (ring, version):
+            return
+        targets = {}
+        for website in get_all_websites():
+            targets.setdefault(normalize_url(website['url']), []).append((website['name'], website['url']))
+        owned = {url: sites for url, sites in targets.items() if ring.owner(url) == self.worker_id}
+
+        current = {site for sites in targets.values() for site in sites}
+        with self._lock:
+            new = [url for url in owned if url not in self._urls]
+            lost = [url for url in self._urls if url not in owned]
+            deleted = [site for state in self._urls.values() for site in state['sites'] if site not in current]
+            for url in lost:
+                del self._urls[url]
+            for url, sites in owned.items():
+                if url in self._urls:
+                    self._urls[url]['sites'] = sites
+        # Sites that left the registry (not just this shard) lose their schedule entry
+        for name, url in deleted:
+            self._store.delete('schedule', '\n'.join(website_key(name, url)))
+
+        saved = self._store.items('schedule') if new else {}
+        with self._lock:
+            for url in new:
+                state = {'url': url, 'sites': owned[url], 'failures': 0, 'last_checked': None,
+                         'latency_ms': None, 'error': None, 'in_flight': False}
+                entries = [saved.get('\n'.join(website_key(name, site_url))) for name, site_url in owned[url]]
+                entries = [entry for entry in entries if entry]
+                if entries:
+                    # Continue where the previous owner left off
+                    state['failures'] = max(entry['failures'] for entry in entries)
+                    state['last_checked'] = max(entry['last_checked'] or 0 for entry in entries) or None
+                    next_check_at = min(entry.get('next_check_at') or 0 for entry in entries)
+                    state['due'] = now + min(max(0.0, next_check_at - time.time()), self.interval)
+                else:
+                    # First sighting: spread the first round over one interval
+                    state['due'] = now + random.uniform(0, self._base_interval(state))
+                self._urls[url] = state
+                heapq.heappush(self._queue, (state['due'], url))
+            self._synced = (ring, version)
+        if new or lost:
+            logger.info("Prober %s owns %d URLs (%d new, %d handed over or removed)",
+                        self.worker_id, len(owned), len(new), len(lost))
+
+    def _base_interval(self, state):
+        return min(self.site_intervals.get(name, self.interval) for name, _ in state['sites'])
+
+    # --- probing ---
+
+    def _dispatch_due(self, now):
+        """Start probe batches of due URLs while batch slots are free"""
+        while self._slots.acquire(blocking=False):
+            batch = []
+            with self._lock:
+                while self._queue and self._queue[0][0] <= now and len(batch) < self.batch_size:
+                    due, url = heapq.heappop(self._queue)
+                    state = self._urls.get(url)
+                    # Skip entries for handed-over URLs or superseded schedule slots
+                    if state is None or state['due'] != due or state['in_flight']:
+                        continue
+                    state['in_flight'] = True
+                    batch.append((url, state['sites']))
+            if not batch:
+                self._slots.release()
+                return
+            self._executor.submit(self._probe_batch, batch)
+
+    def _probe_batch(self, batch):
+        from apis.websiteQuery import probe_many
+
+        try:
+            try:
+                results = probe_many([sites[0][1] for _, sites in batch], timeout=self.timeout)
+            except Exception as e:
+                logger.warning("Probe batch of %d URLs failed: %s", len(batch), e)
+                results = [{'ok': False, 'status_code': None, 'latency_ms': None, 'error': type(e).__name__}] * len(batch)
+        finally:
+            self._slots.release()
+
+        checked_at = time.time()
+        with self._lock:
+            for (url, sites), result in zip(batch, results):
+                state = self._urls.get(url)
+                entry = None
+                if state is not None:
+                    state['in_flight'] = False
+                    state['last_checked'] = checked_at
+                    state['latency_ms'] = result['latency_ms']
+                    state['error'] = result['error']
+                    state['failures'] = 0 if result['ok'] else state['failures'] + 1
+                    delay = backoff_delay(self._base_interval(state), state['failures'], self.max_backoff, self.jitter)
+                    state['due'] = time.monotonic() + delay
+                    heapq.heappush(self._queue, (state['due'], url))
+                    entry = {'failures': state['failures'], 'next_check_at': checked_at + delay}
+                # Results for URLs handed over meanwhile are still reported (they are
+                # just as fresh), but the schedule entry is the new owner's
+                self._pending.append((sites, result, checked_at, entry))
+
+    # --- reporting ---
+
+    def _report(self, force=False):
+        """Write finished probes back in one batch"""
+        from apis.website_manager import get_history, get_registry
+
+        with self._lock:
+            due = force or len(self._pending) >= self.batch_size or \
+                time.monotonic() - self._reported_at >= self.report_interval
+            if not due or not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            self._reported_at = time.monotonic()
+
+        statuses, samples, entries = {}, [], {}
+        for sites, result, checked_at, entry in pending:
+            for name, url in sites:
+                statuses[(name, url)] = 'active' if result['ok'] else 'inactive'
+                samples.append((site_key(name, url), result, checked_at))
+                if entry is None:
+                    continue
+                entries['\n'.join(website_key(name, url))] = dict(
+                    entry, name=name, url=url, last_checked=checked_at, latency_ms=result['latency_ms'],
+                    error=result['error'], worker=self.worker_id)
+        for step, write in (('statuses', lambda: get_registry().update_statuses(statuses)),
+                            ('history', lambda: get_history().record_many(samples)),
+                            ('schedule', lambda: entries and self._store.set_many('schedule', entries))):
+            try:
+                write()
+            except Exception as e:
+                logger.warning("Error reporting %s for %d probes: %s", step, len(pending), e)
+        logger.debug("Reported %d probes for %d sites", len(pending), len(statuses))
+
+    # --- lifecycle ---
+
+    def run(self):
+        """Probe this prober's shard until stop() is called"""
+        self._beat()
+        heartbeat = threading.Thread(target=self._run_heartbeat, name='prober-heartbeat', daemon=True)
+        heartbeat.start()
+        logger.info("Prober %s started (batches of %d, %d in flight)", self.worker_id, self.batch_size, self.batches)
+        try:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                try:
+                    self._sync_shard(now)
+                    self._dispatch_due(now)
+                    self._report()
+                except Exception:
+                    logger.exception("Prober error")
+                self._stop.wait(self.tick)
+        finally:
+            heartbeat.join()
+            # Leave the ring at once so the others take over without waiting for the heartbeat to expire
+            self._store.delete('probers', self.worker_id)
+            self._executor.shutdown(wait=True)
+            self._report(force=True)
+            logger.info("Prober %s stopped", self.worker_id)
+
+    def stop(self):
+        self._stop.set()
+
+def main():
+    from apis.logger import setup_logging
+
+    parser = argparse.ArgumentParser(description="Run a probe worker")
+    parser.add_argument('--id', help="worker id on the hash ring (default: host-pid)")
+    args = parser.parse_args()
+    setup_logging()
+    if not PROBE_WORKERS:
+        # Without it the web app keeps its own scheduler and every site is checked twice
+        parser.error("set PROBE_WORKERS=true (for the web app too) to run probe workers")
+    worker = ProbeWorker(worker_id=args.id)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: worker.stop())
+    worker.run()
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,13 @@
-from encrypt_strings import multi_pass_encrypt
+import logging
+from apis.credentials import get_credential_store
+
+logger = logging.getLogger(__name__)
 
 def registryUSRLOGIN(usr, pswd):
     if usr == "" or pswd == "":
         return "Username or password cannot be empty."
-    encryptedUSR = multi_pass_encrypt(usr)
-    encryptedPSWD = multi_pass_encrypt(pswd)
-    usrcheckedLine = ""
-    pswdcheckedLine = ""
-    with open("apis/encrypted_strings.txt", "r") as f:
-        usrcheckedLine = f.readline().strip()
-        pswdcheckedLine = f.readline().strip()
-    if usrcheckedLine == encryptedUSR and pswdcheckedLine == encryptedPSWD:
-        print(f"User '{usr}' logged in successfully.")
+    if get_credential_store().verify(usr, pswd):
+        logger.info("User %r logged in successfully", usr)
         return f"Logged in successfully!"
     else:
         return "Invalid username or password."
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""Serialized response bodies reused until what they were built from changes.
+
+Rendered pages are cached per template, and /api/websites bodies per
+registry version and query string, so repeated requests skip Jinja and
+JSON serialization entirely (and gzip, once a compressed copy exists).
+Keys are tuples whose first item is a namespace that can be invalidated
+as a whole; website_manager drops the 'websites' namespace whenever the
+registry changes. Entries are evicted least recently used first, past
+RESPONSE_CACHE_SIZE entries or RESPONSE_CACHE_MAX_BYTES of bodies.
+
+JSON is serialized with orjson when it is installed (it is optional and
+several times faster on large lists), otherwise with the json module.
+"""
+import collections
+import gzip
+import json
+import threading
+from apis.metrics import RESPONSE_CACHE
+from apis.settings import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_MAX_BYTES
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(obj):
+    """Serialize obj to compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+class CachedBody:
+    """A response body plus a gzip copy made the first time a client accepts one"""
+    __slots__ = ('data', 'mimetype', '_gzipped')
+
+    def __init__(self, data, mimetype):
+        self.data = data
+        self.mimetype = mimetype
+        self._gzipped = None
+
+    def gzipped(self):
+        # Racing threads may both compress; either result is the same
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.data, compresslevel=6)
+        return self._gzipped
+
+class ResponseCache:
+    """Size-bounded LRU of CachedBody objects keyed by (namespace, ...) tuples.
+
+    The byte bound counts uncompressed bodies only; gzip copies add at
+    most that much again. max_entries=0 disables caching.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        self.max_entries = RESPONSE_CACHE_SIZE if max_entries is None else max_entries
+        self.max_bytes = RESPONSE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()   # key -> CachedBody
+        self._bytes = 0
+
+    def get(self, key):
+        """The cached body for key, or None"""
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+        RESPONSE_CACHE.inc(namespace=key[0], result='miss' if body is None else 'hit')
+        return body
+
+    def put(self, key, data, mimetype):
+        """Cache data under key and return it as a CachedBody"""
+        body = CachedBody(data, mimetype)
+        if not self.max_entries or len(data) > self.max_bytes:
+            return body
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.data)
+            self._entries[key] = body
+            self._bytes += len(data)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.data)
+        return body
+
+    def invalidate(self, namespace=None):
+        """Drop every entry in a namespace, or everything"""
+        with self._lock:
+            for key in [key for key in self._entries if namespace is None or key[0] == namespace]:
+                self._bytes -= len(self._entries.pop(key).data)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Return the process-wide response cache, creating it on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
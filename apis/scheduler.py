@@ -0,0 +1,237 @@
+import heapq
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from apis.settings import (HEALTHCHECK_ENABLED, HEALTHCHECK_INTERVAL, HEALTHCHECK_CONCURRENCY, HEALTHCHECK_JITTER,
+                           HEALTHCHECK_MAX_BACKOFF, HEALTHCHECK_SITE_INTERVALS, PROBE_TIMEOUT as HEALTHCHECK_TIMEOUT,
+                           MULTI_WORKER, SCHEDULER_LOCK_PATH, PROBE_WORKERS)
+from apis.shared_store import get_shared_store
+from apis.website_storage import file_lock, website_key
+
+logger = logging.getLogger(__name__)
+
+def backoff_delay(base, failures, max_backoff, jitter):
+    """base seconds, doubled per consecutive failure up to max_backoff, with random jitter"""
+    if failures:
+        # Capped exponent: 2 ** failures overflows a float after ~1024 failures
+        base = min(base * (2 ** min(failures, 32)), max(max_backoff, base))
+    return base * (1 + random.uniform(-jitter, jitter))
+
+class HealthCheckScheduler:
+    """Re-probes every registered website in the background.
+
+    Each site is due again after its interval (HEALTHCHECK_INTERVAL, or a
+    per-site value from HEALTHCHECK_SITE_INTERVALS) plus random jitter.
+    Failing sites back off exponentially up to HEALTHCHECK_MAX_BACKOFF.
+    At most HEALTHCHECK_CONCURRENCY probes run at once; results are
+    persisted through website_manager.record_website_status and appended
+    to the probe history. With several workers only one runs the
+    scheduler (see start_scheduler) and per-site state is copied to the
+    shared store for the others.
+    """
+
+    def __init__(self, interval=None, concurrency=None, jitter=None, max_backoff=None,
+                 timeout=None, site_intervals=None, tick=1.0):
+        self.interval = interval or HEALTHCHECK_INTERVAL
+        self.concurrency = concurrency or HEALTHCHECK_CONCURRENCY
+        self.jitter = HEALTHCHECK_JITTER if jitter is None else jitter
+        self.max_backoff = max_backoff or HEALTHCHECK_MAX_BACKOFF
+        self.timeout = timeout or HEALTHCHECK_TIMEOUT
+        self.site_intervals = HEALTHCHECK_SITE_INTERVALS if site_intervals is None else site_intervals
+        self.tick = tick
+        self._lock = threading.Lock()
+        self._queue = []          # heap of (due_time, key)
+        self._sites = {}          # key -> per-site state, see _sync_sites
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._executor = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='healthcheck')
+        self._thread = threading.Thread(target=self.run, name='healthcheck-scheduler', daemon=True)
+        self._thread.start()
+        logger.info("Health-check scheduler started (interval %ss, concurrency %d)", self.interval, self.concurrency)
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def join(self):
+        if self._thread:
+            self._thread.join()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+    def next_delay(self, site):
+        """Seconds until a site is due again, with backoff and jitter"""
+        return backoff_delay(self.site_intervals.get(site['name'], self.interval), site['failures'],
+                             self.max_backoff, self.jitter)
+
+    def _sync_sites(self, now):
+        """Pick up added and removed websites from the registry"""
+        from apis.website_manager import get_all_websites
+
+        websites = get_all_websites()
+        current = set()
+        with self._lock:
+            for website in websites:
+                key = website_key(website['name'], website['url'])
+                current.add(key)
+                if key not in self._sites:
+                    # Spread the first round of probes so they don't all fire at once
+                    due = now + random.uniform(0, self.interval * self.jitter)
+                    self._sites[key] = {'name': website['name'], 'url': website['url'], 'failures': 0,
+                                        'last_checked': None, 'latency_ms': None, 'error': None,
+                                        'due': due, 'in_flight': False}
+                    heapq.heappush(self._queue, (due, key))
+            removed = [key for key in self._sites if key not in current]
+            for key in removed:
+                del self._sites[key]
+        if MULTI_WORKER:
+            for key in removed:
+                get_shared_store().delete('schedule', '\n'.join(key))
+
+    def run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            try:
+                self._sync_sites(now)
+                self._dispatch_due(now)
+            except Exception:
+                logger.exception("Health-check scheduler error")
+            self._stop.wait(self.tick)
+
+    def _dispatch_due(self, now):
+        while True:
+            with self._lock:
+                if not self._queue or self._queue[0][0] > now:
+                    return
+                due, key = heapq.heappop(self._queue)
+                site = self._sites.get(key)
+                # Skip entries for removed sites or superseded schedule slots
+                if site is None or site['due'] != due or site['in_flight']:
+                    continue
+                site['in_flight'] = True
+            # Blocks while the maximum number of probes are already running
+            self._slots.acquire()
+            self._executor.submit(self._probe, key, dict(site))
+
+    def _probe(self, key, site):
+        from apis.website_manager import probe_website, record_website_status
+
+        probe = {'ok': False, 'latency_ms': None, 'error': None}
+        try:
+            probe = probe_website(site['name'], site['url'], timeout=self.timeout)
+            record_website_status(site['name'], site['url'], probe['ok'])
+        except Exception as e:
+            logger.warning("Health check failed for %s: %s", site['name'], e)
+            probe['error'] = type(e).__name__
+        finally:
+            self._slots.release()
+
+        with self._lock:
+            current = self._sites.get(key)
+            if current is None:
+                return
+            current['in_flight'] = False
+            current['last_checked'] = time.time()
+            current['latency_ms'] = probe['latency_ms']
+            current['error'] = probe['error']
+            current['failures'] = 0 if probe['ok'] else current['failures'] + 1
+            current['due'] = time.monotonic() + self.next_delay(current)
+            heapq.heappush(self._queue, (current['due'], key))
+            entry = self._entry(current, time.monotonic())
+        if MULTI_WORKER:
+            entry['next_check_at'] = time.time() + entry.pop('next_check_in')
+            try:
+                get_shared_store().set('schedule', '\n'.join(key), entry)
+            except Exception as e:
+                logger.warning("Error sharing health-check state for %s: %s", site['name'], e)
+
+    @staticmethod
+    def _entry(site, now):
+        return {
+            'name': site['name'],
+            'url': site['url'],
+            'failures': site['failures'],
+            'last_checked': site['last_checked'],
+            'latency_ms': site['latency_ms'],
+            'error': site['error'],
+            'next_check_in': None if site['in_flight'] else round(max(0.0, site['due'] - now), 1),
+        }
+
+    def snapshot(self):
+        """Per-site scheduling state for the API"""
+        with self._lock:
+            now = time.monotonic()
+            return [self._entry(site, now) for site in self._sites.values()]
+
+_scheduler = None
+
+def get_scheduler():
+    """Return the process-wide scheduler (not started)"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = HealthCheckScheduler()
+    return _scheduler
+
+def _run_as_leader(scheduler):
+    """Wait until this worker holds the scheduler lock, then run the scheduler.
+
+    The lock is released when the worker exits, so if the running one dies
+    another worker takes over.
+    """
+    with file_lock(SCHEDULER_LOCK_PATH):
+        logger.info("Running the health-check scheduler in this worker")
+        scheduler.start()
+        scheduler.join()
+
+def start_scheduler():
+    """Start the background scheduler if HEALTHCHECK_ENABLED.
+
+    With several workers, every worker waits for the scheduler lock and
+    only the holder probes, so sites are not checked once per worker.
+    With PROBE_WORKERS the checks run in apis.prober processes instead.
+    """
+    if not HEALTHCHECK_ENABLED or PROBE_WORKERS:
+        return None
+    scheduler = get_scheduler()
+    if MULTI_WORKER:
+        threading.Thread(target=_run_as_leader, args=(scheduler,), name='healthcheck-leader', daemon=True).start()
+    else:
+        scheduler.start()
+    return scheduler
+
+def schedule_snapshot():
+    """Per-site health-check state, from whichever worker (or prober) runs the checks"""
+    scheduler = get_scheduler()
+    if scheduler.running or not (MULTI_WORKER or PROBE_WORKERS):
+        return scheduler.snapshot()
+    now = time.time()
+    entries = list(get_shared_store().items('schedule').values())
+    for entry in entries:
+        next_check_at = entry.pop('next_check_at', None)
+        entry['next_check_in'] = None if next_check_at is None else round(max(0.0, next_check_at - now), 1)
+    return entries
+
+if __name__ == "__main__":
+    # Standalone worker: python -m apis.scheduler
+    scheduler = get_scheduler()
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        scheduler.stop()
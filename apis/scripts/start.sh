@@ -1,4 +1,5 @@
 cd
+cd "$1" || exit 1
 
 docker-compose up -d --build
 
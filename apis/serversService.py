@@ -1,79 +1,70 @@
+import logging
 import subprocess
 import os
-import csv
-from dotenv import load_dotenv
+import time
+from apis.website_manager import get_all_websites, find_website_by_name
+from apis.jobs import get_job_manager
+from apis.metrics import JOBS_IN_FLIGHT, SUBPROCESS_LATENCY
+from apis.settings import START_PATH as startPath, STOP_PATH as stopPath
 
-load_dotenv()
-
-startPath = os.getenv('START_PATH')
-stopPath = os.getenv('STOP_PATH')
-CSV_FILE_PATH = os.path.join(os.path.dirname(__file__), '..', 'instances', 'websites.csv')
-
-if not os.path.exists(CSV_FILE_PATH):
-    print("Websites CSV file does not exist.")
+logger = logging.getLogger(__name__)
 
 def getNamesFromCSV():
     names = []
     try:
-        with open(CSV_FILE_PATH, 'r', newline='', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                names.append(row['name'])
+        names = [website['name'] for website in get_all_websites()]
     except Exception as e:
-        print(f"Error reading CSV for names: {e}")
+        logger.warning("Error reading website names: %s", e)
     return names
         
 def checkIDInCSVNames(input_name):
     try:
-        with open(CSV_FILE_PATH, 'r', newline='', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if row['name'].lower() == input_name.lower():
-                    return True, row['name']
+        website = find_website_by_name(input_name)
+        if website:
+            return True, website['name']
     except Exception as e:
-        print(f"Error checking ID in CSV names: {e}")
+        logger.warning("Error checking ID in website names: %s", e)
     return False, None
 
+def _run_script(job, script_path, valid_name):
+    """Run a start/stop script for one site, streaming output into the job log"""
+    # The site is passed as $1 and $SITE_NAME; the shared script is never
+    # modified, so jobs for different sites can safely run at the same time.
+    env = dict(os.environ, SITE_NAME=valid_name)
+    JOBS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    returncode = None
+    try:
+        process = subprocess.Popen(['bash', script_path, valid_name], stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, text=True, bufsize=1, env=env)
+        for line in process.stdout:
+            job.append_log(line)
+        returncode = process.wait()
+        return returncode
+    finally:
+        JOBS_IN_FLIGHT.dec()
+        SUBPROCESS_LATENCY.observe(time.perf_counter() - start, action=job.action,
+                                   returncode='error' if returncode is None else returncode)
+
+def _queue_action(id, action, script_path):
+    if not id:
+        return {"success": False, "error": "No ID provided"}
+    exists, valid_name = checkIDInCSVNames(id)
+    if not exists:
+        return {"success": False, "error": f"ID '{id}' not found in CSV"}
+    if not script_path:
+        return {"success": False, "error": f"No {action} script configured"}
+    job = get_job_manager().submit(action, valid_name, lambda job: _run_script(job, script_path, valid_name))
+    return {"success": True, "message": f"Server {action} queued", "job_id": job.id}
+
 def start(id):
     try:
-        if not id:
-            return {"success": False, "error": "No ID provided"}
-        exists, valid_name = checkIDInCSVNames(id)
-        if not exists:
-            return {"success": False, "error": f"ID '{id}' not found in CSV"}
-        #change second line in start.sh to use the valid_name
-        with open(startPath, 'r') as file:
-            lines = file.readlines()
-        if len(lines) >= 2:
-            lines[1] = f"cd {valid_name}\n"  # Replace the second line
-            with open(startPath, 'w') as file:
-                file.writelines(lines)
-        # start the server using the startPath script
-        result = subprocess.run(['bash', startPath], check=True, capture_output=True, text=True)
-        return {"success": True, "message": "Server started successfully", "output": result.stdout}
-    except subprocess.CalledProcessError as e:
-        return {"success": False, "error": f"Failed to start server: {e.stderr}"}
+        return _queue_action(id, 'start', startPath)
     except Exception as e:
         return {"success": False, "error": f"Unexpected error: {str(e)}"}
     
 def stop(id):
     try:
-        if not id:
-            return {"success": False, "error": "No ID provided"}
-        exists, valid_name = checkIDInCSVNames(id)
-        if not exists:
-            return {"success": False, "error": f"ID '{id}' not found in CSV"}
-        #change second line in stop.sh to use the valid_name
-        with open(stopPath, 'r') as file:
-            lines = file.readlines()
-        if len(lines) >= 2:
-            lines[1] = f"cd {valid_name}\n"  # Replace the second line
-            with open(stopPath, 'w') as file:
-                file.writelines(lines)
-        # stop the server using the stopPath script
-        result = subprocess.run(['bash', stopPath], check=True, capture_output=True, text=True)
-        return {"success": True, "message": "Server stopped successfully", "output": result.stdout}
-    except subprocess.CalledProcessError as e:
-        return {"success": False, "error": f"Failed to stop server: {e.stderr}"}
+        return _queue_action(id, 'stop', stopPath)
     except Exception as e:
-        return {"success": False, "error": f"Unexpected error: {str(e)}"}
\ No newline at end of file
+        return {"success": False, "error": f"Unexpected error: {str(e)}"}
@@ -0,0 +1,207 @@
+"""Runtime configuration for the web app, the scheduler and the workers.
+
+Everything is read once from the environment (and .env) at import. Every
+gunicorn worker imports the same module, so all workers agree on paths,
+limits and the session signing key.
+"""
+import os
+import secrets
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def env_bool(name, default):
+    return os.getenv(name, 'true' if default else 'false').lower() in ('1', 'true', 'yes')
+
+def parse_intervals(value):
+    """Parse per-site intervals from 'name=seconds,other=seconds'"""
+    intervals = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            name, seconds = item.rsplit('=', 1)
+            intervals[name.strip()] = float(seconds)
+    return intervals
+
+# --- Paths ---
+# The code, templates and static files live in APP_DIR; data lives under BASE_DIR
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_DIR = APP_DIR
+# Check if running in Docker container
+if os.path.exists('/.dockerenv'):
+    # Ensure we're using the mounted volume path
+    BASE_DIR = '/app'
+INSTANCES_DIR = os.getenv('INSTANCES_DIR', os.path.join(BASE_DIR, 'instances'))
+CSV_FILE_PATH = os.path.join(INSTANCES_DIR, 'websites.csv')
+
+# Storage backend: 'sqlite' (default) or 'csv'. The CSV file is imported into
+# SQLite once and remains available as an export format.
+WEBSITE_STORAGE = os.getenv('WEBSITE_STORAGE', 'sqlite').lower()
+DB_FILE_PATH = os.getenv('WEBSITE_DB_PATH', os.path.join(INSTANCES_DIR, 'websites.db'))
+HISTORY_DB_PATH = os.getenv('HISTORY_DB_PATH', os.path.join(INSTANCES_DIR, 'history.db'))
+# Job status, scheduler state and cross-worker events
+SHARED_DB_PATH = os.getenv('SHARED_DB_PATH', os.path.join(INSTANCES_DIR, 'shared.db'))
+SECRET_KEY_PATH = os.getenv('SECRET_KEY_PATH', os.path.join(INSTANCES_DIR, 'secret_key'))
+# Fingerprinted, pre-compressed copies of static/ (see apis/assets.py)
+ASSETS_DIR = os.getenv('ASSETS_DIR', os.path.join(APP_DIR, 'static_build'))
+# Held by the one worker that runs the health-check scheduler
+SCHEDULER_LOCK_PATH = os.path.join(INSTANCES_DIR, 'scheduler.lock')
+# One lock file per site, so start/stop jobs for a site never overlap across workers
+JOB_LOCK_DIR = os.path.join(INSTANCES_DIR, 'jobs')
+
+# The CSV append journal is folded back into the file once it grows past this
+CSV_JOURNAL_MAX_BYTES = int(os.getenv('CSV_JOURNAL_MAX_BYTES', str(256 * 1024)))
+# Number of per-website changes remembered for delta reads
+REGISTRY_CHANGE_LOG = int(os.getenv('REGISTRY_CHANGE_LOG', '5000'))
+
+# --- Server profile (read by gunicorn.conf.py) ---
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+# 'gthread' (default) or 'gevent' (requires the gevent package)
+WORKER_CLASS = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+WORKER_THREADS = int(os.getenv('GUNICORN_THREADS', '32'))
+WORKER_CONNECTIONS = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+BIND = os.getenv('BIND', '0.0.0.0:8454')
+# Worker processes share state through SHARED_DB_PATH when there is more than one
+MULTI_WORKER = WEB_CONCURRENCY > 1
+
+# --- HTTP ---
+# Responses at least this large are gzipped for clients that accept it
+GZIP_MIN_SIZE = int(os.getenv('GZIP_MIN_SIZE', '1024'))
+# Paging limits for GET /api/websites
+WEBSITES_PAGE_SIZE = int(os.getenv('WEBSITES_PAGE_SIZE', '50'))
+WEBSITES_MAX_PAGE_SIZE = int(os.getenv('WEBSITES_MAX_PAGE_SIZE', '500'))
+# Rendered pages and website list bodies kept for reuse (0 disables), and
+# the most bytes of bodies kept per worker
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '256'))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Largest accepted website import upload, and operations per batch
+IMPORT_MAX_BYTES = int(os.getenv('IMPORT_MAX_BYTES', str(5 * 1024 * 1024)))
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '5000'))
+# CSV imports (non-atomic) are read as they upload and applied CSV_CHUNK_ROWS
+# rows at a time, so they may be up to IMPORT_STREAM_MAX_BYTES; exports are
+# streamed in chunks of as many rows
+CSV_CHUNK_ROWS = min(int(os.getenv('CSV_CHUNK_ROWS', '1000')), BATCH_MAX_ITEMS)
+IMPORT_STREAM_MAX_BYTES = int(os.getenv('IMPORT_STREAM_MAX_BYTES', str(1024 * 1024 * 1024)))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# --- Probes ---
+PROBE_CONNECT_TIMEOUT = float(os.getenv('PROBE_CONNECT_TIMEOUT', '3'))
+PROBE_TIMEOUT = float(os.getenv('PROBE_TIMEOUT', '5'))
+PROBE_FOLLOW_REDIRECTS = env_bool('PROBE_FOLLOW_REDIRECTS', True)
+PROBE_MAX_REDIRECTS = int(os.getenv('PROBE_MAX_REDIRECTS', '5'))
+PROBE_POOL_HOSTS = int(os.getenv('PROBE_POOL_HOSTS', '100'))
+PROBE_POOL_SIZE = int(os.getenv('PROBE_POOL_SIZE', '10'))
+PROBE_USER_AGENT = os.getenv('PROBE_USER_AGENT', 'portfolioCMS-probe/1.0')
+# 'async' (default): one asyncio event loop per worker runs every probe;
+# 'requests': the blocking requests session in apis/websiteQuery.py
+PROBE_ENGINE = os.getenv('PROBE_ENGINE', 'async').lower()
+# Async engine limits: probes in flight, per host (halved while a host
+# times out) and per resolved IP; DNS answers are cached for PROBE_DNS_TTL
+PROBE_MAX_IN_FLIGHT = int(os.getenv('PROBE_MAX_IN_FLIGHT', '2000'))
+PROBE_HOST_CONCURRENCY = int(os.getenv('PROBE_HOST_CONCURRENCY', '8'))
+PROBE_IP_CONCURRENCY = int(os.getenv('PROBE_IP_CONCURRENCY', '16'))
+PROBE_DNS_TTL = float(os.getenv('PROBE_DNS_TTL', '300'))
+# After PROBE_BREAKER_THRESHOLD connection-level failures in a row a host is
+# skipped for PROBE_BREAKER_COOLDOWN seconds, doubling with every further
+# failure up to PROBE_BREAKER_MAX_COOLDOWN
+PROBE_BREAKER_THRESHOLD = int(os.getenv('PROBE_BREAKER_THRESHOLD', '3'))
+PROBE_BREAKER_COOLDOWN = float(os.getenv('PROBE_BREAKER_COOLDOWN', '30'))
+PROBE_BREAKER_MAX_COOLDOWN = float(os.getenv('PROBE_BREAKER_MAX_COOLDOWN', '600'))
+# Probe results are reused for this many seconds (0 disables the cache;
+# concurrent probes of one URL are still merged) and at most this many kept
+PROBE_CACHE_TTL = float(os.getenv('PROBE_CACHE_TTL', '10'))
+PROBE_CACHE_SIZE = int(os.getenv('PROBE_CACHE_SIZE', '1024'))
+# Threads for bulk checks with the requests engine, and the most a
+# check-all request may ask for
+CHECK_ALL_CONCURRENCY = int(os.getenv('CHECK_ALL_CONCURRENCY', '16'))
+
+# --- Background health checks ---
+HEALTHCHECK_ENABLED = env_bool('HEALTHCHECK_ENABLED', True)
+HEALTHCHECK_INTERVAL = float(os.getenv('HEALTHCHECK_INTERVAL', '60'))
+HEALTHCHECK_CONCURRENCY = int(os.getenv('HEALTHCHECK_CONCURRENCY', '8'))
+HEALTHCHECK_JITTER = float(os.getenv('HEALTHCHECK_JITTER', '0.1'))
+HEALTHCHECK_MAX_BACKOFF = float(os.getenv('HEALTHCHECK_MAX_BACKOFF', '900'))
+HEALTHCHECK_SITE_INTERVALS = parse_intervals(os.getenv('HEALTHCHECK_SITE_INTERVALS'))
+# Health checks run in `python -m apis.prober` processes instead of the web
+# app, which then neither schedules probes nor expects to be the only writer
+PROBE_WORKERS = env_bool('PROBE_WORKERS', False)
+# Seconds between prober heartbeats; a prober silent for three is considered gone
+PROBER_HEARTBEAT = float(os.getenv('PROBER_HEARTBEAT', '5'))
+# Points per prober on the hash ring (more points, more even shards)
+PROBER_VNODES = int(os.getenv('PROBER_VNODES', '64'))
+# URLs probed together, and batches in flight per prober
+PROBER_BATCH_SIZE = int(os.getenv('PROBER_BATCH_SIZE', '500'))
+PROBER_BATCHES = int(os.getenv('PROBER_BATCHES', '4'))
+# Results are reported this often (seconds), or as soon as a batch's worth is waiting
+PROBER_REPORT_INTERVAL = float(os.getenv('PROBER_REPORT_INTERVAL', '2'))
+
+# --- Probe history retention ---
+HISTORY_RAW_RETENTION_HOURS = float(os.getenv('HISTORY_RAW_RETENTION_HOURS', '48'))
+HISTORY_HOURLY_RETENTION_DAYS = float(os.getenv('HISTORY_HOURLY_RETENTION_DAYS', '90'))
+HISTORY_DAILY_RETENTION_DAYS = float(os.getenv('HISTORY_DAILY_RETENTION_DAYS', '730'))
+
+# --- Start/stop jobs ---
+START_PATH = os.getenv('START_PATH')
+STOP_PATH = os.getenv('STOP_PATH')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_LOG_LINES = int(os.getenv('JOB_LOG_LINES', '500'))
+JOB_HISTORY = int(os.getenv('JOB_HISTORY', '200'))
+# How long finished jobs stay readable from other workers
+JOB_RETENTION = float(os.getenv('JOB_RETENTION', '86400'))
+
+# --- Server-Sent Events ---
+SSE_QUEUE_SIZE = int(os.getenv('SSE_QUEUE_SIZE', '1000'))
+SSE_KEEPALIVE = float(os.getenv('SSE_KEEPALIVE', '15'))
+# Streams are closed after this long; EventSource reconnects on its own,
+# which keeps a worker thread from being held forever by an idle tab
+SSE_MAX_SECONDS = float(os.getenv('SSE_MAX_SECONDS', '300'))
+# How often each worker picks up events published by the other workers
+SSE_BRIDGE_INTERVAL = float(os.getenv('SSE_BRIDGE_INTERVAL', '0.5'))
+
+# --- Credentials and login ---
+# scrypt cost parameters used when writing new records; existing records
+# keep the parameters they were written with
+SCRYPT_N = int(os.getenv('CREDENTIAL_SCRYPT_N', str(2 ** 14)))
+SCRYPT_R = int(os.getenv('CREDENTIAL_SCRYPT_R', '8'))
+SCRYPT_P = int(os.getenv('CREDENTIAL_SCRYPT_P', '1'))
+# Each client gets LOGIN_MAX_ATTEMPTS attempts that refill evenly over
+# LOGIN_WINDOW seconds
+LOGIN_MAX_ATTEMPTS = int(os.getenv('LOGIN_MAX_ATTEMPTS', '5'))
+LOGIN_WINDOW = float(os.getenv('LOGIN_WINDOW', '300'))
+
+# --- Logging ---
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# Per-module overrides, e.g. "apis.website_manager=DEBUG,apis.scheduler=WARNING"
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+
+def load_secret_key(path=None):
+    """SECRET_KEY from the environment, else a key generated once and kept
+    in the instances directory so every worker (and restart) signs
+    sessions with the same key"""
+    key = os.getenv('SECRET_KEY')
+    if key:
+        return key
+    path = path or SECRET_KEY_PATH
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            key = file.read().strip()
+        if key:
+            return key
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), mode=0o755, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(secrets.token_hex(32))
+        file.flush()
+        os.fsync(file.fileno())
+    os.chmod(tmp_path, 0o600)
+    try:
+        # link() fails if another worker created the key first; theirs wins
+        os.link(tmp_path, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(tmp_path)
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read().strip()
@@ -0,0 +1,139 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from apis.settings import SHARED_DB_PATH
+
+class SharedStore:
+    """State shared by every worker process, kept in one SQLite file (WAL).
+
+    A namespaced key/value table holds JSON values with an optional expiry
+    (job status, scheduler state, login attempts). An append-only events
+    table carries dashboard events between workers; see apis.events.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS kv (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            expires REAL,
+            PRIMARY KEY (namespace, key)
+        );
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            origin TEXT NOT NULL,
+            event TEXT NOT NULL,
+            data TEXT NOT NULL,
+            created REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), mode=0o755, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self.SCHEMA)
+
+    def get(self, namespace, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM kv WHERE namespace = ? AND key = ? AND (expires IS NULL OR expires > ?)',
+                (namespace, key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, namespace, key, value, ttl=None):
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO kv (namespace, key, value, expires) VALUES (?, ?, ?, ?)',
+                               (namespace, key, json.dumps(value), expires))
+
+    def set_many(self, namespace, values, ttl=None):
+        """Write {key: value} in one transaction"""
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO kv (namespace, key, value, expires) VALUES (?, ?, ?, ?)',
+                    [(namespace, key, json.dumps(value), expires) for key, value in values.items()])
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def update(self, namespace, key, fn, ttl=None):
+        """Atomically replace a value with fn(old value or None); returns the new value.
+
+        The read and the write happen in one write transaction, so two
+        workers updating the same key never lose each other's change.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    'SELECT value FROM kv WHERE namespace = ? AND key = ? AND (expires IS NULL OR expires > ?)',
+                    (namespace, key, now)).fetchone()
+                value = fn(json.loads(row[0]) if row else None)
+                self._conn.execute('INSERT OR REPLACE INTO kv (namespace, key, value, expires) VALUES (?, ?, ?, ?)',
+                                   (namespace, key, json.dumps(value), now + ttl if ttl else None))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return value
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM kv WHERE namespace = ? AND key = ?', (namespace, key))
+
+    def items(self, namespace):
+        """Every live {key: value} in a namespace"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT key, value FROM kv WHERE namespace = ? AND (expires IS NULL OR expires > ?)',
+                (namespace, time.time())).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def purge_expired(self):
+        with self._lock:
+            return self._conn.execute('DELETE FROM kv WHERE expires IS NOT NULL AND expires <= ?',
+                                      (time.time(),)).rowcount
+
+    def append_event(self, origin, event, data):
+        with self._lock:
+            self._conn.execute('INSERT INTO events (origin, event, data, created) VALUES (?, ?, ?, ?)',
+                               (origin, event, json.dumps(data), time.time()))
+
+    def last_event_id(self):
+        with self._lock:
+            return self._conn.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+
+    def events_after(self, last_id, limit=1000):
+        """Return [(id, origin, event, data)] with id > last_id, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, origin, event, data FROM events WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, limit)).fetchall()
+        return [(event_id, origin, event, json.loads(data)) for event_id, origin, event, data in rows]
+
+    def prune_events(self, max_age):
+        with self._lock:
+            return self._conn.execute('DELETE FROM events WHERE created < ?', (time.time() - max_age,)).rowcount
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_shared_store():
+    """Return this process's connection to the shared store, opening it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SharedStore(SHARED_DB_PATH)
+    return _store
@@ -1,11 +1,106 @@
-import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from apis.async_probe import get_async_prober
+from apis.metrics import PROBE_LATENCY, PROBE_RESULTS, PROBES_IN_FLIGHT
+from apis.settings import (PROBE_CONNECT_TIMEOUT, PROBE_TIMEOUT as PROBE_READ_TIMEOUT, PROBE_FOLLOW_REDIRECTS,
+                           PROBE_MAX_REDIRECTS, PROBE_POOL_HOSTS, PROBE_POOL_SIZE, PROBE_USER_AGENT, PROBE_ENGINE,
+                           CHECK_ALL_CONCURRENCY)
 
-def testWebsite(url):
+# Status codes after which a HEAD is retried as a GET, because many servers
+# reject or mishandle HEAD while serving GET fine
+HEAD_FALLBACK_STATUSES = {400, 403, 404, 405, 501}
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Shared keep-alive session with a connection pool per host"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # requests is only imported when the requests engine is used
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=PROBE_POOL_HOSTS, pool_maxsize=PROBE_POOL_SIZE, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.max_redirects = PROBE_MAX_REDIRECTS
+                session.headers['User-Agent'] = PROBE_USER_AGENT
+                _session = session
+    return _session
+
+def _failure_reason(error):
+    import requests
+    if isinstance(error, requests.Timeout):
+        return 'timeout'
+    if isinstance(error, requests.exceptions.SSLError):
+        return 'ssl_error'
+    if isinstance(error, requests.TooManyRedirects):
+        return 'too_many_redirects'
+    if isinstance(error, requests.ConnectionError):
+        return 'connection_error'
+    if isinstance(error, (requests.exceptions.InvalidURL, requests.exceptions.MissingSchema,
+                          requests.exceptions.InvalidSchema)):
+        return 'invalid_url'
+    return type(error).__name__
+
+def probeWebsite(url, timeout=None, connect_timeout=None, follow_redirects=None):
+    """Probe a URL and return a result dict.
+
+    Tries HEAD first and falls back to a streamed GET that is closed as soon
+    as the headers arrive, so response bodies are never downloaded. The
+    result has ok, status_code, latency_ms, method and error (None on
+    success, otherwise a short failure reason).
+    """
+    read_timeout = timeout or PROBE_READ_TIMEOUT
+    connect_timeout = min(connect_timeout or PROBE_CONNECT_TIMEOUT, read_timeout)
+    follow_redirects = PROBE_FOLLOW_REDIRECTS if follow_redirects is None else follow_redirects
+    session = get_session()
+    import requests
+    result = {'url': url, 'ok': False, 'status_code': None, 'latency_ms': None, 'method': 'HEAD', 'error': None}
+
+    PROBES_IN_FLIGHT.inc()
+    start = time.perf_counter()
     try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            return True
-        else:
-            return False
-    except requests.RequestException:
-        return False
\ No newline at end of file
+        response = session.head(url, timeout=(connect_timeout, read_timeout), allow_redirects=follow_redirects)
+        response.close()
+        if response.status_code in HEAD_FALLBACK_STATUSES:
+            result['method'] = 'GET'
+            response = session.get(url, timeout=(connect_timeout, read_timeout),
+                                   allow_redirects=follow_redirects, stream=True)
+            response.close()
+        result['status_code'] = response.status_code
+        result['ok'] = response.status_code == 200
+        if not result['ok']:
+            result['error'] = f"http_{response.status_code}"
+    except requests.RequestException as e:
+        result['error'] = _failure_reason(e)
+    finally:
+        PROBES_IN_FLIGHT.dec()
+    elapsed = time.perf_counter() - start
+    PROBE_LATENCY.observe(elapsed, method=result['method'])
+    PROBE_RESULTS.inc(result='ok' if result['ok'] else result['error'])
+    result['latency_ms'] = round(elapsed * 1000, 1)
+    return result
+
+def probe(url, timeout=None):
+    """Probe a URL with the configured PROBE_ENGINE"""
+    if PROBE_ENGINE == 'async':
+        return get_async_prober().probe(url, timeout=timeout)
+    return probeWebsite(url, timeout=timeout)
+
+def probe_many(urls, timeout=None, concurrency=None):
+    """Probe many URLs at once (at most concurrency in flight); results in order"""
+    if PROBE_ENGINE == 'async':
+        return get_async_prober().probe_many(urls, timeout=timeout, concurrency=concurrency)
+    urls = list(urls)
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency or CHECK_ALL_CONCURRENCY, len(urls)))) as executor:
+        return list(executor.map(lambda url: probeWebsite(url, timeout=timeout), urls))
+
+def testWebsite(url, timeout=None):
+    return probe(url, timeout=timeout)['ok']
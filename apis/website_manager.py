@@ -1,45 +1,37 @@
 import csv
+import io
+import itertools
+import json
+import logging
 import os
-from apis.websiteQuery import testWebsite
+import threading
+from apis.csv_stream import CSVReport, iter_csv_chunks, parse_rows, unique_records
+from apis.websiteQuery import probe, probe_many
+from apis.probe_cache import get_probe_cache
+from apis.response_cache import get_response_cache
+from apis.probe_history import ProbeHistory, site_key
+from apis.events import publish
+from apis.settings import (BASE_DIR, CSV_FILE_PATH, WEBSITE_STORAGE, DB_FILE_PATH, HISTORY_DB_PATH,
+                           CHECK_ALL_CONCURRENCY, PROBE_TIMEOUT, BATCH_MAX_ITEMS, CSV_CHUNK_ROWS)
+from apis.website_registry import WebsiteRegistry
+from apis.website_storage import CSVStorage, SQLiteStorage, FIELDNAMES, normalize_url
 
-# Use absolute path based on the current file's location
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+logger = logging.getLogger(__name__)
 
-# Check if running in Docker container
-if os.path.exists('/.dockerenv'):
-    print("Running in Docker container")
-    # Ensure we're using the mounted volume path
-    BASE_DIR = '/app'
-    
-CSV_FILE_PATH = os.path.join(BASE_DIR, 'instances', 'websites.csv')
-
-print(f"BASE_DIR: {BASE_DIR}")  # Debug logging
-print(f"CSV_FILE_PATH: {CSV_FILE_PATH}")  # Debug logging
-print(f"Running in Docker: {os.path.exists('/.dockerenv')}")  # Debug logging
+BATCH_OPERATIONS = ('add', 'edit', 'delete')
 
-def normalize_url(url):
-    """Normalize URL by removing trailing slash for comparison"""
-    if url and url.endswith('/'):
-        return url.rstrip('/')
-    return url
+logger.debug("Using BASE_DIR=%s CSV_FILE_PATH=%s docker=%s", BASE_DIR, CSV_FILE_PATH, os.path.exists('/.dockerenv'))
 
 def ensure_csv_exists():
     """Create CSV file and directory if they don't exist"""
-    instances_dir = os.path.join(BASE_DIR, 'instances')
-    print(f"Ensuring directory exists: {instances_dir}")  # Debug
-    print(f"Current working directory: {os.getcwd()}")  # Debug
-    print(f"BASE_DIR: {BASE_DIR}")  # Debug
-    print(f"__file__: {__file__}")  # Debug
+    instances_dir = os.path.dirname(CSV_FILE_PATH)
+    logger.debug("Ensuring directory exists: %s (cwd %s)", instances_dir, os.getcwd())
     
     # Create directory with proper permissions
     os.makedirs(instances_dir, mode=0o755, exist_ok=True)
     
-    # Check if directory is writable
-    if os.path.exists(instances_dir):
-        print(f"Directory exists and is writable: {os.access(instances_dir, os.W_OK)}")  # Debug
-    
     if not os.path.exists(CSV_FILE_PATH):
-        print(f"Creating CSV file: {CSV_FILE_PATH}")  # Debug
+        logger.info("Creating CSV file: %s", CSV_FILE_PATH)
         try:
             with open(CSV_FILE_PATH, 'w', newline='', encoding='utf-8') as file:
                 writer = csv.writer(file)
@@ -48,199 +40,424 @@ def ensure_csv_exists():
             
             # Set file permissions
             os.chmod(CSV_FILE_PATH, 0o666)
-            print(f"CSV file created successfully: {CSV_FILE_PATH}")
-        except Exception as e:
-            print(f"Error creating CSV file: {e}")
+        except Exception:
+            logger.exception("Error creating CSV file %s", CSV_FILE_PATH)
             raise
-    else:
-        print(f"CSV file already exists: {CSV_FILE_PATH}")
 
-def get_all_websites():
-    """Get all websites from CSV"""
-    ensure_csv_exists()
-    websites = []
-    
-    print(f"Reading from CSV: {CSV_FILE_PATH}")  # Debug
-    
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    """Return the process-wide website registry, creating it on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = WebsiteRegistry(create_storage())
+                registry.add_listener(_invalidate_responses)
+                registry.add_listener(_publish_change)
+                registry.add_listener(_move_history)
+                _registry = registry
+    return _registry
+
+def _invalidate_responses(change, website, previous):
+    """Drop cached website list bodies; the next request rebuilds them at the new version"""
+    get_response_cache().invalidate('websites')
+
+def _publish_change(change, website, previous):
+    """Push registry changes to connected dashboards (SSE)"""
+    publish('website', {'change': change, 'website': website, 'previous': previous})
+
+def _move_history(change, website, previous):
+    """Keep a website's probe history when an edit changes its name or URL"""
+    if change != 'updated':
+        return
+    old, new = site_key(previous['name'], previous['url']), site_key(website['name'], website['url'])
+    if old == new:
+        return
     try:
-        if not os.path.exists(CSV_FILE_PATH):
-            print(f"CSV file does not exist: {CSV_FILE_PATH}")
-            return websites
-            
-        with open(CSV_FILE_PATH, 'r', newline='', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                # Clean up any whitespace and filter out malformed rows
-                cleaned_row = {k.strip(): v.strip() if v else v for k, v in row.items() if k}
-                if all(cleaned_row.get(key) for key in ['name', 'url', 'status']):
-                    websites.append(cleaned_row)
-                else:
-                    print(f"Skipping malformed row: {row}")
-                    
-        print(f"Loaded {len(websites)} websites from CSV")  # Debug
-    except FileNotFoundError:
-        print(f"CSV file not found: {CSV_FILE_PATH}")
+        get_history().rename(old, new)
+    except Exception as e:
+        logger.warning("Error moving probe history of %s: %s", website['name'], e)
+
+def create_storage():
+    """Build the configured storage backend"""
+    if WEBSITE_STORAGE == 'csv':
+        return CSVStorage(CSV_FILE_PATH, on_missing=ensure_csv_exists)
+    if WEBSITE_STORAGE == 'sqlite':
+        ensure_csv_exists()
+        return SQLiteStorage(DB_FILE_PATH, import_csv_path=CSV_FILE_PATH)
+    raise ValueError(f"Unknown WEBSITE_STORAGE backend: {WEBSITE_STORAGE}")
+
+_history = None
+_history_lock = threading.Lock()
+
+def get_history():
+    """Return the process-wide probe history store, creating it on first use"""
+    global _history
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                history = ProbeHistory(HISTORY_DB_PATH)
+                try:
+                    history.adopt_legacy(get_all_websites())
+                except Exception as e:
+                    logger.warning("Error migrating probe history: %s", e)
+                _history = history
+    return _history
+
+def probe_url(url, timeout=None, force=False):
+    """Probe a URL through the probe cache.
+
+    The result has a 'cached' flag, True when it came from the cache or
+    from another caller's probe of the same URL.
+    """
+    result, fresh = get_probe_cache().get_or_probe(url, lambda u: probe(u, timeout=timeout), force=force)
+    return dict(result, cached=not fresh)
+
+def _record_history(name, url, result):
+    # Reused results were already recorded by the probe that produced them
+    if result['cached']:
+        return
+    try:
+        get_history().record(site_key(name, url), result)
     except Exception as e:
-        print(f"Error reading CSV: {e}")
-        
-    return websites
+        logger.warning("Error recording probe history for %s: %s", name, e)
+
+def probe_website(name, url, timeout=None, force=False):
+    """Probe a website and append the result to its history"""
+    result = probe_url(url, timeout=timeout, force=force)
+    _record_history(name, url, result)
+    return result
+
+def probe_websites(targets, timeout=None, concurrency=None, force=False):
+    """Probe many (name, url) targets at once; results in order, each recorded in history"""
+    targets = list(targets)
+    cached = get_probe_cache().get_or_probe_many(
+        [url for _, url in targets],
+        lambda urls: probe_many(urls, timeout=timeout, concurrency=concurrency), force=force)
+    results = []
+    for (name, url), (result, fresh) in zip(targets, cached):
+        result = dict(result, cached=not fresh)
+        _record_history(name, url, result)
+        results.append(result)
+    return results
+
+def get_website_history(name, url=None, window_hours=24):
+    """Uptime and latency summary for a website over the last window_hours.
+
+    Without url the first website with that name (case-insensitive) is
+    used. Returns None if there is no such website.
+    """
+    website = get_website(name, url) if url else find_website_by_name(name)
+    if website is None:
+        return None
+    summary = get_history().summary(site_key(website['name'], website['url']), window_hours=window_hours)
+    return dict(summary, name=website['name'], url=website['url'])
+
+def get_all_websites():
+    """Get all websites (served from the in-memory registry)"""
+    return get_registry().all()
+
+def get_websites_version():
+    """Current registry version (changes on every mutation)"""
+    return get_registry().version()
+
+def get_websites_snapshot():
+    """Return (version, all websites)"""
+    return get_registry().snapshot()
+
+def get_website_changes(since):
+    """Return (version, changed, removed) since a version, or None if a full reload is needed"""
+    return get_registry().changes_since(since)
+
+def get_websites_page(sort=None, descending=False, status=None, query=None, limit=50, cursor=None):
+    """Return (version, websites, next_cursor) for one sorted/filtered page"""
+    return get_registry().page(sort=sort, descending=descending, status=status, query=query,
+                               limit=limit, cursor=cursor)
+
+def get_website(name, url):
+    """Get a single website by name and URL, or None"""
+    return get_registry().get(name, url)
+
+def find_website_by_name(name):
+    """Case-insensitive lookup by name, or None"""
+    return get_registry().find_by_name(name)
+
+def export_websites_chunks(fmt='csv', chunk_size=None):
+    """Iterate over every website as CSV or JSON bytes, chunk_size websites per chunk.
+
+    The snapshot is taken when called, so errors surface before the first
+    chunk is sent. JSON is {"websites": [...]}, which imports back as is.
+    """
+    if fmt not in ('csv', 'json'):
+        raise ValueError("Export format must be csv or json")
+    _, websites = get_websites_snapshot()
+    chunk_size = chunk_size or CSV_CHUNK_ROWS
+    if fmt == 'csv':
+        return iter_csv_chunks(websites, chunk_size)
+    return _iter_json_chunks(websites, chunk_size)
+
+def _iter_json_chunks(websites, chunk_size):
+    yield b'{"websites": ['
+    for start in range(0, len(websites), chunk_size):
+        chunk = ', '.join(json.dumps({key: website[key] for key in FIELDNAMES})
+                          for website in websites[start:start + chunk_size])
+        yield (', ' + chunk if start else chunk).encode('utf-8')
+    yield b']}'
 
 def add_website(name, url):
-    """Add a new website to CSV"""
-    ensure_csv_exists()
-    
+    """Add a new website"""
     # Clean the inputs
     name = name.strip()
     url = normalize_url(url.strip())
     
-    print(f"Adding website: {name} -> {url}")  # Debug
+    logger.debug("Adding website: %s -> %s", name, url)
     
     # Test the website first
-    is_active = testWebsite(url)
+    is_active = probe_website(name, url)['ok']
     status = 'active' if is_active else 'inactive'
     
     try:
-        # Check if file ends with newline, if not add one
-        if os.path.exists(CSV_FILE_PATH):
-            with open(CSV_FILE_PATH, 'r', encoding='utf-8') as file:
-                content = file.read()
-                if content and not content.endswith('\n'):
-                    with open(CSV_FILE_PATH, 'a', encoding='utf-8') as append_file:
-                        append_file.write('\n')
-        
-        # Append new website
-        with open(CSV_FILE_PATH, 'a', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow([name, url, status])
-            
-        print(f"Successfully added website: {name}")  # Debug
-        
-        # Verify the write by reading it back
-        websites = get_all_websites()
-        added_website = next((w for w in websites if w['name'] == name and w['url'] == url), None)
-        if added_website:
-            print(f"Verified: Website {name} was added successfully")
-            return added_website
-        else:
-            print(f"Warning: Website {name} was not found after adding")
-            return {'name': name, 'url': url, 'status': status}
-            
+        website = get_registry().add(name, url, status)
+        logger.info("Added website %s (%s)", name, status)
+        return website
     except Exception as e:
-        print(f"Error adding website: {e}")
+        logger.warning("Error adding website %s: %s", name, e)
         raise
 
-def update_website_status(name, url):
-    """Update website status by testing the URL"""
-    ensure_csv_exists()
-    websites = get_all_websites()
-    updated = False
-    
-    # Normalize the input URL for comparison
-    normalized_url = normalize_url(url)
-    
-    print(f"Looking for website: name='{name}', url='{url}', normalized='{normalized_url}'")  # Debug
-    print(f"Available websites: {websites}")  # Debug
-    
-    for website in websites:
-        # Compare with normalized URLs
-        if website['name'] == name and normalize_url(website['url']) == normalized_url:
-            print(f"Found matching website: {website}")  # Debug
-            is_active = testWebsite(url)  # Use original URL for testing
-            print(f"Test result for {url}: {is_active}")  # Debug
-            old_status = website['status']
-            website['status'] = 'active' if is_active else 'inactive'
-            print(f"Status changed from '{old_status}' to '{website['status']}'")  # Debug
-            updated = True
-            break
-    
-    if updated:
-        # Rewrite the entire CSV file with proper formatting
-        with open(CSV_FILE_PATH, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.DictWriter(file, fieldnames=['name', 'url', 'status'])
-            writer.writeheader()
-            writer.writerows(websites)
-    else:
-        print(f"No matching website found for name='{name}', url='{normalized_url}'")  # Debug
-    
-    return websites
+def record_website_status(name, url, is_active):
+    """Persist a probe result; only writes when the status actually changed"""
+    status = 'active' if is_active else 'inactive'
+    registry = get_registry()
+    website = registry.get(name, url)
+    if website is None or website['status'] == status:
+        return website
+    logger.info("Status of %s changed from %s to %s", name, website['status'], status)
+    return registry.update(name, url, {'status': status})
+
+def check_all_websites(concurrency=None, timeout=None, force=False):
+    """Probe every website concurrently and persist all statuses in one write"""
+    registry = get_registry()
+    websites = registry.all()
+    if not websites:
+        return websites
+
+    # Requests may lower the configured limits but never raise them
+    concurrency = max(1, min(concurrency, CHECK_ALL_CONCURRENCY)) if concurrency else None
+    timeout = min(timeout or PROBE_TIMEOUT, PROBE_TIMEOUT)
+
+    logger.debug("Checking %d websites, concurrency %s, timeout %ss", len(websites), concurrency or 'default', timeout)
+
+    results = probe_websites([(w['name'], w['url']) for w in websites], timeout=timeout,
+                             concurrency=concurrency, force=force)
+    statuses = {(w['name'], w['url']): 'active' if result['ok'] else 'inactive'
+                for w, result in zip(websites, results)}
+
+    # Persist every updated status with a single write
+    return registry.update_statuses(statuses)
 
 def delete_website(name, url):
-    """Delete a website from CSV"""
-    ensure_csv_exists()
-    websites = get_all_websites()
-    normalized_url = normalize_url(url)
-    websites = [w for w in websites if not (w['name'] == name and normalize_url(w['url']) == normalized_url)]
-    
-    # Rewrite the CSV file with proper formatting
-    with open(CSV_FILE_PATH, 'w', newline='', encoding='utf-8') as file:
-        writer = csv.DictWriter(file, fieldnames=['name', 'url', 'status'])
-        writer.writeheader()
-        writer.writerows(websites)
-    
-    return websites
+    """Delete a website"""
+    registry = get_registry()
+    registry.delete(name, url)
+    return registry.all()
 
 def edit_website(old_name, old_url, new_name, new_url):
-    """Edit a website in CSV"""
-    ensure_csv_exists()
-    websites = get_all_websites()
-    
-    # Normalize URLs for comparison
-    normalized_old_url = normalize_url(old_url)
+    """Edit a website"""
+    registry = get_registry()
     normalized_new_url = normalize_url(new_url.strip())
     
-    for website in websites:
-        if website['name'] == old_name and normalize_url(website['url']) == normalized_old_url:
-            website['name'] = new_name.strip()
-            website['url'] = normalized_new_url
-            # Test the new URL
-            is_active = testWebsite(normalized_new_url)
-            website['status'] = 'active' if is_active else 'inactive'
-            break
-    
-    # Rewrite the CSV file with proper formatting
-    with open(CSV_FILE_PATH, 'w', newline='', encoding='utf-8') as file:
-        writer = csv.DictWriter(file, fieldnames=['name', 'url', 'status'])
-        writer.writeheader()
-        writer.writerows(websites)
+    if registry.get(old_name, old_url) is not None:
+        # Test the new URL
+        is_active = probe_website(new_name.strip(), normalized_new_url)['ok']
+        registry.update(old_name, old_url, {
+            'name': new_name.strip(),
+            'url': normalized_new_url,
+            'status': 'active' if is_active else 'inactive',
+        })
     
-    return websites
+    return registry.all()
+
+def _parse_operation(item):
+    """Clean one batch item into a registry operation; ValueError if malformed"""
+    if not isinstance(item, dict):
+        raise ValueError("Each operation must be an object")
+    if item.get('op') not in BATCH_OPERATIONS:
+        raise ValueError("op must be add, edit or delete")
+    name, url = item.get('name'), item.get('url')
+    if not isinstance(name, str) or not isinstance(url, str) or not name.strip() or not url.strip():
+        raise ValueError("Name and URL are required")
+    operation = {'op': item['op'], 'name': name.strip(), 'url': normalize_url(url.strip())}
+    if item['op'] == 'edit':
+        changes = {}
+        for field in ('name', 'url'):
+            value = item.get(f'new_{field}')
+            if value is None:
+                continue
+            if not isinstance(value, str) or not value.strip():
+                raise ValueError(f"new_{field} must be a non-empty string")
+            changes[field] = normalize_url(value.strip()) if field == 'url' else value.strip()
+        if not changes:
+            raise ValueError("edit needs new_name and/or new_url")
+        operation['changes'] = changes
+    return operation
+
+def _probe_target(operation):
+    """(name, url) to probe for an operation, or None if its URL is unchanged"""
+    if operation['op'] == 'add':
+        return operation['name'], operation['url']
+    if operation['op'] == 'edit' and 'url' in operation['changes'] and operation['changes']['url'] != operation['url']:
+        return operation['changes'].get('name', operation['name']), operation['changes']['url']
+    return None
+
+def apply_website_batch(items, atomic=True, timeout=None):
+    """Validate, probe and apply many add/edit/delete operations at once.
+
+    Everything is validated before any probe runs. New and changed URLs
+    are then probed concurrently and all changes are persisted in one
+    write. Returns (applied, results) with one result per item, in order.
+    """
+    if len(items) > BATCH_MAX_ITEMS:
+        raise ValueError(f"At most {BATCH_MAX_ITEMS} operations per batch")
+
+    results = [None] * len(items)
+    operations = {}
+    for i, item in enumerate(items):
+        try:
+            operations[i] = _parse_operation(item)
+        except ValueError as e:
+            results[i] = {'success': False, 'error': str(e)}
+
+    registry = get_registry()
+    _, checked = registry.apply_batch(list(operations.values()), dry_run=True)
+    for i, result in zip(list(operations), checked):
+        results[i] = result
+        if not result['success']:
+            del operations[i]
+
+    applied = False
+    if operations and not (atomic and len(operations) < len(items)):
+        targets = {i: _probe_target(operation) for i, operation in operations.items()}
+        targets = {i: target for i, target in targets.items() if target}
+        if targets:
+            timeout = min(timeout or PROBE_TIMEOUT, PROBE_TIMEOUT)
+            probes = probe_websites(targets.values(), timeout=timeout)
+            for i, result in zip(targets, probes):
+                status = 'active' if result['ok'] else 'inactive'
+                if operations[i]['op'] == 'add':
+                    operations[i]['status'] = status
+                else:
+                    operations[i]['changes']['status'] = status
+
+        # Validated again under the registry lock, in case something changed while probing
+        applied, final = registry.apply_batch(list(operations.values()), atomic=atomic)
+        for i, result in zip(list(operations), final):
+            results[i] = result
+
+    if atomic and not applied:
+        results = [result if not result['success'] else
+                   {'success': False, 'error': "Not applied because other operations failed"}
+                   for result in results]
+
+    failed = sum(1 for result in results if not result['success'])
+    logger.info("Batch of %d operations: %s, %d failed", len(items), 'applied' if applied else 'not applied', failed)
+    return applied, [dict(result, index=i, op=item.get('op') if isinstance(item, dict) else None)
+                     for i, (item, result) in enumerate(zip(items, results))]
+
+def parse_website_file(data, fmt):
+    """Turn an uploaded CSV or JSON file into batch 'add' items.
+
+    CSV files need name and url columns (status is ignored, new sites are
+    probed). JSON is a list of {name, url} objects or {"websites": [...]}.
+    Raises ValueError for unreadable files.
+    """
+    text = data.decode('utf-8-sig')
+    if fmt == 'json':
+        payload = json.loads(text)
+        rows = payload.get('websites') if isinstance(payload, dict) else payload
+        if not isinstance(rows, list):
+            raise ValueError("JSON import must be a list of websites")
+    elif fmt == 'csv':
+        reader = csv.DictReader(io.StringIO(text))
+        columns = {(field or '').strip().lower() for field in reader.fieldnames or []}
+        if not {'name', 'url'} <= columns:
+            raise ValueError("CSV import needs name and url columns")
+        rows = [{key.strip().lower(): (value or '').strip() for key, value in row.items() if key is not None}
+                for row in reader]
+    else:
+        raise ValueError("Import format must be csv or json")
+    return [{'op': 'add', 'name': row.get('name'), 'url': row.get('url')} if isinstance(row, dict) else row
+            for row in rows]
+
+def import_websites_csv(lines, chunk_size=None, max_errors=100):
+    """Add the websites in CSV text as it is read, chunk_size rows per batch.
+
+    Like parse_website_file followed by a non-atomic apply_website_batch,
+    but rows are parsed from the stream and applied in chunks, so neither
+    memory nor BATCH_MAX_ITEMS limits the size of the file. Returns a
+    summary: rows read, imported and failed, the first max_errors failures
+    with their line numbers and the parser's report of skipped rows.
+    Raises ValueError if the CSV has no name and url columns.
+    """
+    chunk_size = chunk_size or CSV_CHUNK_ROWS
+    report = CSVReport()
+    summary = {'total': 0, 'imported': 0, 'failed': 0, 'results': []}
+
+    def apply(chunk):
+        _, results = apply_website_batch([{'op': 'add', 'name': record['name'], 'url': record['url']}
+                                          for _, record in chunk], atomic=False)
+        for (line, _), result in zip(chunk, results):
+            if result['success']:
+                summary['imported'] += 1
+                continue
+            summary['failed'] += 1
+            if len(summary['results']) < max_errors:
+                summary['results'].append({'line': line, 'success': False, 'error': result['error']})
+
+    chunk = []
+    for row in parse_rows(lines, report, repair=True, required=('name', 'url'), positional=False):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            apply(chunk)
+            chunk = []
+    if chunk:
+        apply(chunk)
+    summary['total'] = report.rows
+    summary['failed'] += sum(report.skipped.values())
+    summary['report'] = report.to_dict()
+    logger.info("Imported %d of %d CSV rows (%s)", summary['imported'], summary['total'], report)
+    return summary
 
 def repair_csv_file():
-    """Repair malformed CSV file"""
+    """Rebuild websites.csv from every row that can be read or fixed.
+
+    Rows are parsed, repaired (see csv_stream.parse_rows) and written to a
+    temporary file one at a time, which then replaces websites.csv; only
+    the (name, URL) keys are kept to drop duplicates. Returns a CSVReport of
+    the rows kept, fixed and skipped. Raises ValueError unless websites.csv
+    is the registry (WEBSITE_STORAGE=csv): with SQLite it is only read once,
+    on the first start, and repairing it would leave the live data untouched.
+    """
+    if WEBSITE_STORAGE != 'csv':
+        raise ValueError(f"The registry is stored in {WEBSITE_STORAGE}, not websites.csv; there is no CSV to repair")
+    report = CSVReport()
     if not os.path.exists(CSV_FILE_PATH):
-        return
-    
+        return report
+
+    storage = CSVStorage(CSV_FILE_PATH)
     try:
-        # Read the current file content
-        with open(CSV_FILE_PATH, 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        # Split by common separators and try to reconstruct
-        lines = content.replace('\r\n', '\n').replace('\r', '\n').split('\n')
-        
-        # Try to extract valid data
-        valid_websites = []
-        for line in lines:
-            if line.strip() and 'name,url,status' not in line:
-                parts = line.split(',')
-                if len(parts) >= 3:
-                    # Take the first part as name, last as status, middle parts as URL
-                    name = parts[0].strip()
-                    status = parts[-1].strip()
-                    url = normalize_url(','.join(parts[1:-1]).strip())
-                    
-                    if name and url and status:
-                        valid_websites.append({'name': name, 'url': url, 'status': status})
-        
-        # Rewrite the file properly
-        with open(CSV_FILE_PATH, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.DictWriter(file, fieldnames=['name', 'url', 'status'])
-            writer.writeheader()
-            writer.writerows(valid_websites)
-        
-        print(f"Repaired CSV file with {len(valid_websites)} websites")
-        
-    except Exception as e:
-        print(f"Error repairing CSV: {e}")
+        # Hold the write lock so no worker appends while the file is rebuilt
+        with storage.write_lock():
+            # Keep rows that were appended to the journal but not yet folded in
+            journaled = [(None, record) for record in storage.journaled()]
+            with open(CSV_FILE_PATH, 'r', newline='', encoding='utf-8', errors='replace') as file:
+                rows = itertools.chain(parse_rows(file, report, repair=True), journaled)
+                storage.replace_all(record for _, record in unique_records(rows, report))
+        logger.info("Repaired %s: %s", CSV_FILE_PATH, report)
+        return report
+    except Exception:
+        logger.exception("Error repairing CSV")
         # If repair fails, recreate with default data
-        ensure_csv_exists()
\ No newline at end of file
+        ensure_csv_exists()
+        raise
@@ -0,0 +1,546 @@
+import base64
+import bisect
+import collections
+import contextlib
+import json
+import logging
+import threading
+from apis.metrics import STORAGE_LATENCY
+from apis.settings import REGISTRY_CHANGE_LOG
+from apis.website_storage import normalize_url, website_key
+
+logger = logging.getLogger(__name__)
+
+# Sort orders for paged reads. Each entry ends with the record key
+# (name, normalized URL), so entries are unique and double as cursors.
+SORT_KEYS = {
+    'name': lambda key, record: (record['name'].lower(),) + key,
+    'status': lambda key, record: (record['status'], record['name'].lower()) + key,
+}
+
+def _encode_cursor(sort, position):
+    raw = json.dumps([sort, position], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor, sort):
+    """Return the position stored in a cursor; ValueError if it is invalid"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, position = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ValueError("Cursor does not match the requested sort")
+    if sort is None:
+        if not isinstance(position, int) or isinstance(position, bool) or position < 0:
+            raise ValueError("Invalid cursor")
+        return position
+    if not isinstance(position, list) or not all(isinstance(part, str) for part in position):
+        raise ValueError("Invalid cursor")
+    return tuple(position)
+
+class WebsiteRegistry:
+    """Process-wide, in-memory view of the website store.
+
+    Records are loaded once from a WebsiteStorage backend and kept in a
+    dict keyed by (name, normalized URL). Each website also gets a sequence
+    number that it keeps when renamed, and the (sequence, key) list in
+    _order gives the insertion order, so a rename never rebuilds the dict.
+    Reads are served
+    from memory and every mutation is written through to the backend. The
+    cache is reloaded only when the backend's signature changes, so edits
+    made by another process are still picked up. Mutations hold the
+    backend's write lock from the freshness check to the write, so worker
+    processes sharing a store never overwrite each other's changes.
+
+    Every change bumps a version number, and the latest change per website
+    (including deletions) is kept in a bounded log so clients can fetch
+    only what changed since the version they last saw.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._backend = type(storage).__name__
+        self._lock = threading.RLock()
+        self._records = {}
+        self._seq = {}            # key -> insertion sequence number
+        self._order = []          # (seq, key) sorted by seq: insertion order
+        self._next_seq = 0
+        self._name_index = None   # lowercased name -> keys in insertion order, built on first use
+        self._signature = None
+        self._listeners = []
+        self._pending = []        # (change, record, previous) waiting for the locks to be released
+        self._emit_lock = threading.RLock()
+        # The backend's version, shared by every process using the store
+        self._version = 0
+        self._floor = 0
+        self._changes = collections.OrderedDict()   # key -> (version, record or None)
+        self._sort_indexes = {}   # sort -> sorted list of SORT_KEYS entries, built on first use
+
+    def add_listener(self, listener):
+        """Call listener(change, record, previous) after every change.
+
+        change is 'added', 'updated', 'deleted' or 'reloaded' (the backend
+        was changed by another writer; record is None). Listeners run after
+        the registry and storage locks are released, so their I/O never
+        holds up other writers, possibly on the thread of a concurrent
+        change that is already delivering.
+        """
+        self._listeners.append(listener)
+
+    def _emit(self, change, record=None, previous=None):
+        """Queue a change for the listeners; _locked() delivers it on the way out"""
+        self._pending.append((change, dict(record) if record else None, previous))
+
+    def _deliver(self):
+        # One thread delivers at a time so changes arrive in order; the
+        # others leave theirs to it rather than wait for its listeners
+        while self._pending:
+            if not self._emit_lock.acquire(blocking=False):
+                return
+            try:
+                with self._lock:
+                    pending, self._pending = self._pending, []
+                for change, record, previous in pending:
+                    for listener in self._listeners:
+                        try:
+                            listener(change, record, previous)
+                        except Exception:
+                            logger.exception("Registry listener failed")
+            finally:
+                self._emit_lock.release()
+
+    @contextlib.contextmanager
+    def _locked(self, write=False):
+        """Hold the registry lock (and the storage write lock when writing),
+        then deliver the changes queued meanwhile once both are released"""
+        try:
+            with self._lock, (self.storage.write_lock() if write else contextlib.nullcontext()):
+                yield
+        finally:
+            if self._pending:
+                self._deliver()
+
+    def _bump(self):
+        self._version += 1
+
+    def _log_change(self, key, record):
+        """Remember the latest state of one website at the current version"""
+        self._changes[key] = (self._version, dict(record) if record else None)
+        self._changes.move_to_end(key)
+        while len(self._changes) > REGISTRY_CHANGE_LOG:
+            _, (version, _) = self._changes.popitem(last=False)
+            self._floor = version
+
+    def _log_diff(self, old, new):
+        """Log the differences between two record dicts at the current version"""
+        for key, record in new.items():
+            if old.get(key) != record:
+                self._log_change(key, record)
+        for key in old:
+            if key not in new:
+                self._log_change(key, None)
+
+    def _sort_index(self, sort):
+        index = self._sort_indexes.get(sort)
+        if index is None:
+            key_fn = SORT_KEYS[sort]
+            index = sorted(key_fn(key, record) for key, record in self._records.items())
+            self._sort_indexes[sort] = index
+        return index
+
+    def _index_add(self, key, record):
+        for sort, index in self._sort_indexes.items():
+            bisect.insort(index, SORT_KEYS[sort](key, record))
+
+    def _index_remove(self, key, record):
+        for sort, index in self._sort_indexes.items():
+            entry = SORT_KEYS[sort](key, record)
+            position = bisect.bisect_left(index, entry)
+            if position < len(index) and index[position] == entry:
+                del index[position]
+
+    def _names(self):
+        if self._name_index is None:
+            self._name_index = {}
+            for _, key in self._order:
+                self._name_index.setdefault(key[0].lower(), []).append(key)
+        return self._name_index
+
+    def _name_add(self, key):
+        if self._name_index is not None:
+            self._name_index.setdefault(key[0].lower(), []).append(key)
+
+    def _name_remove(self, key):
+        if self._name_index is not None:
+            keys = self._name_index.get(key[0].lower(), [])
+            if key in keys:
+                keys.remove(key)
+            if not keys:
+                self._name_index.pop(key[0].lower(), None)
+
+    def _load_order(self):
+        self._seq = {key: seq for seq, key in enumerate(self._records)}
+        self._order = [(seq, key) for key, seq in self._seq.items()]
+        self._next_seq = len(self._order)
+
+    def _order_add(self, key):
+        self._seq[key] = self._next_seq
+        self._order.append((self._next_seq, key))
+        self._next_seq += 1
+
+    def _order_rename(self, key, new_key):
+        """Give new_key the position of key"""
+        seq = self._seq.pop(key)
+        self._seq[new_key] = seq
+        self._order[bisect.bisect_left(self._order, (seq,))] = (seq, new_key)
+
+    def _order_remove(self, key):
+        seq = self._seq.pop(key)
+        del self._order[bisect.bisect_left(self._order, (seq,))]
+
+    def _ordered(self):
+        """Records in insertion order"""
+        return (self._records[key] for _, key in self._order)
+
+    def _timed(self, operation):
+        return STORAGE_LATENCY.time(backend=self._backend, operation=operation)
+
+    def _refresh(self):
+        """Reload from the backend if another writer changed it"""
+        signature = self.storage.signature()
+        if signature != self._signature:
+            with self._timed('load'):
+                version, loaded = self.storage.load_versioned()
+            first_load = self._signature is None
+            records = {website_key(r['name'], r['url']): r for r in loaded}
+            if first_load or version != self._version + 1:
+                # Versions in between were written by others and are not
+                # in our change log, so older clients need a full reload
+                self._floor = version
+            self._version = version
+            if not first_load:
+                self._log_diff(self._records, records)
+            self._records = records
+            self._load_order()
+            self._name_index = None
+            self._sort_indexes = {}
+            self._signature = signature
+            logger.info("Loaded %d websites from %s", len(self._records), self._backend)
+            if not first_load:
+                self._emit('reloaded')
+
+    def _written(self):
+        """Record the backend state after one of our own writes"""
+        self._signature = self.storage.signature()
+
+    def all(self):
+        """Return copies of all websites in insertion order"""
+        with self._locked():
+            self._refresh()
+            return [dict(record) for record in self._ordered()]
+
+    def version(self):
+        """Current version; changes whenever any website changes"""
+        with self._locked():
+            self._refresh()
+            return self._version
+
+    def snapshot(self):
+        """Return (version, copies of all websites) taken atomically"""
+        with self._locked():
+            self._refresh()
+            return self._version, [dict(record) for record in self._ordered()]
+
+    def changes_since(self, version):
+        """Return (version, changed, removed) for changes after a version.
+
+        changed holds the current records that were added or modified and
+        removed the name/url of deleted websites. Returns None when the
+        version is too old (or unknown) to compute a delta from.
+        """
+        with self._locked():
+            self._refresh()
+            if version < self._floor or version > self._version:
+                return None
+            changed, removed = [], []
+            for key, (changed_at, record) in reversed(self._changes.items()):
+                if changed_at <= version:
+                    break
+                if record is None:
+                    removed.append({'name': key[0], 'url': key[1]})
+                else:
+                    changed.append(dict(record))
+            changed.reverse()
+            removed.reverse()
+            return self._version, changed, removed
+
+    def page(self, sort=None, descending=False, status=None, query=None, limit=50, cursor=None):
+        """Return (version, websites, next_cursor) for one page of websites.
+
+        sort is None (insertion order), 'name' or 'status'. Pages walk
+        _order or a sorted index that is kept up to date on every mutation,
+        so no request sorts the registry, and a cursor holds the last entry
+        seen (its sequence number in insertion order), so adding or removing
+        other rows never skips or repeats one. status and query (a
+        case-insensitive substring of the name or URL) filter the rows.
+        next_cursor is None on the last page. Raises ValueError for an
+        invalid cursor.
+        """
+        position = _decode_cursor(cursor, sort) if cursor else None
+        query = query.lower() if query else None
+
+        def matches(record):
+            if status and record['status'] != status:
+                return False
+            return not query or query in record['name'].lower() or query in record['url'].lower()
+
+        with self._locked():
+            self._refresh()
+            found = []
+            if sort is None:
+                if descending:
+                    start = bisect.bisect_left(self._order, (position,)) if position is not None else len(self._order)
+                    positions = range(start - 1, -1, -1)
+                else:
+                    start = bisect.bisect_left(self._order, (position + 1,)) if position is not None else 0
+                    positions = range(start, len(self._order))
+                for i in positions:
+                    seq, key = self._order[i]
+                    record = self._records[key]
+                    if matches(record):
+                        found.append((seq, record))
+                        if len(found) > limit:
+                            break
+            else:
+                index = self._sort_index(sort)
+                if descending:
+                    start = bisect.bisect_left(index, position) - 1 if position is not None else len(index) - 1
+                    positions = range(start, -1, -1)
+                else:
+                    start = bisect.bisect_right(index, position) if position is not None else 0
+                    if sort == 'status' and status:
+                        # Skip straight to the requested status group
+                        start = max(start, bisect.bisect_left(index, (status,)))
+                    positions = range(start, len(index))
+                for i in positions:
+                    entry = index[i]
+                    if sort == 'status' and status and entry[0] != status:
+                        if found or (entry[0] > status) != descending:
+                            break
+                        continue
+                    record = self._records[entry[-2:]]
+                    if matches(record):
+                        found.append((list(entry), record))
+                        if len(found) > limit:
+                            break
+            websites = [dict(record) for _, record in found[:limit]]
+            next_cursor = _encode_cursor(sort, found[limit - 1][0]) if len(found) > limit else None
+            return self._version, websites, next_cursor
+
+    def get(self, name, url):
+        with self._locked():
+            self._refresh()
+            record = self._records.get(website_key(name, url))
+            return dict(record) if record else None
+
+    def find_by_name(self, name):
+        """Case-insensitive lookup by name; returns the first match or None"""
+        with self._locked():
+            self._refresh()
+            keys = self._names().get(name.lower())
+            return dict(self._records[keys[0]]) if keys else None
+
+    def add(self, name, url, status):
+        with self._locked(write=True):
+            self._refresh()
+            key = website_key(name, url)
+            if key in self._records:
+                raise ValueError(f"Website '{name}' with URL '{url}' already exists")
+            record = {'name': name, 'url': url, 'status': status}
+            with self._timed('insert'):
+                self.storage.insert(record)
+            self._records[key] = record
+            self._order_add(key)
+            self._index_add(key, record)
+            self._name_add(key)
+            self._written()
+            self._bump()
+            self._log_change(key, record)
+            self._emit('added', record)
+            return dict(record)
+
+    def update(self, name, url, changes):
+        """Apply a dict of field changes to one website; returns the new record or None"""
+        with self._locked(write=True):
+            self._refresh()
+            key = website_key(name, url)
+            record = self._records.get(key)
+            if record is None:
+                return None
+            updated = dict(record, **changes)
+            new_key = website_key(updated['name'], updated['url'])
+            if new_key != key and new_key in self._records:
+                raise ValueError(f"Website '{updated['name']}' with URL '{updated['url']}' already exists")
+            with self._timed('update'):
+                self.storage.update(key, updated)
+            if new_key != key:
+                del self._records[key]
+                self._order_rename(key, new_key)
+            self._records[new_key] = updated
+            self._index_remove(key, record)
+            self._index_add(new_key, updated)
+            if new_key != key:
+                self._name_remove(key)
+                self._name_add(new_key)
+            self._written()
+            self._bump()
+            if new_key != key:
+                self._log_change(key, None)
+            self._log_change(new_key, updated)
+            self._emit('updated', updated, {'name': record['name'], 'url': record['url']})
+            return dict(updated)
+
+    def update_statuses(self, statuses):
+        """Apply {(name, url): status} for many websites with a single write"""
+        with self._locked(write=True):
+            self._refresh()
+            changed = {}
+            for (name, url), status in statuses.items():
+                key = website_key(name, url)
+                record = self._records.get(key)
+                if record is not None and record['status'] != status:
+                    changed[key] = status
+            if changed:
+                with self._timed('update_statuses'):
+                    self.storage.update_statuses(changed)
+                for key, status in changed.items():
+                    self._index_remove(key, self._records[key])
+                    self._records[key] = dict(self._records[key], status=status)
+                    self._index_add(key, self._records[key])
+                self._written()
+                self._bump()
+                for key in changed:
+                    self._log_change(key, self._records[key])
+                for key in changed:
+                    record = self._records[key]
+                    self._emit('updated', record, {'name': record['name'], 'url': record['url']})
+            return [dict(record) for record in self._ordered()]
+
+    def delete(self, name, url):
+        """Delete one website; returns True if it existed"""
+        with self._locked(write=True):
+            self._refresh()
+            key = website_key(name, url)
+            if key not in self._records:
+                return False
+            with self._timed('delete'):
+                self.storage.delete(key)
+            record = self._records.pop(key)
+            self._order_remove(key)
+            self._index_remove(key, record)
+            self._name_remove(key)
+            self._written()
+            self._bump()
+            self._log_change(key, None)
+            self._emit('deleted', record)
+            return True
+
+    def apply_batch(self, operations, atomic=True, dry_run=False):
+        """Validate and apply many operations with a single backend write.
+
+        Operations are {'op': 'add', 'name', 'url', 'status'}, {'op': 'edit',
+        'name', 'url', 'changes'} or {'op': 'delete', 'name', 'url'}, each
+        checked against the state left by the ones before it. Returns
+        (applied, results) with one {'success', 'website' or 'error'} per
+        operation. With atomic nothing is written unless every operation is
+        valid; otherwise the valid ones are applied. dry_run only validates.
+        """
+        with self._locked(write=True):
+            self._refresh()
+            records = dict(self._records)
+            storage_ops, changes, results = [], [], []
+            for operation in operations:
+                name, url = operation['name'], operation['url']
+                key = website_key(name, url)
+                record = records.get(key)
+                if operation['op'] == 'add':
+                    if record is not None:
+                        results.append({'success': False, 'error': f"Website '{name}' with URL '{url}' already exists"})
+                        continue
+                    record = {'name': name, 'url': url, 'status': operation.get('status')}
+                    records[key] = record
+                    storage_ops.append(('insert', record))
+                    changes.append(('added', None, key, record))
+                elif record is None:
+                    results.append({'success': False, 'error': f"Website '{name}' with URL '{url}' not found"})
+                    continue
+                elif operation['op'] == 'edit':
+                    previous = record
+                    record = dict(previous, **operation['changes'])
+                    new_key = website_key(record['name'], record['url'])
+                    if new_key != key and new_key in records:
+                        results.append({'success': False, 'error': f"Website '{record['name']}' with URL "
+                                                                   f"'{record['url']}' already exists"})
+                        continue
+                    if new_key != key:
+                        del records[key]
+                    records[new_key] = record
+                    storage_ops.append(('update', key, record))
+                    changes.append(('updated', key, new_key, record))
+                else:
+                    del records[key]
+                    storage_ops.append(('delete', key))
+                    changes.append(('deleted', key, None, record))
+                results.append({'success': True, 'website': dict(record)})
+
+            failed = len(storage_ops) < len(operations)
+            if dry_run or not storage_ops or (atomic and failed):
+                return False, results
+
+            with self._timed('batch'):
+                self.storage.apply_batch(storage_ops)
+            self._records = records
+            # Positions are settled once here; deletions are dropped in a single pass
+            dropped = set()
+            for change, old_key, new_key, record in changes:
+                if change == 'added':
+                    self._order_add(new_key)
+                elif change == 'deleted':
+                    dropped.add(self._seq.pop(old_key))
+                elif old_key != new_key:
+                    self._order_rename(old_key, new_key)
+            if dropped:
+                self._order = [entry for entry in self._order if entry[0] not in dropped]
+            self._sort_indexes = {}
+            self._name_index = None
+            self._written()
+            self._bump()
+            for change, old_key, new_key, record in changes:
+                if old_key is not None and old_key != new_key:
+                    self._log_change(old_key, None)
+                if new_key is not None:
+                    self._log_change(new_key, record)
+            for change, old_key, new_key, record in changes:
+                previous = {'name': old_key[0], 'url': old_key[1]} if change == 'updated' else None
+                self._emit(change, record, previous)
+            return True, results
+
+    def replace_all(self, websites):
+        """Replace every record"""
+        with self._locked(write=True):
+            self._refresh()
+            records = {}
+            for website in websites:
+                records.setdefault(website_key(website['name'], website['url']),
+                                   {'name': website['name'], 'url': website['url'], 'status': website['status']})
+            with self._timed('replace_all'):
+                self.storage.replace_all(list(records.values()))
+            self._bump()
+            self._log_diff(self._records, records)
+            self._records = records
+            self._load_order()
+            self._sort_indexes = {}
+            self._name_index = None
+            self._written()
+            self._emit('reloaded')
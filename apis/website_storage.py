@@ -0,0 +1,450 @@
+import contextlib
+import csv
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from apis.settings import CSV_JOURNAL_MAX_BYTES
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; locks are then per process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+FIELDNAMES = ['name', 'url', 'status']
+
+def normalize_url(url):
+    """Normalize URL by removing trailing slash for comparison"""
+    if url and url.endswith('/'):
+        return url.rstrip('/')
+    return url
+
+def website_key(name, url):
+    """Index key for a website: (name, normalized URL)"""
+    return (name, normalize_url(url))
+
+class _FileLock:
+    """Exclusive lock held across threads of this process and across
+    processes (fcntl.flock on a lock file). Re-entrant within a thread."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except Exception:
+                os.close(fd)
+                self._lock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._lock.release()
+        return False
+
+_file_locks = {}
+_file_locks_lock = threading.Lock()
+
+def file_lock(path):
+    """Return the process-wide lock object for a lock file path"""
+    path = os.path.abspath(path)
+    with _file_locks_lock:
+        lock = _file_locks.get(path)
+        if lock is None:
+            lock = _file_locks[path] = _FileLock(path)
+        return lock
+
+def fsync_directory(path):
+    """Make a rename in the directory durable"""
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class WebsiteStorage:
+    """Persistence interface used by the website registry.
+
+    Backends must implement load(), signature() and replace_all(). The
+    row-level operations fall back to a full read-modify-write, which is
+    what a flat file needs anyway; indexed backends override them.
+    """
+
+    path = None
+
+    def write_lock(self):
+        """Lock serializing writers across threads and worker processes.
+
+        The registry holds it from its freshness check until its write is
+        done, so two workers never apply changes to different snapshots.
+        """
+        return file_lock(self.path + '.lock')
+
+    def load(self):
+        """Return every record as a list of {'name', 'url', 'status'} dicts"""
+        raise NotImplementedError
+
+    def signature(self):
+        """Return a token that changes whenever another writer modifies the store"""
+        raise NotImplementedError
+
+    def version(self):
+        """Return the stored version number; every write adds exactly one.
+
+        It lives with the data, so every worker process (and a restarted
+        one) sees the same number for the same contents.
+        """
+        raise NotImplementedError
+
+    def load_versioned(self):
+        """Return (version, records) read as one consistent snapshot"""
+        while True:
+            version = self.version()
+            records = self.load()
+            if self.version() == version:
+                return version, records
+
+    def replace_all(self, records):
+        raise NotImplementedError
+
+    def insert(self, record):
+        records = self.load()
+        records.append(record)
+        self.replace_all(records)
+
+    def update(self, key, record):
+        records = [record if website_key(r['name'], r['url']) == key else r for r in self.load()]
+        self.replace_all(records)
+
+    def update_statuses(self, statuses):
+        """Apply {key: status} in one write"""
+        records = self.load()
+        for record in records:
+            status = statuses.get(website_key(record['name'], record['url']))
+            if status is not None:
+                record['status'] = status
+        self.replace_all(records)
+
+    def delete(self, key):
+        records = [r for r in self.load() if website_key(r['name'], r['url']) != key]
+        self.replace_all(records)
+
+    def apply_batch(self, operations):
+        """Apply ('insert', record), ('update', key, record) and ('delete', key)
+        operations in order as one write"""
+        # Rows stay in place by position, so a rename is a single assignment
+        rows = self.load()
+        positions = {website_key(r['name'], r['url']): i for i, r in enumerate(rows)}
+        for operation in operations:
+            if operation[0] == 'insert':
+                record = operation[1]
+                key = website_key(record['name'], record['url'])
+                if key in positions:
+                    rows[positions[key]] = record
+                else:
+                    positions[key] = len(rows)
+                    rows.append(record)
+            elif operation[0] == 'update':
+                _, key, record = operation
+                if key in positions:
+                    position = positions.pop(key)
+                    positions[website_key(record['name'], record['url'])] = position
+                    rows[position] = record
+            elif operation[0] == 'delete':
+                position = positions.pop(operation[1], None)
+                if position is not None:
+                    rows[position] = None
+        self.replace_all([row for row in rows if row is not None])
+
+class CSVStorage(WebsiteStorage):
+    """Flat websites.csv file; also used as the export format.
+
+    The file is only ever replaced whole (temp file, fsync, os.replace),
+    never rewritten in place. Inserts are appended to a journal next to it
+    (fsynced JSON lines) and folded into the file by the next full write.
+    Journal lines name the file they extend by inode and mtime, so lines
+    left behind by a crash after a rewrite are ignored rather than replayed.
+    """
+
+    def __init__(self, path, on_missing=None):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.version_path = path + '.version'
+        self._on_missing = on_missing
+
+    def signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            if not self._on_missing:
+                return None
+            self._on_missing()
+            st = os.stat(self.path)
+        try:
+            journal = os.stat(self.journal_path)
+            journal_sig = (journal.st_ino, journal.st_size)
+        except FileNotFoundError:
+            journal_sig = None
+        return (st.st_ino, st.st_mtime_ns, st.st_size, journal_sig)
+
+    def _read_journal(self, base):
+        """Records appended to the file identified by base (inode, mtime)"""
+        records = []
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-append
+                        logger.warning("Skipping unreadable journal line in %s", self.journal_path)
+                        continue
+                    if tuple(entry.get('base', ())) == base:
+                        records.append(entry['record'])
+        except FileNotFoundError:
+            pass
+        return records
+
+    def version(self):
+        # Version of the last full write plus one per journaled insert
+        try:
+            with open(self.version_path, 'r', encoding='utf-8') as file:
+                base_version = int(file.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            base_version = 0
+        return base_version + len(self.journaled())
+
+    def journaled(self):
+        """Rows appended to the journal that are not in the file yet"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+        return self._read_journal((st.st_ino, st.st_mtime_ns))
+
+    def load(self):
+        from apis.csv_stream import CSVReport, parse_rows, unique_records
+
+        report = CSVReport()
+        try:
+            with open(self.path, 'r', newline='', encoding='utf-8') as file:
+                st = os.fstat(file.fileno())
+                journaled = ((None, record) for record in self._read_journal((st.st_ino, st.st_mtime_ns)))
+                records = [record for _, record in unique_records(itertools.chain(parse_rows(file, report), journaled),
+                                                                  report)]
+        except FileNotFoundError:
+            logger.warning("CSV file not found: %s", self.path)
+            return []
+        if report.skipped:
+            logger.warning("Skipped malformed or duplicate rows in %s: %s", self.path, report)
+        return records
+
+    def insert(self, record):
+        """Append one row to the journal instead of rewriting the file"""
+        with self.write_lock():
+            try:
+                st = os.stat(self.path)
+                journal_size = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+            except FileNotFoundError:
+                st = None
+            if st is None or journal_size > CSV_JOURNAL_MAX_BYTES:
+                return super().insert(record)
+            entry = {'base': [st.st_ino, st.st_mtime_ns], 'record': {key: record[key] for key in FIELDNAMES}}
+            fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+            try:
+                os.write(fd, (json.dumps(entry) + '\n').encode('utf-8'))
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def replace_all(self, records):
+        """Atomically rewrite the CSV (temp file + fsync + os.replace)"""
+        directory = os.path.dirname(self.path)
+        with self.write_lock():
+            # Bump the version first: a crash right after only costs
+            # clients a refetch, never a missed change
+            self._write_version(self.version() + 1)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.websites-', suffix='.csv')
+            try:
+                with os.fdopen(fd, 'w', newline='', encoding='utf-8') as file:
+                    writer = csv.writer(file)
+                    writer.writerow(FIELDNAMES)
+                    # Rows are written as they come, so records may be a generator of any length
+                    writer.writerows([record[key] for key in FIELDNAMES] for record in records)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.chmod(tmp_path, 0o666)
+                os.replace(tmp_path, self.path)
+                fsync_directory(self.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            # Journaled rows are in the new file now; stale lines would be
+            # ignored anyway, this just keeps the journal short
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+
+    def _write_version(self, version):
+        tmp_path = f"{self.version_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(str(version))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.version_path)
+
+class SQLiteStorage(WebsiteStorage):
+    """Embedded SQLite store (WAL mode) with single-row writes.
+
+    Websites are indexed on name (case-insensitive) and on normalized URL,
+    with (name, normalized_url) unique. Rows keep their insertion id so the
+    registry order matches the order sites were added.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS websites (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            url TEXT NOT NULL,
+            normalized_url TEXT NOT NULL,
+            status TEXT NOT NULL,
+            UNIQUE (name, normalized_url)
+        );
+        CREATE INDEX IF NOT EXISTS idx_websites_name ON websites (name COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS idx_websites_normalized_url ON websites (normalized_url);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path, import_csv_path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), mode=0o755, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self.SCHEMA)
+        self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0')")
+        if import_csv_path:
+            self.import_csv(import_csv_path)
+
+    @contextlib.contextmanager
+    def _write(self):
+        """One write transaction; also adds one to the stored version"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._conn
+                self._conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def import_csv(self, csv_path, force=False):
+        """One-time import of an existing websites.csv; returns rows imported"""
+        with self._lock:
+            done = self._conn.execute("SELECT value FROM meta WHERE key = 'csv_imported'").fetchone()
+        if done and not force:
+            return 0
+        if not os.path.exists(csv_path):
+            return 0
+        records = CSVStorage(csv_path).load()
+        with self._write() as conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO websites (name, url, normalized_url, status) VALUES (?, ?, ?, ?)',
+                [(r['name'], r['url'], normalize_url(r['url']), r['status']) for r in records])
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('csv_imported', ?)", (csv_path,))
+        logger.info("Imported %d websites from %s", len(records), csv_path)
+        return len(records)
+
+    def signature(self):
+        # data_version only changes when *another* connection commits
+        with self._lock:
+            return self._conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def version(self):
+        with self._lock:
+            return int(self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+
+    def load(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT name, url, status FROM websites ORDER BY id').fetchall()
+        return [{'name': name, 'url': url, 'status': status} for name, url, status in rows]
+
+    def find_by_name(self, name):
+        """Case-insensitive name lookup served by the name index"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT name, url, status FROM websites WHERE name = ? COLLATE NOCASE ORDER BY id LIMIT 1',
+                (name,)).fetchone()
+        return {'name': row[0], 'url': row[1], 'status': row[2]} if row else None
+
+    def insert(self, record):
+        with self._write() as conn:
+            self._insert(conn, record)
+
+    def update(self, key, record):
+        with self._write() as conn:
+            self._update(conn, key, record)
+
+    def update_statuses(self, statuses):
+        with self._write() as conn:
+            conn.executemany(
+                'UPDATE websites SET status = ? WHERE name = ? AND normalized_url = ?',
+                [(status, name, url) for (name, url), status in statuses.items()])
+
+    def delete(self, key):
+        with self._write() as conn:
+            conn.execute('DELETE FROM websites WHERE name = ? AND normalized_url = ?', key)
+
+    def apply_batch(self, operations):
+        with self._write() as conn:
+            for operation in operations:
+                if operation[0] == 'insert':
+                    self._insert(conn, operation[1])
+                elif operation[0] == 'update':
+                    self._update(conn, operation[1], operation[2])
+                elif operation[0] == 'delete':
+                    conn.execute('DELETE FROM websites WHERE name = ? AND normalized_url = ?', operation[1])
+
+    def replace_all(self, records):
+        with self._write() as conn:
+            conn.execute('DELETE FROM websites')
+            conn.executemany(
+                'INSERT OR IGNORE INTO websites (name, url, normalized_url, status) VALUES (?, ?, ?, ?)',
+                [(r['name'], r['url'], normalize_url(r['url']), r['status']) for r in records])
+
+    @staticmethod
+    def _insert(conn, record):
+        conn.execute(
+            'INSERT INTO websites (name, url, normalized_url, status) VALUES (?, ?, ?, ?)',
+            (record['name'], record['url'], normalize_url(record['url']), record['status']))
+
+    @staticmethod
+    def _update(conn, key, record):
+        conn.execute(
+            'UPDATE websites SET name = ?, url = ?, normalized_url = ?, status = ? '
+            'WHERE name = ? AND normalized_url = ?',
+            (record['name'], record['url'], normalize_url(record['url']), record['status'], key[0], key[1]))
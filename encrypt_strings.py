@@ -1,97 +1,67 @@
+import argparse
+import getpass
 import hashlib
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
+import sys
+
+# Legacy fixed key for the pre-migration multi-pass records
+LEGACY_FIXED_KEY = b"MyFixedBlowfishKey123456"
+
+# ROT13 for letters and +13 (mod 10) for digits, as one translate() table
+CAESAR_TABLE = str.maketrans(
+    'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789',
+    'nopqrstuvwxyzabcdefghijklmNOPQRSTUVWXYZABCDEFGHIJKLM3456789012')
+
+_legacy_cipher = None
 
 def multi_pass_encrypt(input_string):
     """
     Multi-pass encryption: SHA-256 → Blowfish → Caesar Cipher
     Returns encrypted string. Same input always produces same output.
+
+    Only used to verify credentials written before the move to scrypt;
+    new records are written by main() below.
     """
+    global _legacy_cipher
     # PASS 1: SHA-256 hash
-    sha256_result = hashlib.sha256(input_string.encode('utf-8')).hexdigest()
-    
-    # PASS 2: Deterministic Blowfish encryption
-    fixed_key = b"MyFixedBlowfishKey123456"  # Fixed key for deterministic results
-    sha256_bytes = sha256_result.encode('utf-8')
-    
-    # Pad to multiple of 8 bytes (Blowfish block size)
-    padding_length = 8 - (len(sha256_bytes) % 8)
-    if padding_length != 8:
-        sha256_bytes += b'\x00' * padding_length
-    
-    cipher = Cipher(algorithms.Blowfish(fixed_key), modes.ECB(), backend=default_backend())
-    encryptor = cipher.encryptor()
-    blowfish_result = encryptor.update(sha256_bytes) + encryptor.finalize()
-    blowfish_hex = blowfish_result.hex()
-    
+    sha256_bytes = hashlib.sha256(input_string.encode('utf-8')).hexdigest().encode('utf-8')
+
+    # PASS 2: Deterministic Blowfish encryption (64 hex chars, already block aligned)
+    if _legacy_cipher is None:
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+        from cryptography.hazmat.backends import default_backend
+        _legacy_cipher = Cipher(algorithms.Blowfish(LEGACY_FIXED_KEY), modes.ECB(), backend=default_backend())
+    encryptor = _legacy_cipher.encryptor()
+    blowfish_hex = (encryptor.update(sha256_bytes) + encryptor.finalize()).hex()
+
     # PASS 3: Deterministic Caesar cipher (ROT13-style)
-    caesar_shift = 13
-    result = ""
-    for char in blowfish_hex:
-        if char.isalpha():
-            if char.islower():
-                result += chr((ord(char) - ord('a') + caesar_shift) % 26 + ord('a'))
-            else:
-                result += chr((ord(char) - ord('A') + caesar_shift) % 26 + ord('A'))
-        elif char.isdigit():
-            result += str((int(char) + caesar_shift) % 10)
-        else:
-            result += char
-    
-    return result
+    return blowfish_hex.translate(CAESAR_TABLE)
 
-def main():
-    # Get two strings from user
-    print("Multi-Pass String Encryption Tool")
-    print("=" * 40)
-    print("Encryption process: SHA-256 → Blowfish → Caesar Cipher")
-    print()
-    
-    string1 = input("Enter first string to encrypt: ")
-    print("\nProcessing string 1:")
-    encrypted1 = multi_pass_encrypt(string1)
-    
-    print("\n" + "-" * 50)
-    
-    string2 = input("Enter second string to encrypt: ")
-    print("\nProcessing string 2:")
-    encrypted2 = multi_pass_encrypt(string2)
-    
-    # Display final results
-    print("\n" + "=" * 60)
-    print("FINAL ENCRYPTION RESULTS:")
-    print("=" * 60)
-    print(f"String 1 - Original: {string1}")
-    print(f"String 1 - Final Encrypted: {encrypted1}")
-    print()
-    print(f"String 2 - Original: {string2}")
-    print(f"String 2 - Final Encrypted: {encrypted2}")
-    
-    # Save to file
-    with open("encrypted_strings.txt", "w") as f:
-        f.write("Multi-Pass Encrypted Strings\n")
-        f.write("=" * 40 + "\n")
-        f.write("Encryption Process: SHA-256 → Blowfish → Caesar Cipher\n\n")
-        f.write(f"String 1:\n")
-        f.write(f"Original: {string1}\n")
-        f.write(f"Final Encrypted: {encrypted1}\n\n")
-        f.write(f"String 2:\n")
-        f.write(f"Original: {string2}\n")
-        f.write(f"Final Encrypted: {encrypted2}\n\n")
-        f.write("Note: This is multi-pass one-way encryption. Original strings cannot be recovered from encrypted versions.\n")
-        f.write("Encryption uses: SHA-256 hash → Blowfish cipher → Caesar cipher\n")
-    
-    print(f"\nResults saved to 'encrypted_strings.txt'")
-    
-    # Test that same input produces same output
-    print("\nTesting deterministic behavior...")
-    test_encrypted1 = multi_pass_encrypt(string1)
-    test_encrypted2 = multi_pass_encrypt(string2)
-    
-    if encrypted1 == test_encrypted1 and encrypted2 == test_encrypted2:
-        print("✓ Encryption is deterministic - same inputs produce same outputs")
+def main(argv=None):
+    """Write scrypt credential records for the CMS login.
+
+    Usage: python encrypt_strings.py --username admin [--password-stdin]
+
+    Without --password-stdin the password is prompted for (not echoed).
+    Replaces the old interactive multi-pass tool; existing multi-pass
+    records keep working until this is run.
+    """
+    from apis.credentials import CREDENTIALS_PATH, write_credentials
+
+    parser = argparse.ArgumentParser(description="Write hashed CMS login credentials")
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password-stdin', action='store_true', help="read the password from stdin")
+    parser.add_argument('--output', default=CREDENTIALS_PATH)
+    args = parser.parse_args(argv)
+
+    if args.password_stdin:
+        password = sys.stdin.readline().rstrip('\n')
     else:
-        print("✗ Error: Encryption is not deterministic")
+        password = getpass.getpass("Password: ")
+    if not args.username or not password:
+        parser.error("username and password cannot be empty")
+
+    write_credentials(args.username, password, args.output)
+    print(f"Credentials written to '{args.output}'")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,32 @@
+"""Production server profile, read by `gunicorn -c gunicorn.conf.py main:app`.
+
+Settings come from apis/settings.py (and so from the environment):
+WEB_CONCURRENCY worker processes, GUNICORN_WORKER_CLASS ('gthread' by
+default; 'gevent' needs `pip install gevent`), GUNICORN_THREADS and BIND.
+With more than one worker, job status, the health-check schedule, login
+attempts and dashboard events are shared through SHARED_DB_PATH and only
+one worker runs the background health checks.
+"""
+from apis.assets import load_manifest
+from apis.settings import (BIND, WEB_CONCURRENCY, WORKER_CLASS, WORKER_THREADS, WORKER_CONNECTIONS,
+                           load_secret_key)
+
+bind = BIND
+workers = WEB_CONCURRENCY
+worker_class = WORKER_CLASS
+threads = WORKER_THREADS
+worker_connections = WORKER_CONNECTIONS
+# Long enough for a check-all over a slow set of sites; SSE streams send
+# keepalives well inside this
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+# The app is not preloaded: each worker opens its own SQLite connections
+# and starts its own threads after the fork
+preload_app = False
+
+def on_starting(server):
+    # Create the session key and build the static assets once, before any
+    # worker races to do it
+    load_secret_key()
+    load_manifest()
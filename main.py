@@ -1,96 +1,383 @@
 import flask
+import gzip
 from flask import session, request, redirect, url_for
 from functools import wraps
-import secrets
-import os
+import io
+import logging
+import time
+import uuid
+from apis.assets import get_manifest, is_hashed, encoded_variant, asset_mimetype
+from apis.settings import ASSETS_DIR, load_secret_key, GZIP_MIN_SIZE, WEBSITES_PAGE_SIZE, WEBSITES_MAX_PAGE_SIZE, IMPORT_MAX_BYTES, IMPORT_STREAM_MAX_BYTES, METRICS_TOKEN
+from apis.logger import setup_logging, request_id_var
+from apis.metrics import REGISTRY as METRICS, HTTP_REQUESTS, HTTP_LATENCY, HTTP_IN_FLIGHT
 from apis.registry import registryUSRLOGIN
-from apis.website_manager import get_all_websites, add_website, update_website_status, delete_website, edit_website, repair_csv_file
+from apis.response_cache import get_response_cache, dumps
+from apis.credentials import get_login_limiter
+from apis.website_manager import probe_url, probe_website, record_website_status, get_websites_version, get_websites_snapshot, get_website_changes, get_websites_page, apply_website_batch, parse_website_file, add_website, delete_website, edit_website, repair_csv_file, check_all_websites, get_website, export_websites_chunks, import_websites_csv, get_website_history
 from apis.serversService import start, stop
+from apis.jobs import get_job_manager
+from apis.events import get_broker
+from apis.scheduler import start_scheduler, schedule_snapshot, HEALTHCHECK_ENABLED, PROBE_WORKERS
 
-app = flask.Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', secrets.token_hex(32))
+logger = logging.getLogger(__name__)
+
+# Statuses are kept fresh by the scheduler or by separate probe workers
+BACKGROUND_CHECKS = HEALTHCHECK_ENABLED or PROBE_WORKERS
+
+views = flask.Blueprint('cms', __name__)
+
+GZIP_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/csv'}
+PAGE_PARAMS = ('limit', 'cursor', 'sort', 'order', 'status', 'q')
+# Fingerprinted assets never change, so browsers may keep them for a year
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+def asset_url_for(endpoint, **values):
+    """url_for for templates: static files get their fingerprinted /assets URL"""
+    if endpoint == 'static':
+        hashed = get_manifest().get(values.get('filename'))
+        if hashed:
+            endpoint, values['filename'] = 'cms.hashed_asset', hashed
+    return url_for(endpoint, **values)
+
+def create_app():
+    """Build the Flask app: logging, session key, assets, routes and the scheduler"""
+    setup_logging()
+    app = flask.Flask(__name__)
+    # Shared by every worker so a session cookie is valid whichever one serves it
+    app.secret_key = load_secret_key()
+    app.jinja_env.globals['url_for'] = asset_url_for
+    app.register_blueprint(views)
+    # Hash and compress static files now rather than on the first page load
+    get_manifest()
+    # Keep stored statuses fresh without tying probes to page loads
+    start_scheduler()
+    return app
+
+_app = None
+
+def __getattr__(name):
+    # `main:app` (gunicorn, flask run) builds the app on first access, so
+    # importing this module stays cheap
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+@views.before_app_request
+def start_request_log():
+    flask.g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+    flask.g.request_start = time.perf_counter()
+    request_id_var.set(flask.g.request_id)
+    HTTP_IN_FLIGHT.inc()
+    flask.g.in_flight = True
+
+@views.after_app_request
+def finish_request_log(response):
+    elapsed = time.perf_counter() - flask.g.get('request_start', time.perf_counter())
+    duration_ms = round(elapsed * 1000, 2)
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+    HTTP_LATENCY.observe(elapsed, method=request.method, route=route)
+    response.headers['X-Request-ID'] = flask.g.get('request_id', '-')
+    logger.info("%s %s %s", request.method, request.path, response.status_code,
+                extra={'status': response.status_code, 'duration_ms': duration_ms})
+    return response
+
+@views.after_app_request
+def compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in GZIP_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    if 'gzip' not in request.accept_encodings:
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@views.teardown_app_request
+def clear_request_log(exc):
+    if flask.g.pop('in_flight', False):
+        HTTP_IN_FLIGHT.dec()
+    request_id_var.set('-')
+
+@views.route('/assets/<path:filename>', methods=['GET'])
+def hashed_asset(filename):
+    """Fingerprinted static files, pre-compressed and cacheable forever"""
+    if not is_hashed(filename):
+        flask.abort(404)
+    path, encoding = encoded_variant(filename, request.accept_encodings)
+    # The hashed name already identifies the content, so it doubles as the ETag
+    response = flask.send_from_directory(ASSETS_DIR, path, mimetype=asset_mimetype(filename), etag=path,
+                                         max_age=ASSET_MAX_AGE)
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@views.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text-format metrics (bearer METRICS_TOKEN if set)"""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        return flask.Response("Unauthorized\n", status=401, mimetype='text/plain')
+    return flask.Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+def _force_requested(data):
+    """True when the caller asked to skip cached probe results (?force=true or "force": true)"""
+    return request.args.get('force', '').lower() in ('1', 'true', 'yes') or data.get('force') is True
 
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
-            return redirect(url_for('login'))
+            return redirect(url_for('cms.login'))
         return f(*args, **kwargs)
     return decorated_function
 
-@app.route('/')
+def _cached_response(body):
+    """Serve a CachedBody, reusing its gzip copy for clients that accept one"""
+    response = flask.Response(body.data, mimetype=body.mimetype)
+    response.vary.add('Accept-Encoding')
+    if 'gzip' in request.accept_encodings and len(body.data) >= GZIP_MIN_SIZE:
+        response.set_data(body.gzipped())
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def _cached_page(template, **context):
+    """Render a template once per context and serve the stored bytes after that.
+
+    Pages only vary by their context and the app's mount point (the data
+    is loaded by the browser), so they are not tied to the registry.
+    """
+    app = flask.current_app
+    if app.debug or app.jinja_env.auto_reload:
+        return flask.render_template(template, **context)
+    cache = get_response_cache()
+    key = ('page', template, request.script_root, tuple(sorted(context.items())))
+    body = cache.get(key)
+    if body is None:
+        body = cache.put(key, flask.render_template(template, **context).encode('utf-8'), 'text/html')
+    return _cached_response(body)
+
+@views.route('/')
 @login_required
 def index():
-    return flask.render_template('index.html')
+    # The dashboard only probes on load when nothing checks in the background
+    return _cached_page('index.html', auto_check=not BACKGROUND_CHECKS)
 
-@app.route('/servers')
+@views.route('/servers')
 @login_required
 def servers():
-    return flask.render_template('servers.html')
+    return _cached_page('servers.html')
 
 
-@app.route('/login', methods=['GET'])
+@views.route('/login', methods=['GET'])
 def login():
     if 'user_id' in session:
-        return redirect(url_for('index'))
-    return flask.render_template('login.html')
+        return redirect(url_for('cms.index'))
+    return _cached_page('login.html')
 
-@app.route('/start', methods=['POST'])
+@views.route('/start', methods=['POST'])
 def startService():
     data = flask.request.get_json()
     id = data.get('id')
-    print(f"Starting server with id: {id}...")
+    logger.info("Starting server with id: %s", id)
     return start(id)
     
-@app.route('/stop', methods=['POST'])
+@views.route('/stop', methods=['POST'])
 def stopService():
     data = flask.request.get_json()
     id = data.get('id')
-    print(f"Stopping server with id: {id}...")
+    logger.info("Stopping server with id: %s", id)
     return stop(id)
 
-@app.route('/loginUSR', methods=['POST'])
+@views.route('/api/jobs/<job_id>', methods=['GET'])
+@login_required
+def job_status(job_id):
+    """Status and log lines (after ?since=<seq>) of a start/stop job"""
+    since = flask.request.args.get('since', 0, type=int)
+    job = get_job_manager().state(job_id, since=since)
+    if job is None:
+        return flask.jsonify({"success": False, "error": "Job not found"}), 404
+    return flask.jsonify({"success": True, "job": job}), 200
+
+@views.route('/api/events', methods=['GET'])
+@login_required
+def events():
+    """Server-Sent Events: website status changes and start/stop job progress"""
+    stream = flask.stream_with_context(get_broker().stream())
+    return flask.Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@views.route('/loginUSR', methods=['POST'])
 def loginUSR():
     data = flask.request.get_json()
     usr = data.get('username')
     pswd = data.get('password')
-    print(f"Username: {usr}, Password: {pswd}")
+    logger.info("Login attempt for username: %s", usr)
+    
+    # Throttle per client before doing any password hashing
+    client = request.remote_addr
+    if not get_login_limiter().allow(client):
+        return flask.jsonify({"success": False, "error": "Too many login attempts. Try again later."}), 429
+    
     result = registryUSRLOGIN(usr, pswd)
     
     if "successfully" in result:
+        get_login_limiter().reset(client)
         session['user_id'] = usr
         session['logged_in'] = True
         return flask.jsonify({"success": True, "message": result}), 200
     else:
         return flask.jsonify({"success": False, "error": result}), 401
 
-@app.route('/logout', methods=['POST'])
+@views.route('/logout', methods=['POST'])
 def logout():
     session.clear()
     return flask.jsonify({"success": True, "message": "Logged out"}), 200
 
-@app.route('/api/websites', methods=['GET'])
+@views.route('/api/websites', methods=['GET'])
 @login_required
 def get_websites():
-    """Get all websites"""
+    """Get all websites, one page of them, or only the changes after ?since=<version>.
+
+    Paging parameters: limit, cursor (next_cursor of the previous page),
+    sort=name|status, order=asc|desc, status=active|inactive and q
+    (substring of the name or URL). since applies to the full list only,
+    so it cannot be combined with them. Responses carry the registry version
+    as a weak ETag, so an unchanged list is answered with 304 Not Modified
+    without being serialized. Serialized bodies are cached per version and
+    query string, so other clients asking for the same list share one.
+    """
+    args = flask.request.args
+    paged = any(param in args for param in PAGE_PARAMS)
+    since = None
+    if 'since' in args:
+        if paged:
+            return flask.jsonify({"success": False, "error": "since cannot be combined with paging parameters"}), 400
+        try:
+            since = int(args['since'])
+        except ValueError:
+            return flask.jsonify({"success": False, "error": "since must be a version number"}), 400
+    if paged:
+        try:
+            limit = int(args.get('limit', WEBSITES_PAGE_SIZE))
+        except ValueError:
+            return flask.jsonify({"success": False, "error": "limit must be a number"}), 400
+        sort = args.get('sort') or None
+        order = args.get('order', 'asc')
+        status = args.get('status') or None
+        if not 0 < limit <= WEBSITES_MAX_PAGE_SIZE:
+            return flask.jsonify({"success": False, "error": f"limit must be between 1 and {WEBSITES_MAX_PAGE_SIZE}"}), 400
+        if sort not in (None, 'name', 'status'):
+            return flask.jsonify({"success": False, "error": "sort must be name or status"}), 400
+        if order not in ('asc', 'desc'):
+            return flask.jsonify({"success": False, "error": "order must be asc or desc"}), 400
+        if status not in (None, 'active', 'inactive'):
+            return flask.jsonify({"success": False, "error": "status must be active or inactive"}), 400
+
     try:
-        websites = get_all_websites()
-        return flask.jsonify({"success": True, "websites": websites}), 200
-    except Exception as e:
-        print(f"Error in get_websites: {e}")
+        version = get_websites_version()
+        etag = f"v{version}"
+        if request.if_none_match.contains_weak(etag):
+            response = flask.Response(status=304)
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+
+        cache = get_response_cache()
+        query = tuple(sorted(args.items(multi=True)))
+        cached = cache.get(('websites', version, query))
+        if cached is None:
+            delta = get_website_changes(since) if since is not None else None
+            if paged:
+                try:
+                    version, websites, next_cursor = get_websites_page(
+                        sort=sort, descending=order == 'desc', status=status,
+                        query=args.get('q') or None, limit=limit, cursor=args.get('cursor') or None)
+                except ValueError as e:
+                    return flask.jsonify({"success": False, "error": str(e)}), 400
+                body = {"success": True, "version": version, "websites": websites, "next_cursor": next_cursor}
+            elif delta is not None:
+                version, changed, removed = delta
+                body = {"success": True, "version": version, "delta": True, "changed": changed, "removed": removed}
+            else:
+                version, websites = get_websites_snapshot()
+                body = {"success": True, "version": version, "websites": websites}
+            # Stored under the version the body was built at, which may be newer than the one looked up
+            cached = cache.put(('websites', version, query), dumps(body), 'application/json')
+        response = _cached_response(cached)
+        response.set_etag(f"v{version}", weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response, 200
+    except Exception:
+        logger.exception("Error in get_websites")
         return flask.jsonify({"success": False, "error": "Failed to load websites"}), 500
     
-@app.route('/api/repair-csv', methods=['POST'])
+@views.route('/api/repair-csv', methods=['POST'])
 @login_required
 def repair_csv():
-    """Repair malformed CSV file"""
+    """Repair malformed CSV file; reports the rows kept, fixed and skipped"""
     try:
-        repair_csv_file()
-        return flask.jsonify({"success": True, "message": "CSV file repaired"}), 200
+        report = repair_csv_file()
+        return flask.jsonify({"success": True, "message": "CSV file repaired", "report": report.to_dict()}), 200
+    except ValueError as e:
+        return flask.jsonify({"success": False, "error": str(e)}), 409
+    except Exception as e:
+        return flask.jsonify({"success": False, "error": str(e)}), 500
+
+@views.route('/api/websites/<name>/history', methods=['GET'])
+@login_required
+def website_history(name):
+    """Uptime % and p50/p95 latency for a website over a window (hours).
+
+    ?url= picks one of several websites sharing a name.
+    """
+    try:
+        window_hours = float(flask.request.args.get('window', 24))
+    except ValueError:
+        return flask.jsonify({"success": False, "error": "window must be a number of hours"}), 400
+    if not 0 < window_hours <= 24 * 730:
+        return flask.jsonify({"success": False, "error": "window must be between 0 and 17520 hours"}), 400
+
+    try:
+        history = get_website_history(name, url=flask.request.args.get('url'), window_hours=window_hours)
+        if history is None:
+            return flask.jsonify({"success": False, "error": "Website not found"}), 404
+        return flask.jsonify({"success": True, "history": history}), 200
     except Exception as e:
+        logger.exception("Error in website_history")
         return flask.jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/websites', methods=['POST'])
+@views.route('/api/websites/schedule', methods=['GET'])
+@login_required
+def website_schedule():
+    """Background health-check state for every website"""
+    return flask.jsonify({"success": True, "enabled": BACKGROUND_CHECKS, "sites": schedule_snapshot()}), 200
+
+@views.route('/api/websites/export', methods=['GET'])
+@login_required
+def export_websites():
+    """Export all websites as websites.csv (or ?format=json), streamed in chunks"""
+    fmt = flask.request.args.get('format', 'csv')
+    try:
+        chunks = export_websites_chunks(fmt)
+        return flask.Response(chunks, mimetype='text/csv' if fmt == 'csv' else 'application/json',
+                              headers={'Content-Disposition': f'attachment; filename=websites.{fmt}'})
+    except ValueError as e:
+        return flask.jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return flask.jsonify({"success": False, "error": str(e)}), 500
+
+@views.route('/api/websites', methods=['POST'])
 @login_required
 def add_new_website():
     """Add a new website"""
@@ -107,7 +394,93 @@ def add_new_website():
     except Exception as e:
         return flask.jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/websites/test', methods=['POST'])
+def _batch_response(applied, results):
+    return flask.jsonify({"success": applied, "applied": applied, "results": results}), 200 if applied else 400
+
+@views.route('/api/websites/batch', methods=['POST'])
+@login_required
+def batch_websites():
+    """Apply many add/edit/delete operations, validated first and written once.
+
+    Body: {"operations": [{"op": "add", "name", "url"}, {"op": "edit", "name",
+    "url", "new_name", "new_url"}, {"op": "delete", "name", "url"}, ...],
+    "atomic": true}. With atomic (the default) nothing is applied unless
+    every operation is valid.
+    """
+    data = flask.request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return flask.jsonify({"success": False, "error": "operations must be a non-empty list"}), 400
+
+    atomic = data.get('atomic', True)
+    if not isinstance(atomic, bool):
+        return flask.jsonify({"success": False, "error": "atomic must be true or false"}), 400
+
+    try:
+        return _batch_response(*apply_website_batch(operations, atomic=atomic))
+    except ValueError as e:
+        return flask.jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.exception("Error in batch_websites")
+        return flask.jsonify({"success": False, "error": str(e)}), 500
+
+@views.route('/api/websites/import', methods=['POST'])
+@login_required
+def import_websites():
+    """Add every website in an uploaded CSV or JSON file.
+
+    The file is the 'file' form field or the raw request body. The format
+    comes from ?format=, the file name or the content type. Rows that fail
+    (e.g. already present) are reported per item; the rest are added
+    unless ?atomic=true. Non-atomic CSV imports are read as they upload
+    and applied in chunks (see import_websites_csv), so they may be up to
+    IMPORT_STREAM_MAX_BYTES; the others are read whole.
+    """
+    if request.content_length and request.content_length > IMPORT_STREAM_MAX_BYTES:
+        return flask.jsonify({"success": False, "error": f"Import is larger than {IMPORT_STREAM_MAX_BYTES} bytes"}), 413
+
+    upload = flask.request.files.get('file')
+    filename = (upload.filename if upload else '') or ''
+    mimetype = (upload.mimetype if upload else flask.request.mimetype) or ''
+    fmt = flask.request.args.get('format')
+    if not fmt:
+        fmt = 'json' if filename.lower().endswith('.json') or 'json' in mimetype else 'csv'
+    atomic = flask.request.args.get('atomic', 'false').lower() in ('1', 'true', 'yes')
+
+    if fmt == 'csv' and not atomic:
+        if not upload and not request.content_length:
+            return flask.jsonify({"success": False, "error": "No file uploaded"}), 400
+        lines = io.TextIOWrapper(upload.stream if upload else request.stream, encoding='utf-8-sig',
+                                 errors='replace', newline='')
+        try:
+            summary = import_websites_csv(lines)
+        except ValueError as e:
+            return flask.jsonify({"success": False, "error": str(e)}), 400
+        except Exception as e:
+            logger.exception("Error in import_websites")
+            return flask.jsonify({"success": False, "error": str(e)}), 500
+        if not summary['total']:
+            return flask.jsonify({"success": False, "error": "The file contains no websites"}), 400
+        applied = summary['imported'] > 0
+        return flask.jsonify(dict(summary, success=applied, applied=applied)), 200 if applied else 400
+
+    if request.content_length and request.content_length > IMPORT_MAX_BYTES:
+        return flask.jsonify({"success": False, "error": f"Import is larger than {IMPORT_MAX_BYTES} bytes"}), 413
+    data = upload.read() if upload else flask.request.get_data()
+    if not data:
+        return flask.jsonify({"success": False, "error": "No file uploaded"}), 400
+    try:
+        items = parse_website_file(data, fmt)
+        if not items:
+            return flask.jsonify({"success": False, "error": "The file contains no websites"}), 400
+        return _batch_response(*apply_website_batch(items, atomic=atomic))
+    except ValueError as e:
+        return flask.jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.exception("Error in import_websites")
+        return flask.jsonify({"success": False, "error": str(e)}), 500
+
+@views.route('/api/websites/test', methods=['POST'])
 @login_required
 def test_website_status():
     """Test and update website status"""
@@ -115,33 +488,53 @@ def test_website_status():
     name = data.get('name')
     url = data.get('url')
     
-    print(f"Testing website: {name} at URL: {url}")
+    logger.debug("Testing website: %s at URL: %s", name, url)
     
     if not name or not url:
         return flask.jsonify({"success": False, "error": "Name and URL are required"}), 400
     
     try:
-        from apis.websiteQuery import testWebsite
-        direct_test_result = testWebsite(url)
-        print(f"Direct test result for {url}: {direct_test_result}")
+        if get_website(name, url) is None:
+            logger.warning("Website not found: %s, %s", name, url)
+            return flask.jsonify({"success": False, "error": "Website not found"}), 404
+
+        # One probe both answers the request and updates the stored status
+        probe = probe_website(name, url, force=_force_requested(data))
+        logger.debug("Test result for %s: %s", url, probe)
         
-        websites = update_website_status(name, url)
-        from apis.website_manager import normalize_url
-        normalized_url = normalize_url(url)
-        updated_website = next((w for w in websites if w['name'] == name and normalize_url(w['url']) == normalized_url), None)
+        updated_website = record_website_status(name, url, probe['ok'])
         
         if updated_website:
-            print(f"Updated website status: {updated_website}")
-            return flask.jsonify({"success": True, "website": updated_website}), 200
+            logger.debug("Updated website status: %s", updated_website)
+            return flask.jsonify({"success": True, "website": updated_website, "probe": probe}), 200
         else:
-            print(f"Website not found after update: {name}, {normalized_url}")
+            logger.warning("Website not found after update: %s, %s", name, url)
             return flask.jsonify({"success": False, "error": "Website not found"}), 404
             
     except Exception as e:
-        print(f"Error in test_website_status: {e}")
+        logger.exception("Error in test_website_status")
+        return flask.jsonify({"success": False, "error": str(e)}), 500
+
+@views.route('/api/websites/check-all', methods=['POST'])
+@login_required
+def check_all_website_statuses():
+    """Test every website concurrently and return all updated statuses"""
+    data = flask.request.get_json(silent=True) or {}
+
+    try:
+        concurrency = int(data['concurrency']) if data.get('concurrency') else None
+        timeout = float(data['timeout']) if data.get('timeout') else None
+    except (TypeError, ValueError):
+        return flask.jsonify({"success": False, "error": "concurrency and timeout must be numbers"}), 400
+
+    try:
+        websites = check_all_websites(concurrency=concurrency, timeout=timeout, force=_force_requested(data))
+        return flask.jsonify({"success": True, "websites": websites}), 200
+    except Exception as e:
+        logger.exception("Error in check_all_website_statuses")
         return flask.jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/websites', methods=['DELETE'])
+@views.route('/api/websites', methods=['DELETE'])
 @login_required
 def delete_existing_website():
     """Delete a website"""
@@ -158,7 +551,7 @@ def delete_existing_website():
     except Exception as e:
         return flask.jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/websites', methods=['PUT'])
+@views.route('/api/websites', methods=['PUT'])
 @login_required
 def edit_existing_website():
     """Edit a website"""
@@ -172,25 +565,24 @@ def edit_existing_website():
         return flask.jsonify({"success": False, "error": "All fields are required"}), 400
     
     try:
-        websites = edit_website(old_name, old_url, new_name, new_url)
-        updated_website = next((w for w in websites if w['name'] == new_name and w['url'] == new_url), None)
+        edit_website(old_name, old_url, new_name, new_url)
+        updated_website = get_website(new_name.strip(), new_url.strip())
         return flask.jsonify({"success": True, "website": updated_website}), 200
     except Exception as e:
         return flask.jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/pokeURL', methods=['POST'])
+@views.route('/pokeURL', methods=['POST'])
 @login_required
 def pokeURL():
     data = flask.request.get_json()
     url = data.get('url')
-    from apis.websiteQuery import testWebsite
-    result = testWebsite(url)
-    if result:
-        print(f"Website {url} is reachable.")
-        return flask.jsonify({"success": True, "message": f"Website {url} is reachable."}), 200
+    probe = probe_url(url, force=_force_requested(data))
+    if probe['ok']:
+        logger.debug("Website %s is reachable", url)
+        return flask.jsonify({"success": True, "message": f"Website {url} is reachable.", "probe": probe}), 200
     else:
-        print(f"Website {url} is not reachable.")
-        return flask.jsonify({"success": False, "error": f"Website {url} is not reachable."}), 400
+        logger.debug("Website %s is not reachable", url)
+        return flask.jsonify({"success": False, "error": f"Website {url} is not reachable.", "probe": probe}), 400
 
 # @app.after_request
 # def after_request(response):
@@ -209,6 +601,7 @@ def pokeURL():
 #     return response
 
 if __name__ == "__main__":
+    app = create_app()
     boolean_debug = True
     if not boolean_debug:
         app.run(debug=False, host="127.0.0.1", port="8454", ssl_context='adhoc')
@@ -0,0 +1,105 @@
+"""Run several probe workers locally against the stub server and watch them
+share the work, lose a member and gain one.
+
+    python scripts/benchmarks/probers.py --probers 3 --sites 2000 --interval 10
+
+Seeds a scratch registry with --sites websites on the stub hosts, starts
+--probers `python -m apis.prober` processes and reports, for each phase,
+how many sites were checked and by which prober:
+
+1. all probers running
+2. one prober stopped (SIGTERM): its sites move to the others
+3. a new prober started: it takes a share from each
+
+A phase lasts --phase seconds, which should be longer than --interval
+plus a heartbeat so every site comes due in it.
+"""
+import argparse
+import collections
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from stub_server import StubServer
+
+def start_prober(name, env):
+    return subprocess.Popen([sys.executable, '-m', 'apis.prober', '--id', name], cwd=REPO_DIR, env=env,
+                            stdout=subprocess.DEVNULL)
+
+def phase_report(store, started, sites):
+    """Sites checked since started, in total and per prober"""
+    entries = [entry for entry in store.items('schedule').values() if (entry['last_checked'] or 0) >= started]
+    return {
+        'checked': len(entries),
+        'coverage': round(len(entries) / sites, 3),
+        'failing': sum(1 for entry in entries if entry['failures']),
+        'by_prober': dict(sorted(collections.Counter(entry.get('worker') for entry in entries).items())),
+        'probers': sorted(store.items('probers')),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--probers', type=int, default=3)
+    parser.add_argument('--sites', type=int, default=2000)
+    parser.add_argument('--interval', type=float, default=10, help="HEALTHCHECK_INTERVAL for the probers")
+    parser.add_argument('--heartbeat', type=float, default=1, help="PROBER_HEARTBEAT for the probers")
+    parser.add_argument('--phase', type=float, default=20, help="seconds per phase")
+    parser.add_argument('--stub-hosts', type=int, default=20)
+    parser.add_argument('--stub-latency', type=float, default=0.05)
+    parser.add_argument('--stub-failure-rate', type=float, default=0.1)
+    args = parser.parse_args()
+
+    stub = StubServer(latency=args.stub_latency, jitter=args.stub_latency / 2,
+                      failure_rate=args.stub_failure_rate, hosts=args.stub_hosts)
+    stub_urls = stub.start()
+    with tempfile.TemporaryDirectory(prefix='portfoliocms-probers-') as scratch:
+        env = dict(os.environ, INSTANCES_DIR=os.path.join(scratch, 'instances'), PROBE_WORKERS='true',
+                   HEALTHCHECK_INTERVAL=str(args.interval), PROBER_HEARTBEAT=str(args.heartbeat),
+                   HEALTHCHECK_JITTER='0.1', LOG_LEVEL='WARNING')
+        # Settings are read at import, so the scratch directory must be set first
+        os.environ.update(env)
+        sys.path.insert(0, REPO_DIR)
+        from suites import seed
+        from apis.shared_store import get_shared_store
+
+        # Spread over every stub host, as distinct sites would be, on paths that see latency and failures
+        seed(args.sites, None, [{'name': f"site-{i:06d}", 'url': f"{stub_urls[i % len(stub_urls)]}/site/{i}",
+                                 'status': 'active'} for i in range(args.sites)])
+        store = get_shared_store()
+
+        probers = {f"prober-{i}": start_prober(f"prober-{i}", env) for i in range(args.probers)}
+        stopped = []
+        report = {'sites': args.sites, 'probers': args.probers, 'interval': args.interval, 'phases': []}
+        try:
+            steps = [('all running', None), ('one stopped', 'stop'), ('one joined', 'join')]
+            for name, action in steps:
+                if action == 'stop':
+                    victim = sorted(probers)[0]
+                    stopped.append(probers.pop(victim))
+                    stopped[-1].send_signal(signal.SIGTERM)
+                elif action == 'join':
+                    joiner = f"prober-{args.probers}"
+                    probers[joiner] = start_prober(joiner, env)
+                print(f"Phase: {name}", file=sys.stderr)
+                started = time.time()
+                time.sleep(args.phase)
+                report['phases'].append(dict(phase_report(store, started, args.sites), phase=name))
+        finally:
+            for process in probers.values():
+                process.send_signal(signal.SIGTERM)
+            for process in list(probers.values()) + stopped:
+                process.wait(timeout=30)
+            stub.stop()
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+if __name__ == '__main__':
+    main()
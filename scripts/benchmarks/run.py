@@ -0,0 +1,142 @@
+"""Benchmark harness for the registry, the HTTP endpoints and probing.
+
+    python scripts/benchmarks/run.py                      # everything, results to stdout
+    python scripts/benchmarks/run.py --sizes 100,10000 --suites registry,http -o before.json
+    python scripts/benchmarks/run.py -o after.json --compare before.json
+
+Every (suite, backend, size) combination runs in a fresh Python process
+against a scratch instances directory, so registries never share a cache
+and settings read at import (WEBSITE_STORAGE, PROBE_ENGINE) can differ per
+run. Monitored sites point at a local stub server (stub_server.py) that
+injects latency, failures and hangs; nothing leaves the machine.
+
+Results are JSON: run metadata (commit, Python, platform) plus one entry
+per timed operation with min/median/mean/max in milliseconds. --compare
+prints the median of each operation against an earlier results file.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from stub_server import StubServer
+
+DEFAULT_SIZES = '100,10000,100000'
+BACKENDS = ('sqlite', 'csv')
+ENGINES = ('async', 'requests')
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_worker(suite, size, stub_urls, env):
+    """Run one suite in a child process and return its results"""
+    with tempfile.TemporaryDirectory(prefix='portfoliocms-bench-') as scratch:
+        output = os.path.join(scratch, 'results.json')
+        env = dict(os.environ, INSTANCES_DIR=os.path.join(scratch, 'instances'), HEALTHCHECK_ENABLED='false',
+                   LOG_LEVEL='WARNING', WEB_CONCURRENCY='1', **env)
+        command = [sys.executable, __file__, '--worker', suite, '--size', str(size),
+                   '--stub', ','.join(stub_urls), '--worker-output', output]
+        subprocess.run(command, cwd=REPO_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+        with open(output, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+def worker_main(args):
+    sys.path.insert(0, REPO_DIR)
+    from suites import SUITES
+    results = SUITES[args.worker](args.size, args.stub.split(','))
+    with open(args.worker_output, 'w', encoding='utf-8') as file:
+        json.dump(results, file)
+
+def compare(results, baseline_path):
+    """Print median timings against a baseline results file"""
+    with open(baseline_path, 'r', encoding='utf-8') as file:
+        baseline = json.load(file)
+    key = lambda r: (r['suite'], r.get('backend') or r.get('engine'), r['size'], r['name'])
+    before = {key(r): r for r in baseline['results']}
+    print(f"{'suite':<9} {'variant':<9} {'size':>7}  {'operation':<48} {'before ms':>10} {'after ms':>10} {'ratio':>6}")
+    for result in results:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        ratio = result['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+        print(f"{result['suite']:<9} {key(result)[1]:<9} {result['size']:>7}  {result['name']:<48} "
+              f"{old['median_ms']:>10.3f} {result['median_ms']:>10.3f} {ratio:>6.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--suites', default='registry,http,probe', help="comma-separated: registry, http, probe")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="registry sizes for the registry and http suites")
+    parser.add_argument('--backends', default=','.join(BACKENDS), help="website storage backends")
+    parser.add_argument('--engines', default=','.join(ENGINES), help="probe engines")
+    parser.add_argument('--probes', type=int, default=1000, help="URLs per probe throughput run")
+    parser.add_argument('--stub-hosts', type=int, default=20, help="loopback addresses the stub listens on")
+    parser.add_argument('--stub-latency', type=float, default=0.05, help="seconds before each stub response")
+    parser.add_argument('--stub-failure-rate', type=float, default=0.1, help="share of stub paths answering 500")
+    parser.add_argument('--stub-hang-rate', type=float, default=0.01,
+                        help="share of stub paths that never answer within the probe timeout")
+    parser.add_argument('-o', '--output', help="write results JSON here instead of stdout")
+    parser.add_argument('--compare', help="results JSON from an earlier run to compare against")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--stub', help=argparse.SUPPRESS)
+    parser.add_argument('--worker-output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args)
+        return
+
+    suites = args.suites.split(',')
+    sizes = [int(size) for size in args.sizes.split(',')]
+    stub = StubServer(latency=args.stub_latency, jitter=args.stub_latency / 2, failure_rate=args.stub_failure_rate,
+                      hang_rate=args.stub_hang_rate, hosts=args.stub_hosts)
+    stub_urls = stub.start()
+    started = time.time()
+    results = []
+    try:
+        for suite in suites:
+            if suite == 'probe':
+                runs = [({'PROBE_ENGINE': engine}, args.probes, {'engine': engine})
+                        for engine in args.engines.split(',')]
+            else:
+                runs = [({'WEBSITE_STORAGE': backend}, size, {'backend': backend})
+                        for backend in args.backends.split(',') for size in sizes]
+            for env, size, labels in runs:
+                print(f"Running {suite} {labels} size={size}", file=sys.stderr)
+                for result in run_worker(suite, size, stub_urls, env):
+                    results.append(dict(result, suite=suite, size=size, **labels))
+    finally:
+        stub.stop()
+
+    report = {
+        'commit': _git_commit(),
+        'started': started,
+        'duration_s': round(time.time() - started, 1),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Local HTTP server that stands in for the monitored websites.
+
+Paths under /ok/ answer 200 at once. Every other path gets the configured
+latency, and a fixed share of paths fail (HTTP 500) or hang past the probe
+timeout. Which paths fail or hang depends only on the path, so every run
+sees the same mix.
+"""
+import http.server
+import random
+import socketserver
+import threading
+import time
+import zlib
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self, body):
+        config = self.server.config
+        if not self.path.startswith('/ok/'):
+            roll = zlib.crc32(self.path.encode('utf-8')) % 10000 / 10000
+            if roll < config['hang_rate']:
+                time.sleep(config['hang_seconds'])
+            elif config['latency'] or config['jitter']:
+                time.sleep(config['latency'] + random.uniform(0, config['jitter']))
+            if roll < config['hang_rate'] + config['failure_rate']:
+                self._send(500, body)
+                return
+        self._send(200, body)
+
+    def _send(self, code, body):
+        self.send_response(code)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        if body:
+            self.wfile.write(b'ok')
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def do_GET(self):
+        self._respond(True)
+
+    def log_message(self, *args):
+        pass
+
+class _Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+class StubServer:
+    """One or more stub servers on loopback addresses.
+
+    hosts > 1 binds 127.0.0.1, 127.0.0.2, ... so probes see distinct hosts
+    (and per-host limits apply to each); where only 127.0.0.1 exists the
+    extra addresses are skipped.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, hang_rate=0.0, hang_seconds=30.0, hosts=1):
+        self.config = {'latency': latency, 'jitter': jitter, 'failure_rate': failure_rate,
+                       'hang_rate': hang_rate, 'hang_seconds': hang_seconds}
+        self.hosts = hosts
+        self._servers = []
+
+    def start(self):
+        """Start serving and return the base URL of each host"""
+        for i in range(1, self.hosts + 1):
+            try:
+                server = _Server((f"127.0.0.{i}", 0), _Handler)
+            except OSError:
+                if i == 1:
+                    raise
+                break
+            server.config = self.config
+            threading.Thread(target=server.serve_forever, name=f"stub-{i}", daemon=True).start()
+            self._servers.append(server)
+        return self.urls()
+
+    def urls(self):
+        return [f"http://{host}:{port}" for host, port in (s.server_address for s in self._servers)]
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
@@ -0,0 +1,141 @@
+"""Benchmark suites. Each runs in its own process (see run.py) after the
+environment has been pointed at a scratch instances directory, and
+returns a list of result dicts."""
+import collections
+import os
+import statistics
+import time
+
+# Mutations timed per suite; each one is a real write (and probe of a local stub URL)
+MUTATIONS = 20
+
+def measure(name, fn, repeat, setup=None, **extra):
+    """Time fn(*setup(i)) repeat times and summarize in milliseconds"""
+    samples = []
+    for i in range(repeat):
+        args = setup(i) if setup else ()
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return dict({
+        'name': name,
+        'n': repeat,
+        'min_ms': round(min(samples), 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'max_ms': round(max(samples), 3),
+    }, **extra)
+
+def read_repeat(size):
+    """Fewer repetitions of whole-registry reads on big registries"""
+    return 20 if size <= 10000 else 5
+
+def synthetic_websites(size, base_url):
+    return [{'name': f"site-{i:06d}", 'url': f"{base_url}/ok/site/{i}",
+             'status': 'active' if i % 3 else 'inactive'} for i in range(size)]
+
+def seed(size, base_url, websites=None):
+    """Write a synthetic registry (or the given websites) to the configured backend and to websites.csv"""
+    from apis.settings import CSV_FILE_PATH, DB_FILE_PATH, WEBSITE_STORAGE
+    from apis.website_storage import CSVStorage, SQLiteStorage
+    websites = websites if websites is not None else synthetic_websites(size, base_url)
+    os.makedirs(os.path.dirname(CSV_FILE_PATH), exist_ok=True)
+    CSVStorage(CSV_FILE_PATH).replace_all(websites)
+    if WEBSITE_STORAGE == 'sqlite':
+        SQLiteStorage(DB_FILE_PATH).replace_all(websites)
+    return websites
+
+def registry_suite(size, stub_urls):
+    """website_manager and serversService functions against a registry of size sites"""
+    base_url = stub_urls[0]
+    seed(size, base_url)
+    import apis.website_manager as wm
+    from apis.serversService import checkIDInCSVNames
+
+    results = [measure('load_registry', wm.get_registry, 1)]
+    repeat = read_repeat(size)
+    results.append(measure('get_all_websites', wm.get_all_websites, repeat))
+    results.append(measure('page_default', lambda: wm.get_websites_page(limit=50), repeat))
+    results.append(measure('page_sort_status_filtered',
+                           lambda: wm.get_websites_page(sort='status', status='inactive', limit=50), repeat))
+    results.append(measure('page_search', lambda: wm.get_websites_page(query='site-00001', limit=50), repeat))
+    last = f"SITE-{size - 1:06d}"
+    results.append(measure('checkIDInCSVNames_hit', lambda: checkIDInCSVNames(last), repeat))
+    results.append(measure('checkIDInCSVNames_miss', lambda: checkIDInCSVNames('no-such-site'), repeat))
+
+    new_url = lambda i: f"{base_url}/ok/new/{i}"
+    results.append(measure('add_website', wm.add_website, MUTATIONS,
+                           setup=lambda i: (f"new-{i}", new_url(i))))
+    results.append(measure('edit_website', wm.edit_website, MUTATIONS,
+                           setup=lambda i: (f"new-{i}", new_url(i), f"edited-{i}", new_url(i) + '/edited')))
+    results.append(measure('delete_website', wm.delete_website, MUTATIONS,
+                           setup=lambda i: (f"edited-{i}", new_url(i) + '/edited')))
+    if wm.WEBSITE_STORAGE == 'csv':
+        # Only the CSV backend has a websites.csv to repair
+        results.append(measure('repair_csv_file', wm.repair_csv_file, 3))
+    return results
+
+def http_suite(size, stub_urls):
+    """Flask endpoints through the test client against a registry of size sites"""
+    base_url = stub_urls[0]
+    seed(size, base_url)
+    from main import create_app
+
+    client = create_app().test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 'benchmark'
+    repeat = read_repeat(size)
+    etag = client.get('/api/websites').headers.get('ETag')
+
+    def get(path, **headers):
+        def request():
+            response = client.get(path, headers=headers)
+            assert response.status_code in (200, 304), (path, response.status_code)
+        return request
+
+    results = [
+        measure('GET /', get('/'), repeat),
+        measure('GET /api/websites', get('/api/websites'), repeat),
+        measure('GET /api/websites gzip', get('/api/websites', **{'Accept-Encoding': 'gzip'}), repeat),
+        measure('GET /api/websites 304', get('/api/websites', **{'If-None-Match': etag}), repeat),
+        measure('GET /api/websites?limit=50', get('/api/websites?limit=50'), repeat),
+        measure('GET /api/websites?sort=status&status=inactive', get('/api/websites?limit=50&sort=status&status=inactive'),
+                repeat),
+        measure('GET /api/websites?q=', get('/api/websites?limit=50&q=site-00001'), repeat),
+    ]
+
+    def post(i):
+        response = client.post('/api/websites', json={'name': f"http-{i}", 'url': f"{base_url}/ok/http/{i}"})
+        assert response.status_code in (200, 201), response.status_code
+
+    def delete(i):
+        response = client.delete('/api/websites', json={'name': f"http-{i}", 'url': f"{base_url}/ok/http/{i}"})
+        assert response.status_code == 200, response.status_code
+
+    results.append(measure('POST /api/websites', post, MUTATIONS, setup=lambda i: (i,)))
+    results.append(measure('DELETE /api/websites', delete, MUTATIONS, setup=lambda i: (i,)))
+    return results
+
+def probe_suite(size, stub_urls):
+    """Probe throughput of the configured PROBE_ENGINE over size stub URLs"""
+    from apis.settings import PROBE_ENGINE
+    from apis.websiteQuery import probe, probe_many
+
+    urls = [f"{stub_urls[i % len(stub_urls)]}/site/{i}" for i in range(size)]
+    results = [measure('probe_single', lambda: probe(f"{stub_urls[0]}/ok/single"), 20, engine=PROBE_ENGINE)]
+
+    outcomes = collections.Counter()
+    def run():
+        for result in probe_many(urls):
+            outcomes['ok' if result['ok'] else result['error']] += 1
+    result = measure('probe_many', run, 1, engine=PROBE_ENGINE, hosts=len(stub_urls))
+    result['probes_per_second'] = round(size / (result['mean_ms'] / 1000), 1)
+    result['outcomes'] = dict(outcomes)
+    results.append(result)
+    return results
+
+SUITES = {
+    'registry': registry_suite,
+    'http': http_suite,
+    'probe': probe_suite,
+}
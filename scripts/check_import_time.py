@@ -0,0 +1,105 @@
+"""Fail when importing the app or building it gets slower than its budget.
+
+    python scripts/check_import_time.py [--import-budget-ms 400] [--create-budget-ms 300]
+
+Runs `python -X importtime -c "import main"` in a fresh process and checks:
+
+- the total import time of main stays within --import-budget-ms
+- none of the modules that should load on first use (requests,
+  cryptography, certifi, brotli) is imported while the app boots
+- create_app() (what each gunicorn worker runs at boot) stays within
+  --create-budget-ms
+
+The slowest modules are listed either way. Timings are the best of
+--runs attempts, to keep a busy machine from failing the check. The test
+suite checks the lazy modules, and the budgets too with
+CHECK_IMPORT_BUDGETS=1 (tests/test_import_time.py).
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Imported on first use only; loading any of them with the app is a regression
+LAZY_MODULES = ('requests', 'cryptography', 'certifi', 'brotli')
+IMPORT_BUDGET_MS = 400
+CREATE_BUDGET_MS = 300
+
+def _run(code, env):
+    return subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=REPO_DIR, env=env,
+                          capture_output=True, text=True, check=True)
+
+def parse_importtime(stderr):
+    """{module: (self µs, cumulative µs)} from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def measure(runs=3):
+    """Best import and create_app() times over runs fresh processes.
+
+    Returns {'import_ms', 'create_ms', 'modules' (of the fastest import),
+    'eager' (LAZY_MODULES loaded while the app boots)}.
+    """
+    with tempfile.TemporaryDirectory(prefix='portfoliocms-import-') as scratch:
+        env = dict(os.environ, INSTANCES_DIR=os.path.join(scratch, 'instances'),
+                   ASSETS_DIR=os.path.join(scratch, 'assets'), HEALTHCHECK_ENABLED='false', LOG_LEVEL='WARNING')
+        # Build the assets once so create_app() is timed the way a worker
+        # boots after the gunicorn master has built them
+        subprocess.run([sys.executable, '-m', 'apis.assets'], cwd=REPO_DIR, env=env, check=True,
+                       capture_output=True)
+
+        # Whatever the bare interpreter loads (site hooks, .pth files) is not the app's doing
+        baseline = parse_importtime(_run("pass", env).stderr)
+        best_import, best_create, modules = None, None, None
+        for _ in range(runs):
+            result = _run("import time, main; start = time.perf_counter(); main.create_app(); "
+                          "print((time.perf_counter() - start) * 1000)", env)
+            run_modules = parse_importtime(result.stderr)
+            import_ms = run_modules['main'][1] / 1000
+            create_ms = float(result.stdout.strip().splitlines()[-1])
+            if best_import is None or import_ms < best_import:
+                best_import, modules = import_ms, run_modules
+            best_create = create_ms if best_create is None else min(best_create, create_ms)
+
+    # Covers create_app() too: a worker should boot without any of them
+    eager = sorted({name.split('.')[0] for name in modules.keys() - baseline.keys()} & set(LAZY_MODULES))
+    return {'import_ms': best_import, 'create_ms': best_create, 'modules': modules, 'eager': eager}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--import-budget-ms', type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument('--create-budget-ms', type=float, default=CREATE_BUDGET_MS)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15, help="slowest modules to list")
+    args = parser.parse_args()
+
+    failures = []
+    timings = measure(args.runs)
+    best_import, best_create, modules, eager = (timings['import_ms'], timings['create_ms'], timings['modules'],
+                                                timings['eager'])
+
+    print(f"import main:  {best_import:8.1f} ms (budget {args.import_budget_ms:g} ms)")
+    print(f"create_app(): {best_create:8.1f} ms (budget {args.create_budget_ms:g} ms)")
+    print("\nSlowest modules by self time:")
+    for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  (cumulative {cumulative_us / 1000:8.1f} ms)  {name}")
+
+    if best_import > args.import_budget_ms:
+        failures.append(f"importing main took {best_import:.1f} ms, budget is {args.import_budget_ms:g} ms")
+    if best_create > args.create_budget_ms:
+        failures.append(f"create_app() took {best_create:.1f} ms, budget is {args.create_budget_ms:g} ms")
+    if eager:
+        failures.append(f"imported at startup but should load on first use: {', '.join(eager)}")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+
+# Settings are read at import, so point every data path at a scratch directory first
+SCRATCH_DIR = tempfile.mkdtemp(prefix='portfoliocms-tests-')
+os.environ['INSTANCES_DIR'] = os.path.join(SCRATCH_DIR, 'instances')
+os.environ['ASSETS_DIR'] = os.path.join(SCRATCH_DIR, 'assets')
+os.environ.setdefault('HEALTHCHECK_ENABLED', 'false')
+os.makedirs(os.environ['INSTANCES_DIR'], exist_ok=True)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+@pytest.fixture
+def client():
+    """Test client of the app, already logged in"""
+    import main
+    client = main.create_app().test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 'test'
+    return client
@@ -0,0 +1,52 @@
+import http.server
+import threading
+import time
+
+from apis.async_probe import AsyncProber, _AdaptiveLimit
+from apis.settings import PROBE_BREAKER_MAX_COOLDOWN
+
+def test_breaker_cooldown_for_long_dead_host():
+    prober = AsyncProber()
+    prober._breakers['dead.example:443'] = (1030, 0)
+    prober._record_breaker('dead.example:443', healthy=False)
+    failures, open_until = prober._breakers['dead.example:443']
+    assert failures == 1031
+    assert open_until - time.monotonic() <= PROBE_BREAKER_MAX_COOLDOWN
+
+def test_breaker_closes_on_success():
+    prober = AsyncProber()
+    prober._breakers['flaky.example:443'] = (5, time.monotonic() + 60)
+    prober._record_breaker('flaky.example:443', healthy=True)
+    assert prober.breaker_state() == {}
+
+def test_falls_back_to_the_next_address_when_one_refuses():
+    server = http.server.HTTPServer(('127.0.0.1', 0), http.server.BaseHTTPRequestHandler)
+    server.RequestHandlerClass.do_HEAD = lambda handler: (handler.send_response(200), handler.end_headers())
+    server.RequestHandlerClass.log_message = lambda *args: None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        prober = AsyncProber()
+        port = server.server_address[1]
+
+        async def resolve(host, port):
+            # Nothing listens on 127.0.0.2, like an unroutable first address
+            return ['127.0.0.2', '127.0.0.1']
+        prober._resolve = resolve
+        result = prober.probe(f"http://site.example:{port}/", timeout=5)
+        assert (result['ok'], result['error']) == (True, None)
+        assert set(prober._ip_limits) == {'127.0.0.2', '127.0.0.1'}
+        assert prober._host_limits['site.example'].limit == prober.host_concurrency
+    finally:
+        server.shutdown()
+
+def test_dns_answers_and_limits_expire_together():
+    prober = AsyncProber()
+    now = time.monotonic()
+    prober._dns = {('old.example', 443): (now - 1, ['192.0.2.1']), ('new.example', 443): (now + 60, ['192.0.2.2'])}
+    prober._host_limits = {'old.example': _AdaptiveLimit(4), 'new.example': _AdaptiveLimit(4), 'busy.example': _AdaptiveLimit(4)}
+    prober._host_limits['busy.example'].active = 1
+    prober._ip_limits = {'192.0.2.1': _AdaptiveLimit(4), '192.0.2.2': _AdaptiveLimit(4)}
+    prober._sweep(now)
+    assert list(prober._dns) == [('new.example', 443)]
+    assert set(prober._host_limits) == {'new.example', 'busy.example'}
+    assert set(prober._ip_limits) == {'192.0.2.2'}
@@ -0,0 +1,35 @@
+import uuid
+
+import pytest
+
+@pytest.fixture(autouse=True)
+def probes_succeed(monkeypatch):
+    monkeypatch.setattr('apis.website_manager.probe_many', lambda urls, **kwargs: [
+        {'ok': True, 'status_code': 200, 'latency_ms': 1.0, 'error': None} for _ in urls])
+
+def site(prefix):
+    name = f"{prefix}-{uuid.uuid4().hex[:8]}"
+    return {'op': 'add', 'name': name, 'url': f"https://{name}.example"}
+
+@pytest.mark.parametrize('atomic', ['false', 0, 'no', None])
+def test_atomic_must_be_a_boolean(client, atomic):
+    response = client.post('/api/websites/batch', json={'operations': [site('a')], 'atomic': atomic})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "atomic must be true or false"
+
+def test_atomic_batch_is_all_or_nothing(client):
+    good, bad = site('good'), {'op': 'delete', 'name': 'missing', 'url': 'https://missing.example'}
+    response = client.post('/api/websites/batch', json={'operations': [good, bad]})
+    assert response.status_code == 400
+    body = response.get_json()
+    assert not body['applied']
+    assert body['results'][0]['error'] == "Not applied because other operations failed"
+    assert client.get('/api/websites', query_string={'q': good['name']}).get_json()['websites'] == []
+
+def test_non_atomic_batch_applies_the_valid_operations(client):
+    good, bad = site('good'), {'op': 'nope', 'name': 'x', 'url': 'https://x.example'}
+    response = client.post('/api/websites/batch', json={'operations': [good, bad], 'atomic': False})
+    assert response.status_code == 200
+    assert [result['success'] for result in response.get_json()['results']] == [True, False]
+    websites = client.get('/api/websites', query_string={'q': good['name']}).get_json()['websites']
+    assert [(website['name'], website['status']) for website in websites] == [(good['name'], 'active')]
@@ -0,0 +1,86 @@
+import os
+import stat
+import time
+import uuid
+
+import pytest
+
+from apis.credentials import (CredentialStore, LoginRateLimiter, hash_password, hash_username,
+                              verify_record, write_credentials)
+
+def test_scrypt_records_verify_only_the_right_password():
+    record = hash_password('correct horse', n=2 ** 10)
+    assert record.startswith('scrypt$1024$')
+    assert verify_record(record, 'correct horse')
+    assert not verify_record(record, 'correct horse ')
+    # Same password, fresh salt: a different record that still verifies
+    assert hash_password('correct horse', n=2 ** 10) != record
+
+def test_username_records_are_salted():
+    record = hash_username('admin')
+    assert verify_record(record, 'admin')
+    assert not verify_record(record, 'Admin')
+    assert hash_username('admin') != record
+
+@pytest.mark.filterwarnings('ignore:Blowfish has been deprecated')
+def test_legacy_multi_pass_records_still_verify():
+    from encrypt_strings import multi_pass_encrypt
+    record = multi_pass_encrypt('hunter2')
+    assert verify_record(record, 'hunter2')
+    assert not verify_record(record, 'hunter3')
+
+def test_store_verifies_written_credentials_and_reloads_on_change(tmp_path):
+    path = str(tmp_path / 'credentials.txt')
+    write_credentials('admin', 'first', path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert os.listdir(tmp_path) == ['credentials.txt']
+    store = CredentialStore(path)
+    assert store.verify('admin', 'first')
+    assert not store.verify('admin', 'second')
+    assert not store.verify('root', 'first')
+    write_credentials('admin', 'second', path)
+    assert store.verify('admin', 'second')
+    assert not store.verify('admin', 'first')
+
+@pytest.mark.filterwarnings('ignore:Blowfish has been deprecated')
+def test_store_accepts_legacy_records(tmp_path):
+    from encrypt_strings import multi_pass_encrypt
+    path = tmp_path / 'credentials.txt'
+    path.write_text(multi_pass_encrypt('admin') + '\n' + multi_pass_encrypt('hunter2') + '\n')
+    store = CredentialStore(str(path))
+    assert store.verify('admin', 'hunter2')
+    assert not store.verify('admin', 'hunter3')
+
+def test_empty_credentials_file_rejects_everyone(tmp_path):
+    path = tmp_path / 'credentials.txt'
+    path.write_text('')
+    assert not CredentialStore(str(path)).verify('', '')
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_rate_limiter_blocks_after_max_attempts_and_refills(shared, monkeypatch):
+    limiter = LoginRateLimiter(max_attempts=3, window=30, shared=shared)
+    key = f"client-{uuid.uuid4()}"
+    assert [limiter.allow(key) for _ in range(4)] == [True, True, True, False]
+    assert limiter.allow(f"other-{uuid.uuid4()}")
+
+    # One attempt comes back every window / max_attempts seconds
+    clock = 'time' if shared else 'monotonic'
+    later = getattr(time, clock)() + 10.5
+    monkeypatch.setattr(time, clock, lambda: later)
+    assert limiter.allow(key)
+    assert not limiter.allow(key)
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_rate_limiter_reset_restores_attempts(shared):
+    limiter = LoginRateLimiter(max_attempts=1, window=30, shared=shared)
+    key = f"client-{uuid.uuid4()}"
+    assert limiter.allow(key)
+    assert not limiter.allow(key)
+    limiter.reset(key)
+    assert limiter.allow(key)
+
+def test_shared_rate_limit_is_enforced_across_workers():
+    key = f"client-{uuid.uuid4()}"
+    workers = [LoginRateLimiter(max_attempts=4, window=30, shared=True) for _ in range(2)]
+    allowed = [worker.allow(key) for _ in range(3) for worker in workers]
+    assert allowed.count(True) == 4
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from apis.website_storage import CSVStorage, website_key
+
+def make_storage(tmp_path):
+    path = tmp_path / 'websites.csv'
+    path.write_text('name,url,status\nHome,https://home.example,active\n')
+    return CSVStorage(str(path))
+
+def names(storage):
+    return [record['name'] for record in storage.load()]
+
+def test_inserts_go_to_the_journal_and_are_replayed(tmp_path):
+    storage = make_storage(tmp_path)
+    before = os.stat(storage.path)
+    version = storage.version()
+    storage.insert({'name': 'Blog', 'url': 'https://blog.example', 'status': 'active'})
+    after = os.stat(storage.path)
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+    assert names(storage) == ['Home', 'Blog']
+    assert storage.version() == version + 1
+
+    # The next full write folds the journal into the file
+    storage.update(website_key('Blog', 'https://blog.example'), {'name': 'Notes', 'url': 'https://blog.example', 'status': 'active'})
+    assert not os.path.exists(storage.journal_path)
+    assert names(storage) == ['Home', 'Notes']
+    assert storage.version() == version + 2
+
+def test_a_torn_journal_line_is_skipped(tmp_path):
+    storage = make_storage(tmp_path)
+    storage.insert({'name': 'Blog', 'url': 'https://blog.example', 'status': 'active'})
+    with open(storage.journal_path, 'a') as journal:
+        journal.write('{"base": [1, 2], "record": {"name": "Ha')
+    assert names(storage) == ['Home', 'Blog']
+
+def test_journal_lines_of_a_replaced_file_are_not_replayed(tmp_path):
+    storage = make_storage(tmp_path)
+    storage.insert({'name': 'Blog', 'url': 'https://blog.example', 'status': 'active'})
+    with open(storage.journal_path) as journal:
+        stale = journal.read()
+    storage.replace_all([{'name': 'Home', 'url': 'https://home.example', 'status': 'inactive'}])
+    # A crash between the rewrite and removing the journal leaves it behind
+    with open(storage.journal_path, 'w') as journal:
+        journal.write(stale)
+    assert names(storage) == ['Home']
+    assert storage.journaled() == []
+
+def test_a_failed_rewrite_leaves_the_file_untouched(tmp_path):
+    storage = make_storage(tmp_path)
+    original = open(storage.path).read()
+
+    def records():
+        yield {'name': 'Blog', 'url': 'https://blog.example', 'status': 'active'}
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        storage.replace_all(records())
+    assert open(storage.path).read() == original
+    assert sorted(os.listdir(tmp_path)) == ['websites.csv', 'websites.csv.lock', 'websites.csv.version']
+
+def test_a_full_journal_falls_back_to_a_rewrite(tmp_path, monkeypatch):
+    monkeypatch.setattr('apis.website_storage.CSV_JOURNAL_MAX_BYTES', 0)
+    storage = make_storage(tmp_path)
+    storage.insert({'name': 'Blog', 'url': 'https://blog.example', 'status': 'active'})
+    storage.insert({'name': 'Notes', 'url': 'https://notes.example', 'status': 'active'})
+    assert not os.path.exists(storage.journal_path)
+    assert open(storage.path).read().splitlines()[1:] == [
+        'Home,https://home.example,active', 'Blog,https://blog.example,active', 'Notes,https://notes.example,active']
@@ -0,0 +1,16 @@
+import time
+
+from apis.events import SSE_BRIDGE_RETENTION, EventBroker
+from apis.shared_store import get_shared_store
+
+def test_publishers_prune_shared_events_without_subscribers():
+    store = get_shared_store()
+    with store._lock:
+        store._conn.execute('INSERT INTO events (origin, event, data, created) VALUES (?, ?, ?, ?)',
+                            ('other', 'website', '{}', time.time() - SSE_BRIDGE_RETENTION - 1))
+    broker = EventBroker(shared=True)
+    broker._pruned_at -= SSE_BRIDGE_RETENTION
+    broker.publish('website', {'name': 'a'})
+    assert broker._bridge is None
+    assert [event for _, _, event, _ in store.events_after(0)] == ['website']
+    assert [origin for _, origin, _, _ in store.events_after(0)] == [broker.origin]
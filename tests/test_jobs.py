@@ -0,0 +1,28 @@
+import threading
+import time
+
+from apis.jobs import JobManager
+
+def test_jobs_for_a_site_never_overlap_across_managers():
+    # Two managers stand in for two workers: only the site lock keeps them apart
+    running = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def action(job):
+        with lock:
+            running.append(job.id)
+            if len(running) > 1:
+                overlaps.append(tuple(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(job.id)
+        return 0
+
+    managers = [JobManager(workers=2), JobManager(workers=2)]
+    jobs = [manager.submit('start', 'site', action) for manager in managers for _ in range(2)]
+    deadline = time.time() + 5
+    while any(job.status in ('queued', 'running') for job in jobs) and time.time() < deadline:
+        time.sleep(0.01)
+    assert [job.status for job in jobs] == ['succeeded'] * 4
+    assert not overlaps
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from apis.probe_cache import ProbeCache
+
+def counting_probe(calls):
+    def probe(url):
+        calls.append(url)
+        return {'url': url, 'ok': True, 'n': len(calls)}
+    return probe
+
+def test_results_are_reused_until_the_ttl_runs_out(monkeypatch):
+    cache, calls, now = ProbeCache(ttl=30, max_entries=10), [], [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    probe = counting_probe(calls)
+    assert cache.get_or_probe('https://a.example/', probe) == ({'url': 'https://a.example/', 'ok': True, 'n': 1}, True)
+    # The same site with or without a trailing slash is one entry
+    assert cache.get_or_probe('https://a.example', probe)[1] is False
+    now[0] += 31
+    assert cache.get_or_probe('https://a.example', probe)[0]['n'] == 2
+    assert len(calls) == 2
+
+def test_force_probes_again_and_refreshes_the_entry():
+    cache, calls = ProbeCache(ttl=30, max_entries=10), []
+    probe = counting_probe(calls)
+    cache.get_or_probe('https://a.example', probe)
+    assert cache.get_or_probe('https://a.example', probe, force=True) == ({'url': 'https://a.example', 'ok': True, 'n': 2}, True)
+    assert cache.get_or_probe('https://a.example', probe) == ({'url': 'https://a.example', 'ok': True, 'n': 2}, False)
+
+def test_least_recently_used_entries_are_evicted():
+    cache, calls = ProbeCache(ttl=30, max_entries=2), []
+    probe = counting_probe(calls)
+    cache.get_or_probe('https://a.example', probe)
+    cache.get_or_probe('https://b.example', probe)
+    cache.get_or_probe('https://a.example', probe)      # a is now the most recent
+    cache.get_or_probe('https://c.example', probe)      # evicts b
+    assert cache.get_or_probe('https://a.example', probe)[1] is False
+    assert cache.get_or_probe('https://b.example', probe)[1] is True
+    assert calls == ['https://a.example', 'https://b.example', 'https://c.example', 'https://b.example']
+
+def test_concurrent_callers_share_one_probe():
+    cache, calls = ProbeCache(ttl=30, max_entries=10), []
+    release = threading.Event()
+
+    def slow_probe(url):
+        calls.append(url)
+        release.wait(5)
+        return {'url': url, 'ok': True}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_probe('https://a.example', slow_probe)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while not cache._flights:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert calls == ['https://a.example']
+    assert sorted(fresh for _, fresh in results) == [False, False, False, False, True]
+
+def test_failed_probes_are_not_cached():
+    cache, calls = ProbeCache(ttl=30, max_entries=10), []
+
+    def failing_probe(url):
+        calls.append(url)
+        raise OSError("network down")
+
+    with pytest.raises(OSError):
+        cache.get_or_probe('https://a.example', failing_probe)
+    assert cache.get_or_probe('https://a.example', counting_probe(calls))[1] is True
+    assert cache._flights == {}
+
+def test_many_probes_only_the_misses_once_each():
+    cache, batches = ProbeCache(ttl=30, max_entries=10), []
+
+    def probe_many(urls):
+        batches.append(urls)
+        return [{'url': url, 'ok': True} for url in urls]
+
+    cache.get_or_probe('https://a.example', lambda url: {'url': url, 'ok': False})
+    results = cache.get_or_probe_many(['https://a.example', 'https://b.example', 'https://b.example/'], probe_many)
+    assert batches == [['https://b.example']]
+    assert [(result['ok'], fresh) for result, fresh in results] == [(False, False), (True, True), (True, False)]
+    cache.get_or_probe_many(['https://a.example'], probe_many, force=True)
+    assert batches[-1] == ['https://a.example']
+
+def test_invalidate_forgets_one_url_or_all():
+    cache, calls = ProbeCache(ttl=30, max_entries=10), []
+    probe = counting_probe(calls)
+    cache.get_or_probe('https://a.example', probe)
+    cache.get_or_probe('https://b.example', probe)
+    cache.invalidate('https://a.example/')
+    assert cache.get_or_probe('https://a.example', probe)[1] is True
+    assert cache.get_or_probe('https://b.example', probe)[1] is False
+    cache.invalidate()
+    assert cache.get_or_probe('https://b.example', probe)[1] is True
@@ -0,0 +1,47 @@
+import sqlite3
+import threading
+
+from apis.probe_history import ProbeHistory, site_key
+
+OK = {'ok': True, 'status_code': 200, 'latency_ms': 40.0, 'error': None}
+DOWN = {'ok': False, 'status_code': None, 'latency_ms': None, 'error': 'timeout'}
+
+def test_sites_sharing_a_name_keep_separate_histories(tmp_path):
+    history = ProbeHistory(str(tmp_path / 'history.db'))
+    now = 1_700_000_000
+    history.record(site_key('Blog', 'https://a.example/'), OK, ts=now)
+    history.record(site_key('Blog', 'https://b.example'), DOWN, ts=now)
+    assert history.summary(site_key('Blog', 'https://a.example'), now=now)['uptime_percent'] == 100.0
+    assert history.summary(site_key('Blog', 'https://b.example'), now=now)['uptime_percent'] == 0.0
+
+def test_rename_moves_and_merges_history(tmp_path):
+    history = ProbeHistory(str(tmp_path / 'history.db'))
+    now = 1_700_000_000
+    old, new = site_key('Blog', 'https://a.example'), site_key('Notes', 'https://a.example')
+    history.record(old, OK, ts=now)
+    history.record(new, DOWN, ts=now)
+    history.rename(old, new)
+    assert history.summary(old, now=now)['checks'] == 0
+    summary = history.summary(new, now=now)
+    assert (summary['checks'], summary['uptime_percent']) == (2, 50.0)
+    assert len(history.samples(new)) == 2
+
+def test_legacy_history_is_adopted_by_the_only_site_with_that_name(tmp_path):
+    history = ProbeHistory(str(tmp_path / 'history.db'))
+    now = 1_700_000_000
+    history.record('Home', OK, ts=now)
+    history.record('Blog', OK, ts=now)
+    websites = [{'name': 'Home', 'url': 'https://home.example'},
+                {'name': 'Blog', 'url': 'https://a.example'}, {'name': 'Blog', 'url': 'https://b.example'}]
+    assert history.adopt_legacy(websites) == 1
+    assert history.summary(site_key('Home', 'https://home.example'), now=now)['checks'] == 1
+    assert history.summary('Blog', now=now)['checks'] == 1
+
+def test_writers_wait_for_another_process_transaction(tmp_path):
+    path = str(tmp_path / 'history.db')
+    history = ProbeHistory(path)
+    other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    other.execute('BEGIN IMMEDIATE')
+    threading.Timer(0.3, other.execute, ('COMMIT',)).start()
+    history.record(site_key('Blog', 'https://a.example'), OK, ts=1_700_000_000)
+    assert len(history.samples(site_key('Blog', 'https://a.example'))) == 1
@@ -0,0 +1,27 @@
+from apis.prober import HashRing, ProbeWorker
+
+def test_ring_moves_only_the_leaving_members_keys():
+    keys = [f"https://site{i}.example" for i in range(500)]
+    before = HashRing(['a', 'b', 'c'])
+    after = HashRing(['a', 'b'])
+    moved = [key for key in keys if before.owner(key) != after.owner(key)]
+    assert moved and all(before.owner(key) == 'c' for key in moved)
+    assert HashRing(()).owner(keys[0]) is None
+
+def test_probe_batch_reschedules_long_failing_urls(monkeypatch):
+    import apis.websiteQuery
+
+    failed = {'ok': False, 'status_code': None, 'latency_ms': None, 'error': 'connect_error'}
+    monkeypatch.setattr(apis.websiteQuery, 'probe_many', lambda urls, timeout=None: [failed] * len(urls))
+    worker = ProbeWorker(worker_id='test', interval=60, max_backoff=900, jitter=0, site_intervals={})
+    batch = []
+    for i, failures in enumerate((3000, 0)):
+        url = f"https://down{i}.example"
+        worker._urls[url] = {'url': url, 'sites': [(f"down{i}", url)], 'failures': failures,
+                             'last_checked': None, 'latency_ms': None, 'error': None, 'in_flight': True, 'due': 0}
+        batch.append((url, worker._urls[url]['sites']))
+    worker._slots.acquire()
+    worker._probe_batch(batch)
+    assert not any(state['in_flight'] for state in worker._urls.values())
+    assert len(worker._queue) == 2 and len(worker._pending) == 2
+    worker._executor.shutdown()
@@ -0,0 +1,29 @@
+import pytest
+
+import apis.website_manager as website_manager
+
+def test_repair_is_refused_when_csv_is_not_the_registry(monkeypatch):
+    monkeypatch.setattr(website_manager, 'WEBSITE_STORAGE', 'sqlite')
+    with pytest.raises(ValueError):
+        website_manager.repair_csv_file()
+
+def test_repair_fixes_rows_and_drops_only_true_duplicates(tmp_path, monkeypatch):
+    path = tmp_path / 'websites.csv'
+    path.write_bytes(b'name,url,status\n'
+                     b'a,https://a.example/,active\n'
+                     b'a,https://a.example,active\n'
+                     b'A,https://a.example,active\n'
+                     b'b,https://b.example/x,y,ACTIVE\n'
+                     b'c,"https://c.example,active\n'
+                     b',https://nameless.example,active\n')
+    monkeypatch.setattr(website_manager, 'WEBSITE_STORAGE', 'csv')
+    monkeypatch.setattr(website_manager, 'CSV_FILE_PATH', str(path))
+    report = website_manager.repair_csv_file()
+    assert report.skipped == {'duplicate': 1, 'missing_name': 1}
+    assert path.read_text().splitlines() == [
+        'name,url,status',
+        'a,https://a.example,active',
+        'A,https://a.example,active',
+        'b,"https://b.example/x,y",active',
+        'c,https://c.example,active',
+    ]
@@ -0,0 +1,46 @@
+import gzip
+import uuid
+
+from apis.response_cache import ResponseCache, get_response_cache
+
+def websites_entries():
+    return [key for key in get_response_cache()._entries if key[0] == 'websites']
+
+def test_lru_keeps_within_entry_and_byte_bounds():
+    cache = ResponseCache(max_entries=2, max_bytes=10)
+    cache.put(('a', 1), b'aaaa', 'text/plain')
+    cache.put(('a', 2), b'bbbb', 'text/plain')
+    assert cache.get(('a', 1)).data == b'aaaa'     # ('a', 2) is now least recent
+    cache.put(('a', 3), b'cccc', 'text/plain')
+    assert cache.get(('a', 2)) is None
+    cache.put(('a', 4), b'dddddddd', 'text/plain')  # over the byte bound with anything else
+    assert list(cache._entries) == [('a', 4)]
+    assert cache.put(('a', 5), b'x' * 11, 'text/plain').data == b'x' * 11
+    assert cache.get(('a', 5)) is None
+
+def test_invalidate_drops_one_namespace():
+    cache = ResponseCache(max_entries=10, max_bytes=1000)
+    cache.put(('websites', 1), b'[]', 'application/json')
+    cache.put(('page', 'index'), b'<html>', 'text/html')
+    cache.invalidate('websites')
+    assert list(cache._entries) == [('page', 'index')]
+    assert cache._bytes == len(b'<html>')
+
+def test_gzip_copy_is_made_once():
+    body = ResponseCache().put(('a',), b'x' * 1000, 'text/plain')
+    assert gzip.decompress(body.gzipped()) == b'x' * 1000
+    assert body.gzipped() is body.gzipped()
+
+def test_registry_changes_drop_cached_website_lists(client):
+    from apis.website_manager import get_registry
+    before = client.get('/api/websites').get_json()['websites']
+    assert websites_entries()
+    name = f"cached-{uuid.uuid4().hex[:8]}"
+    get_registry().add(name, f"https://{name}.example", 'active')
+    assert websites_entries() == []
+    after = client.get('/api/websites').get_json()['websites']
+    assert [website['name'] for website in after] == [website['name'] for website in before] + [name]
+
+    get_registry().update(name, f"https://{name}.example", {'status': 'inactive'})
+    assert websites_entries() == []
+    assert client.get('/api/websites').get_json()['websites'][-1]['status'] == 'inactive'
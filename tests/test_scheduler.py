@@ -0,0 +1,15 @@
+from apis.scheduler import HealthCheckScheduler, backoff_delay
+
+def test_backoff_doubles_up_to_the_cap():
+    assert backoff_delay(60, 0, 900, 0) == 60
+    assert backoff_delay(60, 2, 900, 0) == 240
+    assert backoff_delay(60, 10, 900, 0) == 900
+
+def test_backoff_survives_very_long_outages():
+    # A dead site reaches thousands of consecutive failures after a few weeks
+    for failures in (1024, 10 ** 6):
+        assert backoff_delay(60, failures, 900, 0.1) <= 900 * 1.1
+
+def test_next_delay_for_long_failing_site():
+    scheduler = HealthCheckScheduler(interval=60, max_backoff=900, jitter=0)
+    assert scheduler.next_delay({'name': 'dead', 'failures': 5000}) == 900
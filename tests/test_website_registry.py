@@ -0,0 +1,121 @@
+import threading
+
+from apis.website_registry import WebsiteRegistry
+from apis.website_storage import CSVStorage
+
+def make_registry(tmp_path):
+    path = tmp_path / 'websites.csv'
+    path.write_text('name,url,status\nHome,https://home.example,active\n')
+    return WebsiteRegistry(CSVStorage(str(path)))
+
+def test_find_by_name_follows_every_change(tmp_path):
+    registry = make_registry(tmp_path)
+    assert registry.find_by_name('home')['url'] == 'https://home.example'
+    registry.add('Blog', 'https://blog.example', 'active')
+    registry.add('blog', 'https://blog2.example', 'active')
+    assert registry.find_by_name('BLOG')['url'] == 'https://blog.example'
+    registry.update('Blog', 'https://blog.example', {'name': 'Notes'})
+    assert registry.find_by_name('notes')['name'] == 'Notes'
+    assert registry.find_by_name('blog')['url'] == 'https://blog2.example'
+    registry.delete('blog', 'https://blog2.example')
+    assert registry.find_by_name('blog') is None
+
+def test_status_writes_keep_the_name_index(tmp_path):
+    registry = make_registry(tmp_path)
+    registry.find_by_name('home')
+    index = registry._name_index
+    registry.update_statuses({('Home', 'https://home.example'): 'inactive'})
+    assert registry._name_index is index
+    assert registry.find_by_name('home')['status'] == 'inactive'
+
+def test_listeners_run_after_the_locks_are_released(tmp_path):
+    registry = make_registry(tmp_path)
+    seen = []
+
+    def listener(change, record, previous):
+        seen.append((change, record['name']))
+        if record['name'] == 'Blog':
+            # Another writer must get through while this listener runs
+            writer = threading.Thread(target=registry.add, args=('Notes', 'https://notes.example', 'active'))
+            writer.start()
+            writer.join(timeout=5)
+            assert not writer.is_alive()
+
+    registry.add_listener(listener)
+    registry.add('Blog', 'https://blog.example', 'active')
+    assert seen == [('added', 'Blog'), ('added', 'Notes')]
+    registry.apply_batch([{'op': 'edit', 'name': 'Notes', 'url': 'https://notes.example', 'changes': {'status': 'inactive'}},
+                          {'op': 'delete', 'name': 'Home', 'url': 'https://home.example'}])
+    assert seen[2:] == [('updated', 'Notes'), ('deleted', 'Home')]
+
+def test_batch_checks_each_operation_against_the_ones_before_it(tmp_path):
+    registry = make_registry(tmp_path)
+    applied, results = registry.apply_batch([
+        {'op': 'add', 'name': 'Blog', 'url': 'https://blog.example', 'status': 'active'},
+        {'op': 'add', 'name': 'Blog', 'url': 'https://blog.example', 'status': 'active'},
+        {'op': 'edit', 'name': 'Blog', 'url': 'https://blog.example', 'changes': {'name': 'Home', 'url': 'https://home.example'}},
+        {'op': 'delete', 'name': 'Gone', 'url': 'https://gone.example'},
+    ], dry_run=True)
+    assert not applied
+    assert [result['success'] for result in results] == [True, False, False, False]
+    assert 'already exists' in results[1]['error'] and 'already exists' in results[2]['error']
+    assert 'not found' in results[3]['error']
+    assert [website['name'] for website in registry.all()] == ['Home']
+
+def test_atomic_batch_writes_nothing_when_one_operation_fails(tmp_path):
+    registry = make_registry(tmp_path)
+    version = registry.version()
+    applied, results = registry.apply_batch([
+        {'op': 'add', 'name': 'Blog', 'url': 'https://blog.example', 'status': 'active'},
+        {'op': 'delete', 'name': 'Gone', 'url': 'https://gone.example'},
+    ])
+    assert not applied
+    assert [result['success'] for result in results] == [True, False]
+    assert registry.version() == version
+    assert [website['name'] for website in WebsiteRegistry(registry.storage).all()] == ['Home']
+
+def test_partial_batch_applies_the_valid_operations_in_place(tmp_path):
+    registry = make_registry(tmp_path)
+    registry.add('Blog', 'https://blog.example', 'active')
+    registry.add('Notes', 'https://notes.example', 'active')
+    applied, results = registry.apply_batch([
+        {'op': 'edit', 'name': 'Home', 'url': 'https://home.example', 'changes': {'name': 'Start'}},
+        {'op': 'delete', 'name': 'Gone', 'url': 'https://gone.example'},
+        {'op': 'edit', 'name': 'Start', 'url': 'https://home.example', 'changes': {'url': 'https://start.example'}},
+        {'op': 'delete', 'name': 'Blog', 'url': 'https://blog.example'},
+        {'op': 'add', 'name': 'Blog', 'url': 'https://blog.example', 'status': 'inactive'},
+    ], atomic=False)
+    assert applied
+    assert [result['success'] for result in results] == [True, False, True, True, True]
+    # Renamed sites keep their position, re-added ones go to the end
+    expected = [('Start', 'https://start.example', 'active'), ('Notes', 'https://notes.example', 'active'),
+                ('Blog', 'https://blog.example', 'inactive')]
+    assert [(w['name'], w['url'], w['status']) for w in registry.all()] == expected
+    assert [(w['name'], w['url'], w['status']) for w in WebsiteRegistry(registry.storage).all()] == expected
+    assert registry.get('Home', 'https://home.example') is None
+    assert registry.find_by_name('start')['url'] == 'https://start.example'
+
+def test_insertion_order_pages_survive_changes_before_the_cursor(tmp_path):
+    registry = make_registry(tmp_path)
+    for i in range(5):
+        registry.add(f"Site {i}", f"https://{i}.example", 'active')
+    _, websites, cursor = registry.page(limit=3)
+    assert [website['name'] for website in websites] == ['Home', 'Site 0', 'Site 1']
+    registry.delete('Home', 'https://home.example')
+    registry.update('Site 0', 'https://0.example', {'name': 'Renamed'})
+    _, websites, cursor = registry.page(limit=3, cursor=cursor)
+    assert [website['name'] for website in websites] == ['Site 2', 'Site 3', 'Site 4']
+    assert cursor is None
+
+def test_insertion_order_pages_can_run_backwards(tmp_path):
+    registry = make_registry(tmp_path)
+    for i in range(4):
+        registry.add(f"Site {i}", f"https://{i}.example", 'active' if i % 2 else 'inactive')
+    _, websites, cursor = registry.page(descending=True, limit=2)
+    assert [website['name'] for website in websites] == ['Site 3', 'Site 2']
+    _, websites, cursor = registry.page(descending=True, limit=2, cursor=cursor)
+    assert [website['name'] for website in websites] == ['Site 1', 'Site 0']
+    _, websites, cursor = registry.page(descending=True, limit=2, cursor=cursor)
+    assert [website['name'] for website in websites] == ['Home'] and cursor is None
+    _, websites, _ = registry.page(descending=True, status='active')
+    assert [website['name'] for website in websites] == ['Site 3', 'Site 1', 'Home']
@@ -0,0 +1,67 @@
+import gzip
+import json
+import uuid
+
+import pytest
+
+@pytest.mark.parametrize('query, error', [
+    ({'limit': 'ten'}, "limit must be a number"),
+    ({'limit': 0}, "limit must be between 1 and"),
+    ({'since': 'yesterday'}, "since must be a version number"),
+    ({'since': 1, 'limit': 10}, "since cannot be combined with paging parameters"),
+    ({'order': 'sideways'}, "order must be asc or desc"),
+])
+def test_bad_list_parameters_are_rejected(client, query, error):
+    response = client.get('/api/websites', query_string=query)
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith(error)
+
+def add_site(prefix):
+    from apis.website_manager import get_registry
+    name = f"{prefix}-{uuid.uuid4().hex[:8]}"
+    return get_registry().add(name, f"https://{name}.example", 'active')
+
+def test_unchanged_list_is_answered_with_304(client):
+    response = client.get('/api/websites')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag == f'W/"v{response.get_json()["version"]}"'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    not_modified = client.get('/api/websites', headers={'If-None-Match': etag})
+    assert (not_modified.status_code, not_modified.data) == (304, b'')
+    assert not_modified.headers['ETag'] == etag
+
+    add_site('etag')
+    changed = client.get('/api/websites', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+def test_since_returns_only_changes_after_a_version(client):
+    from apis.website_manager import get_registry
+    kept, removed = add_site('kept'), add_site('removed')
+    version = client.get('/api/websites').get_json()['version']
+    added = add_site('added')
+    get_registry().update(kept['name'], kept['url'], {'status': 'inactive'})
+    get_registry().delete(removed['name'], removed['url'])
+
+    body = client.get('/api/websites', query_string={'since': version}).get_json()
+    assert body['delta'] is True
+    assert [(website['name'], website['status']) for website in body['changed']] == [
+        (added['name'], 'active'), (kept['name'], 'inactive')]
+    assert body['removed'] == [{'name': removed['name'], 'url': removed['url']}]
+
+    latest = client.get('/api/websites', query_string={'since': body['version']}).get_json()
+    assert (latest['changed'], latest['removed']) == ([], [])
+
+def test_unknown_version_gets_the_full_list(client):
+    body = client.get('/api/websites', query_string={'since': 10 ** 12}).get_json()
+    assert 'delta' not in body
+    assert len(body['websites']) == len(client.get('/api/websites').get_json()['websites'])
+
+def test_large_lists_are_gzipped_for_clients_that_accept_it(client):
+    for _ in range(30):
+        add_site('gzip')
+    response = client.get('/api/websites', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.data))['websites'] == client.get('/api/websites').get_json()['websites']